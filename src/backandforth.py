@@ -1,16 +1,15 @@
 # Warning: Experimental code.
-from nxt import locator
 from nxt.sensor.common import PORT_2, PORT_4
 from nxt.motor import PORT_A, PORT_B, PORT_C
 
-from scripts.helpers import Robot, SERVO_UP, ON, OFF
+from scripts.helpers import Robot, connect, SERVO_UP, ON, OFF
 from scripts.helpers import normalize
 
 from time import sleep
 
 
 def main():
-    brick = locator.find_one_brick(debug=True)
+    brick = connect(debug=True)
     robot = Robot(brick, debug=True, verbose=True, power=80)  # Excessive output
 
     # Motors
@@ -0,0 +1,147 @@
+from __future__ import print_function
+from __future__ import division
+
+import sys
+import json
+import time
+import platform
+import subprocess
+
+from scripts.helpers.simulator import LatencyProfile, NO_LATENCY, USB, BLUETOOTH
+
+PROFILES = {
+    'none': NO_LATENCY,
+    'usb': USB,
+    'bluetooth': BLUETOOTH,
+}
+
+# name -> function(profile, scale) returning a dict of metric -> value
+BENCHMARKS = {}
+# Metrics where a lower value is better, every other one is a rate
+LOWER_IS_BETTER = ('seconds', 'commands', 'bus_time', 'gap')
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. The function gets the LatencyProfile of the simulated brick and a
+    scale factor for its duration, and returns a dict of metric -> number.
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def custom_profile(base, latency=None, reply_latency=None, jitter=None):
+    """
+    :return: A copy of the profile with the given values replaced.
+    """
+    if reply_latency is None:
+        reply_latency = base.reply_latency if latency is None else latency
+    return LatencyProfile(
+        base.name,
+        latency=base.latency if latency is None else latency,
+        reply_latency=reply_latency,
+        jitter=base.jitter if jitter is None else jitter,
+        commands=base.commands,
+    )
+
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names=None, profile=NO_LATENCY, repeat=3, scale=1, debug=print):
+    """
+    Runs the benchmarks.
+    :param names: The benchmarks to run. Defaults to all of them.
+    :param profile: The LatencyProfile of the simulated brick.
+    :param repeat: How many times every benchmark is run. The median of every metric is reported.
+    :param scale: Factor applied to the duration of every benchmark.
+    :param debug: Function used to report progress.
+    :return: A dict with the environment and the results, ready to be dumped as JSON.
+    """
+    # Imported for the registration of the benchmarks
+    from . import robot_benchmarks
+    names = sorted(BENCHMARKS) if names is None else names
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError('Unknown benchmarks: %s' % ', '.join(unknown))
+
+    results = {}
+    for name in names:
+        runs = [BENCHMARKS[name](profile, scale) for _ in range(repeat)]
+        results[name] = dict((metric, _median([r[metric] for r in runs])) for metric in runs[0])
+        debug('%-24s %s' % (name, ', '.join('%s=%.4g' % item for item in sorted(results[name].items()))))
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'time': time.time(),
+            'python': platform.python_version(),
+            'platform': sys.platform,
+            'profile': repr(profile),
+            'repeat': repeat,
+            'scale': scale,
+        },
+        'results': results,
+    }
+
+
+def _change(old, new):
+    """
+    :return: The relative change from old to new, infinite if old is 0.
+    """
+    if old == new:
+        return 0
+    if old == 0:
+        return float('inf') if new > old else -float('inf')
+    return new / old - 1
+
+
+def compare(baseline, current):
+    """
+    :return: A dict of benchmark -> metric -> (baseline, current, change) where change is
+    positive when current is better. A change from 0 is infinite.
+    """
+    changes = {}
+    for name, metrics in current['results'].items():
+        for metric, value in metrics.items():
+            old = baseline['results'].get(name, {}).get(metric)
+            if old is None or value is None:
+                continue
+            lower_is_better = any(metric.endswith(suffix) for suffix in LOWER_IS_BETTER)
+            if lower_is_better and old == 0:
+                # e.g. commands that are sent again, infinitely worse than none
+                change = -_change(old, value)
+            elif lower_is_better:
+                change = _change(value, old)
+            else:
+                change = _change(old, value)
+            changes.setdefault(name, {})[metric] = (old, value, change)
+    return changes
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(results, path=None):
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if path is None:
+        print(text)
+    else:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
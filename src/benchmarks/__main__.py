@@ -0,0 +1,46 @@
+from __future__ import print_function
+
+import sys
+import argparse
+
+from . import PROFILES, BENCHMARKS, run, compare, custom_profile, load, dump
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Measures the hot paths of the Robot against a simulated brick.')
+    parser.add_argument('names', nargs='*', help='The benchmarks to run. Defaults to all of them.')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='usb', help='The latency of the brick.')
+    parser.add_argument('--latency', type=float, help='Seconds per command without reply, overrides the profile.')
+    parser.add_argument('--reply-latency', type=float, help='Seconds per command with reply.')
+    parser.add_argument('--jitter', type=float, help='Standard deviation of the latency in seconds.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of every benchmark, the median is reported.')
+    parser.add_argument('--scale', type=float, default=1, help='Factor for the duration of the timed loops.')
+    parser.add_argument('--output', help='Write the JSON results to this file instead of stdout.')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results of a previous run to compare with.')
+    parser.add_argument('--list', action='store_true', help='List the benchmarks and exit.')
+    options = parser.parse_args(argv)
+
+    if options.list:
+        # Imported for the registration of the benchmarks
+        from . import robot_benchmarks
+        print('\n'.join(sorted(BENCHMARKS)))
+        return 0
+
+    profile = custom_profile(PROFILES[options.profile], options.latency, options.reply_latency, options.jitter)
+    # Progress goes to stderr, so that stdout is only the JSON
+    results = run(options.names or None, profile, options.repeat, options.scale,
+                  debug=lambda *x: print(*x, file=sys.stderr))
+    dump(results, options.output)
+
+    if options.compare:
+        for name, metrics in sorted(compare(load(options.compare), results).items()):
+            for metric, (old, new, change) in sorted(metrics.items()):
+                print('%-16s %-28s %12.4g -> %-12.4g %+7.1f%%' % (name, metric, old, new, change * 100),
+                      file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+from __future__ import division
+
+from nxt.motor import PORT_A, PORT_C
+from nxt.sensor.common import PORT_1, PORT_2, PORT_3, PORT_4
+
+from time import time
+
+from scripts.helpers.robot import Robot
+from scripts.helpers.utils import normalize, Normalizer
+from scripts.helpers.tones import compile_morse, encode
+from scripts.helpers.simulator import SimulatedBrick
+
+from . import benchmark
+
+# Seconds that every timed loop lasts, multiplied by the scale
+LOOP_SECONDS = .5
+
+
+def _robot(profile, motors=True):
+    brick = SimulatedBrick(profile, seed=0)
+    robot = Robot(brick, debug=False, calibration_cache=False)
+    if motors:
+        robot.init_synchronized_motors(PORT_A, PORT_C)
+    return brick, robot
+
+
+@benchmark('robot_startup')
+def robot_startup(profile, scale):
+    brick = SimulatedBrick(profile, seed=0)
+    start = time()
+    robot = Robot(brick, debug=False, calibration_cache=False)
+    robot.init_synchronized_motors(PORT_A, PORT_C)
+    robot.init_light_sensor(PORT_2)
+    robot.init_touch_sensor(PORT_3)
+    robot.init_sound_sensor(PORT_4)
+    robot.init_ultrasonic_sensor(PORT_1)
+    seconds = time() - start
+    robot.close()
+    return {'seconds': seconds, 'commands': brick.total_commands}
+
+
+@benchmark('control_loop')
+def control_loop(profile, scale):
+    """
+    How many times per second _move_until can evaluate a condition that reads a sensor.
+    """
+    brick, robot = _robot(profile)
+    light = robot.init_light_sensor(PORT_2)
+    iterations = [0]
+    end = time() + LOOP_SECONDS * scale
+
+    def until():
+        iterations[0] += 1
+        light.get_sample()
+        return time() >= end
+    start = time()
+    robot.move_forward(until=until, wait=True, poll_rate=10000)
+    seconds = time() - start
+    robot.close()
+    return {'iterations_per_second': iterations[0] / seconds, 'bus_time': brick.bus_time / seconds}
+
+
+@benchmark('sensor_reads')
+def sensor_reads(profile, scale):
+    brick, robot = _robot(profile, motors=False)
+    light = robot.init_light_sensor(PORT_2)
+    ultrasonic = robot.init_ultrasonic_sensor(PORT_1)
+    results = {}
+    for name, read in (('light', light.get_sample), ('ultrasonic', ultrasonic.get_distance)):
+        reads = 0
+        start = time()
+        end = start + LOOP_SECONDS * scale / 2
+        while time() < end:
+            read()
+            reads += 1
+        results['%s_per_second' % name] = reads / (time() - start)
+    robot.close()
+    return results
+
+
+@benchmark('sampled_reads')
+def sampled_reads(profile, scale):
+    """
+    Readers of the sampler never go through the brick.
+    """
+    brick, robot = _robot(profile, motors=False)
+    robot.init_light_sensor(PORT_2)
+    robot.start_sampler()
+    while robot.sampler.latest('light') is None:
+        pass
+    reads = 0
+    start = time()
+    end = start + LOOP_SECONDS * scale
+    while time() < end:
+        robot.reading('light')
+        reads += 1
+    seconds = time() - start
+    robot.close()
+    return {'reads_per_second': reads / seconds}
+
+
+@benchmark('maneuvers')
+def maneuvers(profile, scale):
+    """
+    Commands and time taken by the usual maneuvers.
+    """
+    results = {}
+    moves = (
+        ('spin', lambda robot: robot.spin(360, power=100)),
+        ('move_dist', lambda robot: robot.move_forward(dist=10, power=100)),
+        ('plan', lambda robot: robot.plan(power=100).straight(10).spin(360).straight(10).run()),
+        ('stop_idle', lambda robot: robot.stop()),
+    )
+    for name, move in moves:
+        brick, robot = _robot(profile)
+        robot.stop()
+        brick.reset_counters()
+        start = time()
+        move(robot)
+        results['%s_seconds' % name] = time() - start
+        results['%s_commands' % name] = brick.total_commands
+        robot.close()
+
+    # Idle time of the wheels between the segments of a plan
+    brick, robot = _robot(profile)
+    plan = robot.plan(power=100).straight(10).spin(180).straight(10).spin(-180)
+    plan.run()
+    results['plan_max_gap'] = max(plan.gaps)
+    robot.close()
+    return results
+
+
+@benchmark('morse')
+def morse(profile, scale):
+    """
+    How long scheduling a message takes, before and after it is cached, and how long
+    Robot.morse blocks the caller when it does not wait.
+    """
+    message = 'SOS SOS THE QUICK BROWN FOX'
+    encode.cache_clear()
+    compile_morse.cache_clear()
+    start = time()
+    compile_morse(message)
+    compile_seconds = time() - start
+    start = time()
+    compile_morse(message)
+    cached_seconds = time() - start
+
+    brick, robot = _robot(profile, motors=False)
+    start = time()
+    robot.morse(message, wait=False)
+    call_seconds = time() - start
+    robot.stop_morse()
+    robot.close()
+    return {'compile_seconds': compile_seconds, 'cached_seconds': cached_seconds, 'call_seconds': call_seconds}
+
+
+@benchmark('normalize')
+def normalize_throughput(profile, scale):
+    values = list(range(1024)) * 100
+    normalizer = Normalizer(0, 1023)
+    results = {}
+    funcs = (
+        ('normalize', lambda v: normalize(v, 0, 1023)),
+        ('normalizer', normalizer),
+        ('lookup', normalizer.lookup),
+    )
+    for name, func in funcs:
+        start = time()
+        for value in values:
+            func(value)
+        results['%s_per_second' % name] = len(values) / (time() - start)
+    start = time()
+    normalizer.batch(values)
+    results['batch_per_second'] = len(values) / (time() - start)
+    return results
@@ -1,17 +1,17 @@
 # Warning: Experimental code.
-from nxt import locator
 from nxt.sensor.common import PORT_2, PORT_4
 from nxt.motor import PORT_A, PORT_B, PORT_C
 
-from scripts.helpers import Robot, SERVO_DOWN, ON, OFF
-from scripts.helpers import normalize
+from scripts.helpers import Robot, connect, SERVO_DOWN, ON, OFF
+from scripts.helpers import Normalizer
 
 from time import sleep
 
 
 def main():
-    brick = locator.find_one_brick(debug=True)
-    robot = Robot(brick, debug=True, verbose=True, power=80)  # Excessive output
+    brick = connect(debug=True)
+    # Readings less than 20ms old are reused instead of asking the brick again
+    robot = Robot(brick, debug=True, verbose=True, power=80, read_ttl=.02)  # Excessive output
 
     # Motors
     robot.init_synchronized_motors(PORT_A, PORT_C)
@@ -21,12 +21,14 @@ def main():
 
     robot.set_servo(SERVO_DOWN)
 
-    table_value = normalize(light.get_sample(), 0, 1023)
+    normalize = Normalizer(0, 1023).lookup
+    table_value = normalize(light.get_sample())
     print(table_value)
 
     def until():
-        print(normalize(light.get_sample(), 0, 1023))
-        return normalize(light.get_sample(), 0, 1023) < 0.3
+        level = normalize(light.get_sample())
+        print(level)
+        return level < 0.3
 
     robot.move_forward(until=until, until_args=(), until_kwargs={}, wait=True)
     robot.turn_light_sensor(OFF)
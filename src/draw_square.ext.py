@@ -1,6 +1,5 @@
 from nxt.motor import PORT_A, PORT_B, PORT_C
 from scripts.helpers.robot import Robot, SERVO_UP
-from time import sleep
 
 def main():
     robot = Robot(debug=True, verbose=True)
@@ -14,11 +13,12 @@ def main():
     side_length = 10  # In centimeters
     angle = 90
 
+    # The whole square is sent as one plan: every side and corner starts as soon as the previous one ends
+    plan = robot.plan(power=75)
     for _ in range(sides):
-        print('Doing the %d side' % _)
-        robot.move_forward(dist=side_length, power=75)
-        robot.spin(degrees=(360 - angle), power=75)
-        sleep(2)
+        plan.straight(side_length).spin(360 - angle)
+    print('Drawing %d sides, about %.1f seconds' % (sides, plan.duration()))
+    plan.run()
 
     print('[DONE] Won\'t do anything else.')
 
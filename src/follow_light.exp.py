@@ -1,16 +1,17 @@
 # Warning: Experimental code.
-from nxt import locator
 from nxt.sensor.common import PORT_2, PORT_4
 from nxt.motor import PORT_A, PORT_B, PORT_C
 
-from scripts.helpers import Robot, SERVO_UP, ON, OFF
+from scripts.helpers import Robot, connect, SERVO_UP, ON, OFF
 from scripts.helpers import normalize
+from scripts.helpers.stats import RunningStats
+from scripts.helpers.filters import Chain, Median, Hysteresis
 
 from time import sleep
 
 
 def main():
-    brick = locator.find_one_brick(debug=True)
+    brick = connect(debug=True)
     robot = Robot(brick, debug=True, verbose=True, power=80)  # Excessive output
 
     # Motors
@@ -25,11 +26,11 @@ def main():
     robot.set_servo(SERVO_UP)
     robot.turn_light_sensor(ON)
 
-    # Calibration (light)
-    # light_off, light_on = robot.calibrate_light(interactive=True)  # FIXME: Output says 'Point the sensor to black line'
-    light_off, light_on = 229, 900
+    # Calibration (light). Cached values from previous runs are used when they still match.
+    light_off, light_on = robot.calibrate_light(interactive=True)  # FIXME: Output says 'Point the sensor to black line'
     # Sound sensor calibration
-    quiet, loud = 15, 1024 # robot.calibrate_sound(interactive=True)
+    quiet, loud = robot.calibrate_sound(interactive=True)
+    light_level_of = robot.light_normalizer.lookup
 
     # Thresholds
     lower = 5 * (10 ** -1)
@@ -38,34 +39,44 @@ def main():
 
     # until = lambda *args, ls=light, **kwargs: normalize(ls.get_lightness(), light_off, light_on) > upper
     print('starting...')
+    robot.start_sampler(rates={PORT_2: 50})
     sleep(3)
-    # TODO I should probably lock the access to light sensor.
-    def until(light_sensor, **kwargs):  # Must explicitly state **kwargs as his argument.
-        return normalize(light_sensor.get_lightness(), light_off, light_on) < lower
 
-    robot.move_forward(until=until, until_args=(light,))
+    def until(rb, **kwargs):  # Must explicitly state **kwargs as his argument.
+        return light_level_of(rb.reading('light')) < lower
+
+    # Tracks the background noise while driving, the robot itself is not quiet
+    noise = RunningStats()
+    # A single loud reading (e.g. a wheel bump) is not a signal, and once loud it must calm down first
+    is_loud = Chain(Median(3), Hysteresis(lower_noise * .8, lower_noise))
+
+    robot.move_forward(until=until, until_args=(robot,))
     while robot.running:
-        light_level = normalize(light.get_lightness(), light_off, light_on)
+        light_level = light_level_of(robot.reading('light'))
         robot.debug('Current light level: ', light_level)
         if light_level < lower:
             robot.turn_right(50, 15)  # Turn right 15° to see if we correct the course
-            light_level_tmp = normalize(light.get_lightness(), light_off, light_on)
+            light_level_tmp = light_level_of(light.get_lightness())
             robot.debug('temp lecture at right', light_level_tmp)
             if light_level_tmp > light_level:
                 robot.debug('Right turn didn\'t improve course. Turning left...')
                 robot.turn_left(50, 30)
         sleep(.4)
-        s = sound.get_sample()
-        loudness = normalize(s, quiet, loud)
-        robot.debug('Value of loudness is ', loudness, s)
-        if loudness > lower_noise:
+        s = robot.reading('sound')
+        noise.add(s)
+        # The running noise can reach the loud level, keep the range from being empty or inverted
+        loudness = normalize(s, min(max(quiet, noise.percentile(.5)), loud - 1), loud)
+        robot.debug('Value of loudness is ', loudness, s, noise)
+        if is_loud(loudness):
+            is_loud.reset()
             robot.stop()
-            robot.morse('SOS')
+            robot.morse('SOS', wait=False)  # Keeps signaling while backing off
             robot.move_backwards(seconds=3, wait=True)
 
-        if not until(light):
-            robot.move_forward(until=until, until_args=(light,))  # FIXME: Does this cause an infinite loop?
+        if not until(robot):
+            robot.move_forward(until=until, until_args=(robot,))  # FIXME: Does this cause an infinite loop?
 
+    robot.stop_sampler()
     robot.turn_light_sensor(OFF)
     print('DONE: Won\'t do anything else.')
     exit(0)
@@ -1,5 +1,7 @@
 from nxt import *
 from scripts.helpers import *
+from scripts.helpers.odometry import MoveLog
+from scripts.helpers.filters import Median, sensor_stream, settle
 from time import sleep
 
 # Constants
@@ -9,13 +11,17 @@ LOUD_THRESHOLD = 0.8
 STEP = 2
 AVOIDANCE_STEP = 10
 STEP_AFTER_OBSTACLE = 14
+# Ultrasonic readings per distance measure, their median is used
+DISTANCE_SAMPLES = 5
+DISTANCE_RATE = 20  # Hz
 
-# Record movements for going back to start point
-movements = []
+# Record of the movements, consecutive steps and opposite spins are merged.
+# The way back is computed from the wheels (see Robot.return_to_start)
+movements = MoveLog()
 
 
 def main():
-    brick = locator.find_one_brick()  # USB connection
+    brick = connect()  # Last brick used first, USB preferred
     robot = Robot(brick, debug=True, power=MOTOR_PWR)
 
     # Sensors
@@ -32,11 +38,11 @@ def main():
 
     # Move until bump into obstacle
     robot.move_forward(until=touch.is_pressed, wait=True)
-    movements.append((20, 'step'))
+    movements.step(20)  # Only an estimate, the odometry knows the real distance
 
     # Gather initial distance to obstacle
     robot.move_backwards(dist=4)
-    initial_dist = us.get_distance()
+    initial_dist = measure_distance(us)
     print(initial_dist, 'initial_dist')
 
     # Try to go around obstacle, loop until obstacle
@@ -69,50 +75,39 @@ def wait_for_loud_sound(rb, sound_sensor):
 
 
 def attempt_detour(rb, us):
-    sleep(1)
-    spin_right_and_save(rb, 250)
-    sleep(1)
-    move_fw_and_save(rb, 20)
-    sleep(1)
-    spin_left_and_save(rb, 250)
-
-    distance_to_obstacle = us.get_distance()
+    # Right, forward and left again without stopping in between
+    rb.plan().spin(250).straight(20).spin(-250).run()
+    movements.spin(250)
+    movements.step(20)
+    movements.spin(-250)
+
+    distance_to_obstacle = measure_distance(us)
     print('dist2box', distance_to_obstacle)
 
     return distance_to_obstacle
 
 
+def measure_distance(us):
+    # A single echo is often wrong, which would end the detour too soon or never
+    return settle(sensor_stream(us, rate=DISTANCE_RATE, read='get_distance'), DISTANCE_SAMPLES,
+                  Median(DISTANCE_SAMPLES))
+
+
 def undo_all_movements(rb):
     rb.debug("Going back to start...")
-    for move in reversed(movements):
-        amount = move[0]
-        move_type = move[1]
-
-        if move_type == 'step':
-            rb.move_backwards(dist=amount)
-        elif move_type == 'r-spin':
-            rb.spin(-amount)
-        elif move_type == 'l-spin':
-            rb.spin(amount)
-
-        movements.pop()
-        sleep(1)
+    rb.debug("Moves made: %s" % movements)
+    if rb.odometry is not None:
+        # One spin and one straight line instead of undoing every move
+        rb.return_to_start()
+        movements.clear()
+    else:
+        movements.undo(rb)
     rb.debug("Done!!!")
 
 
 def move_fw_and_save(rb, dist=10):
     rb.move_forward(dist=dist)
-    movements.append((dist, 'step'))
-
-
-def spin_right_and_save(rb, degrees=250):
-    rb.spin(degrees)
-    movements.append((degrees, 'r-spin'))
-
-
-def spin_left_and_save(rb, degrees=250):
-    rb.spin(-degrees)
-    movements.append((degrees, 'l-spin'))
+    movements.step(dist)
 
 
 if __name__ == '__main__':
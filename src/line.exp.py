@@ -2,7 +2,8 @@ from nxt import locator
 from nxt.sensor.common import PORT_2, PORT_3
 from nxt.motor import PORT_A, PORT_B, PORT_C
 from scripts.helpers import Robot, SERVO_NICE, ON, OFF
-from scripts.helpers import normalize
+from scripts.helpers.line_follower import LineFollower
+from scripts.helpers.conditions import Light, Touch
 from time import sleep
 
 def main():
@@ -23,26 +24,20 @@ def main():
     # Light sensor calibration
     black, white = robot.calibrate_light(interactive=True)
 
-    # Thresholds
-    lower = 4 * (10 ** -1)
+    # Threshold
     upper = 9 * (10 ** -1)
 
-    def until(light_sensor, touch_sensor, **kwargs):
-        return normalize(light_sensor.get_lightness(), black, white) > upper or touch_sensor.is_pressed()
+    # Both the until callable and the follower read the cached values
+    robot.start_sampler(rates={PORT_2: 50})
+
+    # Light is normalized with the calibration. Each sensor is read once per check
+    until = ((Light() > upper) | Touch().pressed).compile(robot)
 
     sleep(1)
-    robot.move_forward(until=until, until_args=(light, touch))
-    while robot.running:
-        light_level = normalize(light.get_lightness(), black, white)
-        if light_level > lower:
-            robot.debug('Current light level: ', light_level)
-            robot.turn_right(8, 15)  # Turn right 15° to see if we correct the course
-            light_level_tmp = normalize(light.get_lightness(), black, white)
-            if light_level_tmp > light_level:
-                robot.debug('Right turn didn\'t improve course. Turning left...')
-                robot.turn_left(8, 30)
-        if not until(light, touch):
-            robot.move_forward(until=until, until_args=(light, touch))
+    # Corrects the course 50 times per second without stopping the robot
+    follower = LineFollower(robot, rate=50)
+    follower.run(until=until)
+    robot.debug('Control loop: %s' % str(follower.report()))
 
     # WARNING: From here, the code is even more experimental.
     # I encourage you to consider this some sort of fancy pseudo-code.
@@ -53,6 +48,7 @@ def main():
         robot.turn_left(power=50, degrees=270 - 45)
         robot.move_forward(dist=50, power=100)  # Dist is given in cm
 
+    robot.stop_sampler()
     robot.turn_light_sensor(OFF)
 
 
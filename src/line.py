@@ -1,7 +1,8 @@
 from time import sleep
 from nxt.sensor import *
 from nxt.motor import *
-from nxt import locator
+from scripts.helpers.utils import Normalizer
+from scripts.helpers.connection import connect
 import _thread
 
 RIGHT = 1
@@ -58,15 +59,11 @@ def calibrate(light):
 	sleep(1)
 	return black, white
 
-def _map(n, start1, stop1, start2, stop2):
-	# See https://github.com/processing/p5.js
- 	return ((n-start1)/(stop1-start1))*(stop2-start2)+start2
-
-def _get_light(l, b, w):
-	return _map(l.get_lightness(), b, w, 0, 1)
+def _get_light(l, normalize):
+	return normalize(l.get_lightness())
 
 def main():
-	b = locator.find_one_brick()
+	b = connect()
 	luz = Light(b, PORT_2)
 	servo = Motor(b, PORT_B)
 	s = get_sync_motor(b)
@@ -75,6 +72,7 @@ def main():
 	set_light_sensor(luz, True)
 
 	black, white = calibrate(luz)
+	normalize = Normalizer(black, white).lookup
 	print('Set the robot in starting position')
 	sleep(5)
 	print('Starting...')
@@ -85,17 +83,17 @@ def main():
 	l = 0.0
 
 	while l < upper_threshold:
-		l = _get_light(luz, black, white)
+		l = _get_light(luz, normalize)
 		if l > lower_threshold:
 			print('Current light level: ', l)
 			turn(s, 8, 15, RIGHT)
-			lright = _get_light(luz, black, white)
+			lright = _get_light(luz, normalize)
 			if lright > l:
 				print('Right turn gave not positive outcome')
 				turn(s, 8, 30, LEFT)
 			s.run(DEFAULT_POWER)
 	
-	print('Finished because light level was:', _get_light(luz, black, white))
+	print('Finished because light level was:', _get_light(luz, normalize))
 	s.idle()
 	s.brake()
 	set_light_sensor(luz, False)
@@ -1,2 +1,5 @@
 from .robot import *
 from .utils import *
+from .async_robot import *
+from .connection import *
+from .fleet import *
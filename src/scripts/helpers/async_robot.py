@@ -0,0 +1,287 @@
+from __future__ import division
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .robot import Robot, RobotError, AVAILABLE_SENSORS, DISTANCE_PER_ROTATION, DEFAULT_SAMPLE_RATE
+from .motors import start_synchronized, ManeuverWatch
+from .tones import compile_morse, DEFAULT_WPM, DEFAULT_FREQUENCY
+
+
+class AsyncSensor(object):
+    def __init__(self, robot, sensor):
+        """
+        Wraps a sensor so that it can be read from a coroutine.
+        :param robot: The AsyncRobot that owns the sensor.
+        :param sensor: The nxt sensor object.
+        """
+        self.robot = robot
+        self.sensor = sensor
+
+    async def read(self):
+        """
+        :return: The sensor sample, read through the robot executor.
+        """
+        return await self.robot.io(self.sensor.get_sample)
+
+    async def stream(self, hz=DEFAULT_SAMPLE_RATE):
+        """
+        Reads the sensor at a fixed rate. Use it as: async for reading in sensor.stream(hz=20)
+        :param hz: How many readings per second.
+        """
+        loop = asyncio.get_running_loop()
+        period = 1 / hz
+        next_read = loop.time()
+        while True:
+            yield await self.read()
+            next_read += period
+            delay = next_read - loop.time()
+            if delay < 0:
+                # Never try to catch up on missed readings
+                next_read = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def __getattr__(self, name):
+        return getattr(self.sensor, name)
+
+
+class AsyncRobot(object):
+    def __init__(self, robot=None, executor=None, **kwargs):
+        """
+        An asyncio front end for Robot. Every command sent to the brick goes through a
+        single executor, so any number of coroutines can share the robot and the event loop.
+        :param robot: The Robot to drive. If none is given, one is created with the kwargs.
+        :param executor: The executor for the brick I/O. Defaults to a single thread.
+        """
+        self.robot = robot if robot is not None else Robot(**kwargs)
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        # The loop of the coroutines waiting for the robot, set by them
+        self._loop = None
+        self._stopped = asyncio.Event()
+        self._sensors = {}
+        self.robot.on_stop(self._on_stop)
+
+    def __getattr__(self, name):
+        # Sensors and anything else not defined here come from the Robot
+        if name in self._sensor_names():
+            return self._sensor(name)
+        return getattr(self.robot, name)
+
+    @staticmethod
+    def _sensor_names():
+        return [sensor.__name__.lower() for sensor in AVAILABLE_SENSORS]
+
+    def _sensor(self, name):
+        sensor = getattr(self.robot, name)
+        if sensor is None:
+            return None
+        wrapper = self._sensors.get(name)
+        if wrapper is None or wrapper.sensor is not sensor:
+            wrapper = self._sensors[name] = AsyncSensor(self, sensor)
+        return wrapper
+
+    async def io(self, func, *args, **kwargs):
+        """
+        Runs a blocking call in the executor.
+        :param func: The callable.
+        :return: Whatever func returns.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        self.executor.shutdown()
+        self.robot.remove_on_stop(self._on_stop)
+
+    # Initialization
+    async def init_light_sensor(self, port):
+        await self.io(self.robot.init_light_sensor, port)
+        return self.light
+
+    async def init_sound_sensor(self, port):
+        await self.io(self.robot.init_sound_sensor, port)
+        return self.sound
+
+    async def init_touch_sensor(self, port):
+        await self.io(self.robot.init_touch_sensor, port)
+        return self.touch
+
+    async def init_ultrasonic_sensor(self, port):
+        await self.io(self.robot.init_ultrasonic_sensor, port)
+        return self.ultrasonic
+
+    async def init_synchronized_motors(self, port_left_motor, port_right_motor):
+        return await self.io(self.robot.init_synchronized_motors, port_left_motor, port_right_motor)
+
+    async def init_servo(self, port):
+        return await self.io(self.robot.init_servo, port)
+
+    # Running state
+    def _on_stop(self, robot):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def _start_running(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped.clear()
+        self.robot.running = True
+
+    async def wait_until_stopped(self, timeout=None):
+        """
+        :param timeout: The maximum amount of seconds to wait. None waits forever.
+        :return: True if the robot is stopped, False if the timeout expired first.
+        """
+        # The robot may have been started by the blocking API, without a loop to notify
+        self._loop = asyncio.get_running_loop()
+        if not self.robot.running:
+            return True
+        # A stop meanwhile is notified through the loop, so after this
+        self._stopped.clear()
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    # Motion
+    async def _maneuver(self, power, degrees, turn_ratio, brake=True):
+        """
+        Runs a tacho limited maneuver. Only one command goes through the executor at a
+        time, so other coroutines can keep using the brick meanwhile.
+        """
+        robot = self.robot
+        move = robot.move
+        leader, target = await self.io(start_synchronized, move, power, degrees, turn_ratio,
+                                       robot._wheel_positions(), brake)
+        follower = move.follower if leader is move.leader else move.leader
+        watch = ManeuverWatch(leader, target, power, follower=follower, degrees=degrees)
+        done = False
+        try:
+            await asyncio.sleep(watch.delay())
+            while robot.running and not done:
+                motor = watch.motor
+                state, tacho = await self.io(motor._read_state)
+                done = watch.done(state, tacho)
+                if not done and watch.motor is motor:
+                    await asyncio.sleep(watch.delay(tacho))
+        finally:
+            # Once done, the brick already braked them at the limit
+            if not done:
+                await self.io(move.leader.brake if brake else move.leader.idle)
+                await self.io(move.follower.brake if brake else move.follower.idle)
+            await self.io(robot._update_pose, watch.positions if done else None)
+
+    async def _move(self, dist=None, until=None, seconds=None, power=None, brake=False, poll_rate=None,
+                    until_args=(), until_kwargs=None):
+        robot = self.robot
+        if not robot.move:
+            raise RobotError(
+                'Cannot move without a synchronized motor bound to self.move. '
+                'Invoke "init_synchronized_motors"'
+            )
+        if until is not None and not callable(until):
+            raise RobotError('Parameter "until" must be a callable and must return boolean')
+        if until_kwargs is None:
+            until_kwargs = {}
+        if poll_rate is None:
+            poll_rate = robot.poll_rate
+
+        self._start_running()
+        try:
+            if dist is not None:
+                degrees = (dist / DISTANCE_PER_ROTATION) * 360
+                await self._maneuver(power if degrees > 0 else -power, abs(degrees), 0)
+                robot.running = False
+                return
+
+            await self.io(robot.move.run, power)
+            if until is not None:
+                while robot.running:
+                    if asyncio.iscoroutinefunction(until):
+                        done = await until(*until_args, **until_kwargs)
+                    else:
+                        done = await self.io(until, *until_args, **until_kwargs)
+                    if done or await self.wait_until_stopped(1 / poll_rate):
+                        break
+            elif seconds is not None:
+                await self.wait_until_stopped(seconds)
+            else:
+                # Like Robot, it is up to the developer to stop the robot
+                return
+
+            if robot.running:
+                await self.stop(brake)
+        except BaseException:
+            robot.running = False
+            raise
+
+    async def move_forward(self, dist=None, until=None, seconds=None, until_args=(), until_kwargs=None, **kwargs):
+        """
+        Same as Robot.move_forward, but the coroutine ends once the robot stops.
+        The until callable can be a coroutine function. Blocking callables are run in the executor.
+        """
+        await self._move(dist=dist, until=until, seconds=seconds, until_args=until_args,
+                         until_kwargs=until_kwargs, power=kwargs.get('power', self.robot.power),
+                         brake=kwargs.get('brake', False), poll_rate=kwargs.get('poll_rate'))
+
+    async def move_backwards(self, dist=None, until=None, seconds=None, until_args=(), until_kwargs=None,
+                             **kwargs):
+        """
+        Same as Robot.move_backwards, but the coroutine ends once the robot stops.
+        """
+        power = kwargs.get('power', self.robot.power)
+        assert power > 0
+        await self._move(dist=dist, until=until, seconds=seconds, until_args=until_args,
+                         until_kwargs=until_kwargs, power=power * -1, brake=kwargs.get('brake', False),
+                         poll_rate=kwargs.get('poll_rate'))
+
+    async def spin(self, degrees, power=None):
+        """
+        Same as Robot.spin.
+        """
+        robot = self.robot
+        if robot.move is None:
+            raise RobotError(
+                'Cannot move without a synchronized motor bound to self.move. '
+                'Invoke "init_synchronized_motors"'
+            )
+        if power is None:
+            power = robot.power
+        if not robot.synchronized_turns:
+            return await self.io(robot.spin, degrees, power)
+
+        self._start_running()
+        try:
+            await self._maneuver(power if degrees > 0 else -power, abs(degrees), 100)
+        finally:
+            robot.running = False
+
+    async def stop(self, brake=False):
+        await self.io(self.robot.stop, brake)
+
+    # Others
+    async def morse(self, message, wpm=DEFAULT_WPM, freq=DEFAULT_FREQUENCY):
+        """
+        Same as Robot.morse, but the tones are scheduled in the event loop. Cancelling the
+        coroutine silences the brick.
+        """
+        self.robot.debug('Playing message: %s' % message)
+        schedule = compile_morse(message, wpm, freq)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            for tone in schedule.tones:
+                await asyncio.sleep(max(start + tone.start - loop.time(), 0))
+                await self.io(self.robot.brick.play_tone, tone.frequency, tone.duration)
+            await asyncio.sleep(max(start + schedule.duration - loop.time(), 0))
+        except asyncio.CancelledError:
+            await asyncio.shield(self.io(self.robot.brick.stop_sound_playback))
+            raise
+
+    async def set_servo(self, position, power=None, degrees=None):
+        await self.io(self.robot.set_servo, position, power, degrees)
+
+    async def turn_light_sensor(self, state):
+        await self.io(self.robot.turn_light_sensor, state)
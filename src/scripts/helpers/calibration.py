@@ -0,0 +1,101 @@
+from __future__ import division
+
+import os
+import json
+import time
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+try:
+    from appdirs import user_cache_dir
+except ImportError:
+    def user_cache_dir(appname):
+        return os.path.join(os.path.expanduser('~'), '.cache', appname)
+
+# Calibrations older than this (in seconds) are ignored
+DEFAULT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def default_cache_path():
+    return os.path.join(user_cache_dir('nxt-scripts'), 'calibration.json')
+
+
+def brick_identity(brick):
+    """
+    Returns a string that identifies the brick: its bluetooth address if it
+    can be asked for, otherwise the address of its connection.
+    :param brick: The brick.
+    """
+    try:
+        name, host = brick.get_device_info()[:2]
+        return '%s@%s' % (name.strip('\0'), host)
+    except Exception:
+        return str(getattr(brick.sock, 'host', None) or 'unknown')
+
+
+class CalibrationCache(object):
+    def __init__(self, path=None, max_age=DEFAULT_MAX_AGE):
+        """
+        Stores calibration values on disk, keyed by brick, port and sensor type.
+        :param path: The JSON file. Defaults to the user cache directory.
+        :param max_age: Seconds after which a calibration expires. None never expires them.
+        """
+        self.path = path if path is not None else default_cache_path()
+        self.max_age = max_age
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(brick_id, port, sensor_type):
+        return '%s/%s/%s' % (brick_id, str(port), sensor_type)
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path) as f:
+                    self._entries = json.load(f)
+            except (IOError, OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        # Write and rename, so that a crash never leaves a corrupt cache behind
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def get(self, brick_id, port, sensor_type):
+        """
+        :return: The tuple of calibration values or None if there is none or it expired.
+        """
+        with self._lock:
+            entry = self._load().get(self.key(brick_id, port, sensor_type))
+        if entry is None:
+            return None
+        if self.max_age is not None and time.time() - entry['timestamp'] > self.max_age:
+            return None
+        return tuple(entry['values'])
+
+    def put(self, brick_id, port, sensor_type, values):
+        """
+        Stores the calibration values and writes the cache file.
+        :param values: A sequence of numbers.
+        """
+        with self._lock:
+            self._load()[self.key(brick_id, port, sensor_type)] = {
+                'values': list(values),
+                'timestamp': time.time(),
+            }
+            self._save()
+
+    def invalidate(self, brick_id, port, sensor_type):
+        with self._lock:
+            if self._load().pop(self.key(brick_id, port, sensor_type), None) is not None:
+                self._save()
@@ -0,0 +1,276 @@
+from __future__ import division
+
+import operator
+from time import time
+
+from .robot import RobotError
+
+# Relative cost of evaluating a term, cheaper terms are evaluated first
+FREE = 0
+SAMPLED = 1  # The latest value kept by the robot's sampler
+BUS_READ = 10  # A round trip to the brick
+
+
+class Condition(object):
+    """
+    A declarative stop condition, e.g. (Light() > .9) | Touch().pressed | Elapsed(3).
+    Combine conditions with |, & and ~. Mind the parentheses: | binds tighter than >.
+    Robot.move_forward accepts one as until, otherwise compile it for the robot.
+    """
+
+    def __or__(self, other):
+        return Any(self, other)
+
+    def __and__(self, other):
+        return All(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    def _compile(self, robot, tick):
+        """
+        :param robot: The Robot the condition is evaluated on.
+        :param tick: The dict where the values read during the current evaluation are kept.
+        :return: A (callable returning a boolean, cost) tuple.
+        """
+        raise NotImplementedError()
+
+    def compile(self, robot):
+        """
+        :return: A CompiledCondition to evaluate the condition on the robot.
+        """
+        return CompiledCondition(self, robot)
+
+
+def _condition(value):
+    if isinstance(value, Condition):
+        return value
+    if callable(value):
+        return Predicate(value)
+    raise TypeError('Cannot make a condition of %r' % value)
+
+
+class CompiledCondition(object):
+    def __init__(self, condition, robot):
+        """
+        A condition bound to a robot. Every call is a tick: each sensor is read at most once
+        per tick, the cheap terms are evaluated first and the evaluation stops as soon as the
+        result is known. Any arguments are ignored, so it can stand for an until callable.
+        """
+        self.condition = condition
+        self.robot = robot
+        self.ticks = 0
+        self.started = None
+        self._tick = {}
+        self._check, self.cost = condition._compile(robot, self._tick)
+
+    def reset(self):
+        """
+        Restarts the Elapsed terms.
+        """
+        self.started = None
+
+    def __call__(self, *args, **kwargs):
+        if self.started is None:
+            self.started = time()
+        self.ticks += 1
+        self._tick.clear()
+        self._tick['now'] = time()
+        self._tick['started'] = self.started
+        return self._check()
+
+    def __repr__(self):
+        return 'CompiledCondition(%r)' % self.condition
+
+
+class _Group(Condition):
+    symbol = None
+
+    def __init__(self, *conditions):
+        flat = []
+        for condition in map(_condition, conditions):
+            # (a | b) | c is evaluated as a single a | b | c
+            flat.extend(condition.conditions if type(condition) is type(self) else [condition])
+        self.conditions = tuple(flat)
+
+    def _compile_children(self, robot, tick):
+        compiled = [condition._compile(robot, tick) for condition in self.conditions]
+        # sorted is stable, terms of the same cost keep the order they were written in
+        compiled = sorted(compiled, key=lambda item: item[1])
+        return [check for check, _ in compiled], sum(cost for _, cost in compiled)
+
+    def __repr__(self):
+        return '(%s)' % (' %s ' % self.symbol).join(map(repr, self.conditions))
+
+
+class Any(_Group):
+    symbol = '|'
+
+    def _compile(self, robot, tick):
+        checks, cost = self._compile_children(robot, tick)
+
+        def check():
+            for child in checks:
+                if child():
+                    return True
+            return False
+        return check, cost
+
+
+class All(_Group):
+    symbol = '&'
+
+    def _compile(self, robot, tick):
+        checks, cost = self._compile_children(robot, tick)
+
+        def check():
+            for child in checks:
+                if not child():
+                    return False
+            return True
+        return check, cost
+
+
+class Not(Condition):
+    def __init__(self, condition):
+        self.condition = _condition(condition)
+
+    def _compile(self, robot, tick):
+        child, cost = self.condition._compile(robot, tick)
+        return lambda: not child(), cost
+
+    def __repr__(self):
+        return '~%r' % self.condition
+
+
+class Predicate(Condition):
+    def __init__(self, func, cost=BUS_READ):
+        """
+        Any callable without arguments, e.g. touch.is_pressed. Its cost cannot be known, so it
+        is assumed to read the brick.
+        """
+        self.func = func
+        self.cost = cost
+
+    def _compile(self, robot, tick):
+        return self.func, self.cost
+
+    def __repr__(self):
+        return getattr(self.func, '__name__', repr(self.func))
+
+
+class Elapsed(Condition):
+    def __init__(self, seconds):
+        """
+        True once the given seconds went by since the condition was first evaluated.
+        """
+        self.seconds = seconds
+
+    def _compile(self, robot, tick):
+        return lambda: tick['now'] - tick['started'] >= self.seconds, FREE
+
+    def __repr__(self):
+        return 'Elapsed(%g)' % self.seconds
+
+
+class Compare(Condition):
+    def __init__(self, reading, op, threshold):
+        self.reading = reading
+        self.op = op
+        self.threshold = threshold
+
+    def _compile(self, robot, tick):
+        read, cost = self.reading._compile_read(robot, tick)
+        op, threshold = self.op, self.threshold
+        return lambda: op(read(), threshold), cost
+
+    def __repr__(self):
+        symbols = {operator.gt: '>', operator.ge: '>=', operator.lt: '<', operator.le: '<=',
+                   operator.eq: '==', operator.ne: '!='}
+        return '%r %s %r' % (self.reading, symbols.get(self.op, self.op), self.threshold)
+
+
+class Reading(object):
+    # The robot attribute holding the sensor and the one holding its normalizer, if any
+    sensor_name = None
+    normalizer_name = None
+
+    def __init__(self, port=None, normalized=True):
+        """
+        The value of one of the robot sensors. Compare it to get a Condition, e.g. Light() > .9.
+        :param port: The port of the sensor, to check that the robot has it there. Defaults to
+        whatever port the robot's sensor is at.
+        :param normalized: Whether to normalize the value with the robot calibration, if it was
+        calibrated before the condition is compiled.
+        """
+        self.port = port
+        self.normalized = normalized
+
+    def _compile_read(self, robot, tick):
+        name = self.sensor_name
+        sensor = getattr(robot, name, None)
+        if sensor is None:
+            raise RobotError('No %s sensor to read. Invoke "init_%s_sensor"' % (name, name))
+        if self.port is not None and sensor.port != self.port:
+            raise RobotError('The %s sensor is at port %s, not %s' % (name, str(sensor.port), str(self.port)))
+        normalize = getattr(robot, self.normalizer_name) if self.normalized and self.normalizer_name else None
+        # The readings are raw integers, a Normalizer can use its table directly
+        normalize = getattr(normalize, 'lookup', normalize)
+        key = 'read_%s' % name
+
+        def read():
+            value = tick.get(key)
+            if value is None:
+                # Taken from the sampler when it is running
+                value = robot.reading(name)
+                if normalize is not None:
+                    value = normalize(value)
+                tick[key] = value
+            return value
+
+        sampled = robot.sampler is not None and robot.sampler.running
+        return read, SAMPLED if sampled else BUS_READ
+
+    def __gt__(self, threshold):
+        return Compare(self, operator.gt, threshold)
+
+    def __ge__(self, threshold):
+        return Compare(self, operator.ge, threshold)
+
+    def __lt__(self, threshold):
+        return Compare(self, operator.lt, threshold)
+
+    def __le__(self, threshold):
+        return Compare(self, operator.le, threshold)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, '' if self.port is None else str(self.port))
+
+
+class Light(Reading):
+    sensor_name = 'light'
+    normalizer_name = 'light_normalizer'
+
+
+class Sound(Reading):
+    sensor_name = 'sound'
+    normalizer_name = 'sound_normalizer'
+
+
+class Ultrasonic(Reading):
+    """
+    The distance in centimeters.
+    """
+    sensor_name = 'ultrasonic'
+
+
+class Touch(Reading):
+    sensor_name = 'touch'
+
+    @property
+    def pressed(self):
+        return Compare(self, operator.eq, True)
+
+    @property
+    def released(self):
+        return Compare(self, operator.eq, False)
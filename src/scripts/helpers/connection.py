@@ -0,0 +1,262 @@
+from __future__ import print_function
+from __future__ import division
+
+from nxt.locator import find_bricks, Method, BrickNotFoundError
+
+import os
+import json
+import time
+
+from .utils import BrickWrapper
+from .calibration import user_cache_dir
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# How many keep alive commands are timed to compare two connections
+LATENCY_PROBES = 5
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = .5
+# Errors that mean the link is gone. USB and Bluetooth errors are both IOErrors
+LINK_ERRORS = (IOError, OSError)
+
+
+def default_state_path():
+    return os.path.join(user_cache_dir('nxt-scripts'), 'connection.json')
+
+
+def find_socks(host=None, name=None, record=None):
+    """
+    Yields the sockets of the bricks that can be connected to.
+    :param host: Only look for the brick with this address.
+    :param name: Only look for the brick with this name.
+    :param record: A dict with the type and host of a known brick. Only that brick is looked
+    for, without scanning: a Bluetooth brick is connected to directly and only the USB bus is
+    enumerated for a USB brick.
+    """
+    if record is None:
+        for sock in find_bricks(host, name, silent=True, method=Method()):
+            yield sock
+    elif record['type'] == 'bluetooth':
+        try:
+            from nxt.bluesock import BlueSock
+        except ImportError:
+            return
+        yield BlueSock(record['host'])
+    else:
+        try:
+            from nxt import usbsock
+        except ImportError:
+            return
+        for sock in usbsock.find_bricks():
+            yield sock
+
+
+def measure_latency(brick, probes=LATENCY_PROBES):
+    """
+    :return: The average seconds of a round trip to the brick.
+    """
+    start = time.time()
+    for _ in range(probes):
+        brick.keep_alive()
+    return (time.time() - start) / probes
+
+
+def _close(brick):
+    try:
+        brick.sock.close()
+    except Exception:
+        pass
+
+
+class ConnectionManager(object):
+    def __init__(self, host=None, name=None, path=None, probe=True, debug=False, finder=find_socks):
+        """
+        Connects to a brick, trying the last brick and connection that worked first.
+        :param host: Only connect to the brick with this address.
+        :param name: Only connect to the brick with this name.
+        :param path: The JSON file where the last connection is remembered.
+        Defaults to the user cache directory.
+        :param probe: Whether to measure every connection found when scanning and keep the
+        fastest one (e.g. USB over Bluetooth) instead of the first one.
+        :param debug: Whether print debug messages or not.
+        :param finder: Callable with the signature of find_socks.
+        """
+        self.host = host
+        self.name = name
+        self.path = path if path is not None else default_state_path()
+        self.probe = probe
+        self.debug = print if debug else lambda *x, **y: None
+        self.finder = finder
+
+    def load(self):
+        """
+        :return: The record of the last connection, or None if there is none or it is not usable.
+        """
+        try:
+            with open(self.path) as f:
+                record = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if not isinstance(record, dict) or 'type' not in record or 'host' not in record:
+            return None
+        return record
+
+    def save(self, brick, info):
+        record = {'type': brick.sock.type, 'host': info[1], 'name': info[0].strip('\0')}
+        try:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            # Fleet processes share the file: write and rename, so that nobody reads half of it
+            tmp = '%s.%d.%d.tmp' % (self.path, os.getpid(), threading.current_thread().ident)
+            with open(tmp, 'w') as f:
+                json.dump(record, f)
+            os.replace(tmp, self.path)
+        except (IOError, OSError) as e:
+            self.debug('Could not remember the connection: %s' % str(e))
+        return record
+
+    def _matches(self, info):
+        if self.host is not None and info[1] != self.host:
+            return False
+        if self.name is not None and info[0].strip('\0') != self.name:
+            return False
+        return True
+
+    def _connect_known(self, record):
+        if (self.host is not None and record.get('host') != self.host) or \
+                (self.name is not None and record.get('name') != self.name):
+            return None
+
+        for sock in self.finder(record=record):
+            try:
+                brick = sock.connect()
+                info = brick.get_device_info()
+            except Exception as e:
+                self.debug('Could not connect to %s: %s' % (str(sock), str(e)))
+                continue
+            if info[1] == record['host']:
+                return brick, info
+            _close(brick)
+        return None
+
+    def _scan(self):
+        found = []
+        for sock in self.finder(host=self.host, name=self.name):
+            try:
+                brick = sock.connect()
+                info = brick.get_device_info()
+            except Exception as e:
+                self.debug('Could not connect to %s: %s' % (str(sock), str(e)))
+                continue
+            if not self._matches(info):
+                _close(brick)
+                continue
+            found.append((brick, info))
+            if not self.probe:
+                break
+
+        if not found:
+            raise BrickNotFoundError
+        if len(found) == 1:
+            return found[0]
+
+        latencies = [measure_latency(brick) for brick, info in found]
+        for (brick, info), latency in zip(found, latencies):
+            self.debug('%s: %.1f ms per command' % (str(brick.sock), latency * 1000))
+        fastest = latencies.index(min(latencies))
+        for i, (brick, info) in enumerate(found):
+            if i != fastest:
+                _close(brick)
+        return found[fastest]
+
+    def open(self):
+        """
+        Connects to a brick.
+        :return: The nxt brick (not managed, see self.connect).
+        """
+        record = self.load()
+        result = None
+        if record is not None:
+            self.debug('Trying the last connection: %s %s' % (record['type'], record['host']))
+            result = self._connect_known(record)
+        if result is None:
+            self.debug('Looking for bricks...')
+            result = self._scan()
+
+        brick, info = result
+        self.save(brick, info)
+        self.debug('Connected to %s through %s' % (info[0].strip('\0'), str(brick.sock)))
+        return brick
+
+    def connect(self):
+        """
+        :return: A ManagedBrick, which reconnects by itself if the connection is lost.
+        """
+        return ManagedBrick(self.open(), self)
+
+
+class ManagedBrick(BrickWrapper):
+    def __init__(self, brick, manager, attempts=RECONNECT_ATTEMPTS, delay=RECONNECT_DELAY):
+        """
+        A brick that reconnects when the link is lost and retries the failed command.
+        Motors and sensors keep working since they hold this object, not the connection.
+        :param brick: The connected brick.
+        :param manager: The ConnectionManager used to reconnect.
+        :param attempts: How many times to try to reconnect before giving up.
+        :param delay: Seconds between two reconnection attempts.
+        """
+        super(ManagedBrick, self).__init__(brick)
+        self.manager = manager
+        self.attempts = attempts
+        self.delay = delay
+        self.reconnects = 0
+        self._reconnect_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = super(ManagedBrick, self).__getattr__(name)
+        if not callable(attr):
+            return attr
+
+        def command(*args, **kwargs):
+            brick = self.brick
+            try:
+                return attr(*args, **kwargs)
+            except LINK_ERRORS as e:
+                self.manager.debug('Lost the connection (%s). Reconnecting...' % str(e))
+                self.reconnect(brick)
+            return getattr(self.brick, name)(*args, **kwargs)
+
+        command.__name__ = name
+        return command
+
+    def reconnect(self, broken=None):
+        """
+        Replaces the connection.
+        :param broken: The brick that failed. If another thread already replaced it, nothing is done.
+        """
+        with self._reconnect_lock:
+            if broken is not None and broken is not self.brick:
+                return
+            _close(self.brick)
+            error = None
+            for attempt in range(self.attempts):
+                try:
+                    self.brick = self.manager.open()
+                    self.reconnects += 1
+                    return
+                except Exception as e:
+                    error = e
+                    time.sleep(self.delay)
+            raise error
+
+
+def connect(host=None, name=None, debug=False):
+    """
+    Connects to a brick, see ConnectionManager.
+    :return: A ManagedBrick.
+    """
+    return ConnectionManager(host=host, name=name, debug=debug).connect()
@@ -0,0 +1,461 @@
+from __future__ import print_function
+from __future__ import division
+
+import os
+import sys
+import time
+import errno
+import socket
+import struct
+import pickle
+import argparse
+import traceback
+import importlib.util
+
+from .robot import Robot, RobotError
+from .calibration import user_cache_dir
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# Every message is a pickle preceded by its length
+FRAME = struct.Struct('<I')
+MAX_MESSAGE = 64 * 1024 * 1024
+SOCKET_MODE = 0o600
+# Seconds a client waits for the daemon socket to accept the connection
+CONNECT_TIMEOUT = 5
+
+# Requests
+CALL = 'call'
+RUN = 'run'
+SCRIPT = 'script'
+RELEASE = 'release'
+PING = 'ping'
+SHUTDOWN = 'shutdown'
+
+# Robot attributes that are used without waiting for the request holding the robot,
+# so that any client can stop a robot that another one is moving
+UNLOCKED = ('stop', 'running')
+
+# Replies
+OK = 'ok'
+REF = 'ref'
+ERROR = 'error'
+
+
+def default_socket_path():
+    directory = os.environ.get('XDG_RUNTIME_DIR') or user_cache_dir('nxt-scripts')
+    return os.path.join(directory, 'nxt-robot.sock')
+
+
+class RemoteError(RobotError):
+    def __init__(self, message, remote_traceback=None):
+        """
+        An exception raised by the daemon that could not be sent back as it was.
+        :param message: The exception as text.
+        :param remote_traceback: The formatted traceback in the daemon.
+        """
+        super(RemoteError, self).__init__(message)
+        self.remote_traceback = remote_traceback
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError('The connection was closed')
+        data += chunk
+    return bytes(data)
+
+
+def send_message(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(FRAME.pack(len(data)) + data)
+
+
+def _recv_frame(sock):
+    size, = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+    if size > MAX_MESSAGE:
+        raise RobotError('Message of %d bytes is too big' % size)
+    return _recv_exactly(sock, size)
+
+
+def recv_message(sock):
+    return pickle.loads(_recv_frame(sock))
+
+
+def resolve(obj, path):
+    """
+    Looks up a dotted attribute path, e.g. 'left_motor.get_tacho'. Private attributes cannot be reached.
+    """
+    for name in path.split('.') if path else ():
+        if name.startswith('_'):
+            raise AttributeError('Cannot access the private attribute %s' % name)
+        obj = getattr(obj, name)
+    return obj
+
+
+def load_script(path, _modules={}):
+    """
+    Imports a script by its file path. It is imported again only if the file changed.
+    :return: The module.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _modules.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    name = '_nxt_script_%d' % len(_modules)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    # Scripts import each other relative to their directory, as when they are run directly
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec.loader.exec_module(module)
+    _modules[path] = mtime, module
+    return module
+
+
+class RobotDaemon(object):
+    def __init__(self, robot, path=None, debug=True):
+        """
+        Keeps a connected and initialized Robot in a long-running process and serves it on a
+        Unix socket, so that scripts skip the imports, the brick lookup and the sensor setup.
+        Only the user that started the daemon can connect to the socket: the requests are
+        pickles and executing them is as powerful as running any script.
+        Several clients can be connected, but only one request uses the robot at a time, so
+        the motor commands of two scripts are never interleaved. Only stop and running are
+        served at once, so that a client can stop the robot while another one is moving it.
+        :param robot: The Robot, or a callable returning it, which is invoked once by serve.
+        :param path: The socket path. Defaults to default_socket_path().
+        :param debug: Whether print debug messages or not.
+        """
+        self.robot = robot
+        self.path = path if path is not None else default_socket_path()
+        self.debug = print if debug else lambda *x, **y: None
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        # Held while a request uses the robot
+        self._robot_lock = threading.Lock()
+        self._server = None
+        self._stop = threading.Event()
+
+    def _bind(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except socket.error:
+                # Left behind by a daemon that died
+                os.unlink(self.path)
+            else:
+                raise RobotError('A daemon is already listening on %s' % self.path)
+            finally:
+                probe.close()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket must never exist with wider permissions, not even before the chmod
+        umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(umask)
+        os.chmod(self.path, SOCKET_MODE)
+        server.listen(8)
+        server.settimeout(.2)
+        return server
+
+    def _open(self):
+        if not isinstance(self.robot, Robot) and callable(self.robot):
+            self.robot = self.robot()
+        self._server = self._bind()
+        self.debug('Robot daemon listening on %s' % self.path)
+
+    def serve(self):
+        """
+        Accepts clients until shutdown is invoked, each one in its own thread.
+        """
+        self._open()
+        self._accept()
+
+    def _accept(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    conn, _ = self._server.accept()
+                except socket.timeout:
+                    continue
+                conn.settimeout(None)
+                thread = threading.Thread(target=self._handle, args=(conn,), name='RobotDaemonClient')
+                thread.daemon = True
+                thread.start()
+        finally:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    def start(self):
+        """
+        Same as serve, but accepts the clients in a background thread.
+        :return: The thread. The socket accepts connections already.
+        """
+        self._open()
+        thread = threading.Thread(target=self._accept, name='RobotDaemon')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self._stop.set()
+
+    def _handle(self, conn):
+        # Objects that could not be pickled, kept for this client only
+        refs = {}
+        try:
+            while True:
+                try:
+                    data = _recv_frame(conn)
+                except EOFError:
+                    return
+                with self._requests_lock:
+                    self.requests += 1
+                request = None,
+                try:
+                    # e.g. a function defined in the __main__ of the client cannot be unpickled here
+                    request = pickle.loads(data)
+                    reply = self._execute(request, refs)
+                except Exception as e:
+                    reply = self._error(e)
+                try:
+                    send_message(conn, reply)
+                except (pickle.PicklingError, TypeError, AttributeError):
+                    ref = id(reply[1])
+                    refs[ref] = reply[1]
+                    send_message(conn, (REF, ref, repr(reply[1])))
+                if request[0] == SHUTDOWN:
+                    self.shutdown()
+                    return
+        except socket.error as e:
+            if e.errno not in (errno.EPIPE, errno.ECONNRESET):
+                self.debug('Robot daemon client failed: %s' % str(e))
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _error(e):
+        remote_traceback = traceback.format_exc()
+        try:
+            pickle.loads(pickle.dumps(e))
+            return ERROR, e, remote_traceback
+        except Exception:
+            return ERROR, RemoteError('%s: %s' % (type(e).__name__, str(e)), remote_traceback), remote_traceback
+
+    def _execute(self, request, refs):
+        kind = request[0]
+        if kind == RELEASE:
+            refs.pop(request[1], None)
+            return OK, None
+        if kind in (PING, SHUTDOWN):
+            return OK, self.requests
+        if kind not in (CALL, RUN, SCRIPT):
+            raise RobotError('Unknown request %r' % kind)
+
+        if kind == CALL and request[1] is None and request[2] in UNLOCKED:
+            return self._call(request, refs)
+        with self._robot_lock:
+            if kind == CALL:
+                return self._call(request, refs)
+            if kind == RUN:
+                _, func, args, kwargs = request
+                return OK, func(self.robot, *args, **kwargs)
+            _, path, name, args, kwargs = request
+            return OK, getattr(load_script(path), name)(self.robot, *args, **kwargs)
+
+    def _call(self, request, refs):
+        _, ref, path, args, kwargs = request
+        target = resolve(self.robot if ref is None else refs[ref], path)
+        return OK, target(*args, **kwargs) if callable(target) else target
+
+
+class RemoteObject(object):
+    def __init__(self, client, ref=None, path='', description=None):
+        """
+        Stands for an object in the daemon: attributes are looked up remotely and calls are
+        executed there, e.g. client.robot.left_motor.get_tacho().
+        :param client: The RobotClient.
+        :param ref: The daemon object the path starts from. None for the robot.
+        :param path: The dotted attribute path.
+        :param description: The repr of the object in the daemon.
+        """
+        self._client = client
+        self._ref = ref
+        self._path = path
+        self._description = description
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return RemoteObject(self._client, self._ref, '%s.%s' % (self._path, name) if self._path else name)
+
+    def __call__(self, *args, **kwargs):
+        return self._client.request(CALL, self._ref, self._path, args, kwargs)
+
+    def fetch(self):
+        """
+        :return: The value of the attribute, e.g. client.robot.power.fetch().
+        """
+        return self._client.request(CALL, self._ref, self._path, (), {}) if self._path else self
+
+    def __repr__(self):
+        if self._description is not None:
+            return '<remote %s>' % self._description
+        return '<remote robot%s>' % ('.' + self._path if self._path else '')
+
+
+class RobotClient(object):
+    def __init__(self, path=None, timeout=CONNECT_TIMEOUT):
+        """
+        Connects to a RobotDaemon. Calls are executed one at a time; the callables given as
+        arguments (e.g. until) must be picklable, so use run or run_script for anything else.
+        :param path: The socket path. Defaults to default_socket_path().
+        :param timeout: Seconds to wait for the daemon to accept the connection.
+        """
+        self.path = path if path is not None else default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(self.path)
+        except socket.error as e:
+            self.sock.close()
+            raise RobotError('Cannot connect to the robot daemon at %s: %s' % (self.path, str(e)))
+        # Commands such as move_forward(wait=True) take as long as the robot needs
+        self.sock.settimeout(None)
+        self.lock = threading.Lock()
+        self.robot = RemoteObject(self)
+
+    def request(self, *request):
+        with self.lock:
+            send_message(self.sock, request)
+            reply = recv_message(self.sock)
+        if reply[0] == OK:
+            return reply[1]
+        if reply[0] == REF:
+            return RemoteObject(self, reply[1], description=reply[2])
+        raise reply[1]
+
+    def call(self, path, *args, **kwargs):
+        """
+        Invokes a method of the robot, e.g. call('move_forward', dist=10).
+        """
+        return self.request(CALL, None, path, args, kwargs)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Runs func(robot, *args, **kwargs) in the daemon. func is pickled by reference, so the
+        daemon must be able to import it.
+        :return: What func returns.
+        """
+        return self.request(RUN, func, args, kwargs)
+
+    def run_script(self, path, name='main', *args, **kwargs):
+        """
+        Runs a function of a script file in the daemon, giving it the robot as first argument.
+        The script is imported once and again only when it changes.
+        :param path: The script file.
+        :param name: The function.
+        :return: What the function returns.
+        """
+        return self.request(SCRIPT, os.path.abspath(path), name, args, kwargs)
+
+    def stop(self, brake=False):
+        """
+        Stops the robot, even while the request of another client is moving it. The requests
+        of this client are sent one at a time, so use another client for that.
+        :param brake: Whether the motors should be braked after stop them.
+        """
+        return self.call('stop', brake=brake)
+
+    def release(self, remote):
+        """
+        Lets the daemon forget an object returned as a RemoteObject.
+        """
+        if remote._ref is not None:
+            self.request(RELEASE, remote._ref)
+
+    def ping(self):
+        """
+        :return: The round trip time in seconds.
+        """
+        start = time.time()
+        self.request(PING)
+        return time.time() - start
+
+    def shutdown(self):
+        """
+        Stops the daemon once this request is answered.
+        """
+        self.request(SHUTDOWN)
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Keeps a robot connected and serves it to the scripts.')
+    parser.add_argument('--socket', default=None, help='The socket path. Defaults to %s' % default_socket_path())
+    parser.add_argument('--host', default=None, help='The address of the brick.')
+    parser.add_argument('--motors', nargs=2, default=('A', 'C'), metavar=('LEFT', 'RIGHT'),
+                        help='The ports of the synchronized motors.')
+    parser.add_argument('--servo', default=None, help='The port of the servo motor.')
+    for sensor in ('light', 'touch', 'sound', 'ultrasonic'):
+        parser.add_argument('--%s' % sensor, type=int, default=None, help='The port of the %s sensor.' % sensor)
+    parser.add_argument('--power', type=int, default=100)
+    parser.add_argument('--quiet', action='store_true')
+    options = parser.parse_args(argv)
+
+    from nxt.motor import PORT_A, PORT_B, PORT_C
+    from .connection import connect
+    motor_ports = {'A': PORT_A, 'B': PORT_B, 'C': PORT_C}
+
+    def create():
+        robot = Robot(connect(host=options.host, debug=not options.quiet), debug=not options.quiet,
+                      power=options.power)
+        robot.init_synchronized_motors(*[motor_ports[port.upper()] for port in options.motors])
+        if options.servo is not None:
+            robot.init_servo(motor_ports[options.servo.upper()])
+        for sensor in ('light', 'touch', 'sound', 'ultrasonic'):
+            port = getattr(options, sensor)
+            if port is not None:
+                # The ports are numbered from 1 as on the brick
+                getattr(robot, 'init_%s_sensor' % sensor)(port - 1)
+        return robot
+
+    daemon = RobotDaemon(create, options.socket, debug=not options.quiet)
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if isinstance(daemon.robot, Robot):
+            daemon.robot.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+from __future__ import division
+
+from bisect import insort, bisect_left
+from collections import deque
+from itertools import islice
+from math import sqrt
+from time import time, sleep
+
+
+class Filter(object):
+    """
+    A streaming filter: update takes one reading and returns the filtered value, keeping a
+    small state of constant size. stream applies it lazily to an iterable of readings.
+    """
+
+    def update(self, value):
+        raise NotImplementedError()
+
+    def reset(self):
+        pass
+
+    def __call__(self, value):
+        return self.update(value)
+
+    def stream(self, values):
+        for value in values:
+            yield self.update(value)
+
+
+class Median(Filter):
+    def __init__(self, window=5):
+        """
+        The median of the last readings. Removes spikes shorter than half the window.
+        :param window: How many readings. Odd sizes avoid averaging the middle two.
+        """
+        if window < 1:
+            raise ValueError('The window must have at least one reading')
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self._values = deque()
+        self._sorted = []
+
+    def update(self, value):
+        self._values.append(value)
+        insort(self._sorted, value)
+        if len(self._values) > self.window:
+            del self._sorted[bisect_left(self._sorted, self._values.popleft())]
+        n = len(self._sorted)
+        if n % 2:
+            return self._sorted[n // 2]
+        return (self._sorted[n // 2 - 1] + self._sorted[n // 2]) / 2
+
+
+class EMA(Filter):
+    def __init__(self, alpha=None, span=None):
+        """
+        Exponential moving average.
+        :param alpha: The weight of every new reading, between 0 and 1.
+        :param span: Alternatively, the amount of readings averaged: alpha = 2 / (span + 1).
+        """
+        if alpha is None:
+            if span is None:
+                raise ValueError('Either alpha or span must be given')
+            alpha = 2 / (span + 1)
+        if not 0 < alpha <= 1:
+            raise ValueError('Alpha must be between 0 and 1')
+        self.alpha = alpha
+        self.value = None
+
+    def reset(self):
+        self.value = None
+
+    def update(self, value):
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class Debounce(Filter):
+    def __init__(self, count=3):
+        """
+        Only lets a new value through once it is read that many times in a row, e.g. for a
+        touch sensor or the result of a threshold.
+        :param count: How many consecutive readings.
+        """
+        self.count = count
+        self.reset()
+
+    def reset(self):
+        self.value = None
+        self._candidate = None
+        self._seen = 0
+
+    def update(self, value):
+        if self.value is None or value == self.value:
+            self.value = value
+            self._seen = 0
+        elif value == self._candidate:
+            self._seen += 1
+            if self._seen >= self.count:
+                self.value = value
+                self._seen = 0
+        else:
+            self._candidate = value
+            self._seen = 1
+            if self.count <= 1:
+                self.value = value
+        return self.value
+
+
+class Hysteresis(Filter):
+    def __init__(self, low, high, initial=False):
+        """
+        A threshold that does not flap: it turns True above high and only turns False again
+        below low.
+        :param low: The value under which the output becomes False.
+        :param high: The value over which the output becomes True.
+        :param initial: The output until a threshold is crossed.
+        """
+        if low > high:
+            raise ValueError('The low threshold must not be greater than the high one')
+        self.low = low
+        self.high = high
+        self.initial = initial
+        self.state = initial
+
+    def reset(self):
+        self.state = self.initial
+
+    def update(self, value):
+        if value > self.high:
+            self.state = True
+        elif value < self.low:
+            self.state = False
+        return self.state
+
+
+class OutlierRejector(Filter):
+    def __init__(self, threshold=3, alpha=.1, warmup=5, max_rejections=3):
+        """
+        Drops readings too far from the recent ones, repeating the last accepted value instead.
+        The recent mean and variance are exponentially weighted.
+        :param threshold: How many standard deviations away a reading is an outlier.
+        :param alpha: The weight of every accepted reading in the mean and the variance.
+        :param warmup: Readings accepted unconditionally at first.
+        :param max_rejections: Consecutive outliers after which the readings are accepted again,
+        since the value really changed.
+        """
+        self.threshold = threshold
+        self.alpha = alpha
+        self.warmup = warmup
+        self.max_rejections = max_rejections
+        self.rejected = 0
+        self.reset()
+
+    def reset(self):
+        self.mean = None
+        self.variance = 0
+        self.value = None
+        self._seen = 0
+        self._streak = 0
+
+    def _accept(self, value):
+        if self.mean is None:
+            self.mean = value
+        else:
+            # West's incremental weighted variance
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self._seen += 1
+        self._streak = 0
+        self.value = value
+        return value
+
+    def update(self, value):
+        if self._seen < self.warmup or self._streak >= self.max_rejections:
+            return self._accept(value)
+        if abs(value - self.mean) > self.threshold * sqrt(self.variance):
+            self.rejected += 1
+            self._streak += 1
+            return self.value
+        return self._accept(value)
+
+
+class Chain(Filter):
+    def __init__(self, *filters):
+        """
+        Applies several filters in order, e.g. Chain(OutlierRejector(), Median(3), Hysteresis(.4, .6)).
+        """
+        self.filters = filters
+
+    def reset(self):
+        for f in self.filters:
+            f.reset()
+
+    def update(self, value):
+        for f in self.filters:
+            value = f.update(value)
+        return value
+
+
+def pipeline(values, *filters):
+    """
+    Chains generator stages: every filter lazily consumes the output of the previous one.
+    :param values: The readings, e.g. sensor_stream(sensor).
+    :param filters: Filter objects or callables taking and returning an iterable.
+    :return: A generator of filtered values.
+    """
+    for f in filters:
+        values = f.stream(values) if isinstance(f, Filter) else f(values)
+    return values
+
+
+def sensor_stream(sensor, rate=None, read=None, seconds=None):
+    """
+    Reads a sensor lazily: the brick is only asked when the next value is taken.
+    :param sensor: The sensor returned by Robot.init_*_sensor.
+    :param rate: The maximum readings per second. None reads as fast as they are taken.
+    :param read: The method to read, e.g. 'get_distance'. Defaults to get_sample.
+    :param seconds: Stop after this long. None streams forever.
+    """
+    read = getattr(sensor, read or 'get_sample')
+    period = 1 / rate if rate else 0
+    start = next_read = time()
+    while seconds is None or time() - start < seconds:
+        delay = next_read - time()
+        if delay > 0:
+            sleep(delay)
+        next_read = max(next_read + period, time())
+        yield read()
+
+
+def settle(values, count, *filters):
+    """
+    Takes a given amount of values through the filters, e.g. the median of 5 readings:
+    settle(sensor_stream(us, read='get_distance'), 5, Median(5)).
+    :return: The last filtered value.
+    """
+    last = None
+    for last in islice(pipeline(values, *filters), count):
+        pass
+    return last
@@ -0,0 +1,192 @@
+from __future__ import print_function
+from __future__ import division
+
+import time
+import queue
+import traceback
+import multiprocessing
+from collections import namedtuple
+
+from .robot import Robot
+from .connection import ConnectionManager, ManagedBrick
+
+# Seconds to wait for every robot to be ready before starting anyway
+DEFAULT_BARRIER_TIMEOUT = 60
+
+RobotResult = namedtuple('RobotResult', ['index', 'target', 'value', 'error', 'telemetry'])
+
+
+class BrickFactory(object):
+    def __init__(self, host=None, name=None, debug=False):
+        """
+        Connects to a brick when called. Unlike a brick, it can be sent to another process.
+        :param host: The address of the brick.
+        :param name: The name of the brick.
+        :param debug: Whether print debug messages or not.
+        """
+        self.host = host
+        self.name = name
+        self.debug = debug
+
+    def __call__(self):
+        return ConnectionManager(host=self.host, name=self.name, debug=self.debug).connect()
+
+    def __repr__(self):
+        return 'BrickFactory(host=%r, name=%r)' % (self.host, self.name)
+
+
+def _factory(target):
+    if callable(target):
+        return target
+    return BrickFactory(host=target)
+
+
+def _telemetry(robot, timings):
+    telemetry = dict(timings)
+    if isinstance(robot.brick, ManagedBrick):
+        telemetry['reconnects'] = robot.brick.reconnects
+    if robot.sampler is not None:
+        telemetry['sensor_reads'] = robot.sampler.reads
+        telemetry['sensor_errors'] = robot.sampler.errors
+    if robot.metrics is not None:
+        telemetry['stats'] = robot.stats()
+    return telemetry
+
+
+def _run_robot(index, target, main, args, robot_kwargs, barrier, barrier_timeout, results):
+    """
+    Body of every fleet process: connects, waits for the other robots and runs main.
+    """
+    timings = {}
+    start = time.time()
+    try:
+        robot = Robot(_factory(target)(), **robot_kwargs)
+        timings['connect'] = time.time() - start
+    except BaseException:
+        error = traceback.format_exc()
+        # Still show up at the barrier, so that the other robots start without this one
+        try:
+            barrier.wait(barrier_timeout)
+        except Exception:
+            pass
+        results.put(RobotResult(index, repr(target), None, error, timings))
+        return
+
+    value, error = None, None
+    try:
+        start = time.time()
+        barrier.wait(barrier_timeout)
+        timings['barrier'] = time.time() - start
+        start = time.time()
+        try:
+            value = main(robot, *args)
+        finally:
+            timings['run'] = time.time() - start
+    except BaseException:
+        error = traceback.format_exc()
+    finally:
+        try:
+            robot.stop()
+        except Exception:
+            pass
+        robot.close()
+        results.put(RobotResult(index, repr(target), value, error, _telemetry(robot, timings)))
+
+
+class Fleet(object):
+    def __init__(self, targets, context=None, barrier_timeout=DEFAULT_BARRIER_TIMEOUT, debug=True, **robot_kwargs):
+        """
+        Runs the same program on several robots, each one in its own process. A slow connection
+        or a blocking command only stalls its own robot.
+        :param targets: One item per robot: the address of the brick, or a callable that returns
+        a brick (e.g. BrickFactory). With the 'spawn' start method the callables must be picklable.
+        :param context: The multiprocessing context or start method name. Defaults to the platform default.
+        :param barrier_timeout: Seconds to wait for every robot to be ready. None waits forever.
+        :param debug: Whether print debug messages or not.
+        :param robot_kwargs: Given to the Robot of every brick.
+        """
+        if not targets:
+            raise ValueError('A fleet needs at least one brick')
+        if context is None or isinstance(context, str):
+            context = multiprocessing.get_context(context)
+        self.targets = list(targets)
+        self.context = context
+        self.barrier_timeout = barrier_timeout
+        self.debug = print if debug else lambda *x, **y: None
+        robot_kwargs.setdefault('debug', debug)
+        self.robot_kwargs = robot_kwargs
+        self._processes = []
+
+    def __len__(self):
+        return len(self.targets)
+
+    def run(self, main, *args, **kwargs):
+        """
+        Runs main(robot, *args) for every brick, all of them starting at the same time.
+        :param main: The program. With the 'spawn' start method it must be importable.
+        :param timeout: Seconds after which the robots still running are terminated. None waits forever.
+        :return: A RobotResult per target, in the same order: the value returned by main, the
+        formatted traceback if it failed, and a dict of timings and counters.
+        """
+        timeout = kwargs.pop('timeout', None)
+        if kwargs:
+            raise TypeError('Unexpected arguments: %s' % ', '.join(kwargs))
+
+        barrier = self.context.Barrier(len(self.targets))
+        results = self.context.Queue()
+        self._processes = [
+            self.context.Process(
+                target=_run_robot, name='Fleet-%d' % index,
+                args=(index, target, main, args, self.robot_kwargs, barrier, self.barrier_timeout, results)
+            )
+            for index, target in enumerate(self.targets)
+        ]
+        for process in self._processes:
+            process.daemon = True
+            process.start()
+
+        collected = {}
+        deadline = time.time() + timeout if timeout is not None else None
+        while len(collected) < len(self.targets):
+            try:
+                result = results.get(timeout=.1)
+                collected[result.index] = result
+                self.debug('Robot %d (%s) finished%s' % (
+                    result.index, result.target, ' with errors' if result.error else ''))
+                continue
+            except queue.Empty:
+                pass
+
+            missing = [i for i in range(len(self.targets)) if i not in collected]
+            if deadline is not None and time.time() > deadline:
+                for i in missing:
+                    self._processes[i].terminate()
+                    collected[i] = RobotResult(i, repr(self.targets[i]), None, 'Timeout', {})
+            elif all(self._processes[i].exitcode is not None for i in missing):
+                # Give the results already sent by the processes a chance to arrive
+                self._drain(results, collected)
+                for i in missing:
+                    if i not in collected:
+                        collected[i] = RobotResult(i, repr(self.targets[i]), None, 'Exited with code %s' % str(
+                            self._processes[i].exitcode), {})
+
+        for process in self._processes:
+            process.join()
+        return [collected[i] for i in range(len(self.targets))]
+
+    @staticmethod
+    def _drain(results, collected, timeout=.5):
+        while True:
+            try:
+                result = results.get(timeout=timeout)
+            except queue.Empty:
+                return
+            collected[result.index] = result
+
+    def terminate(self):
+        """
+        Kills the processes of the last run.
+        """
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,199 @@
+from __future__ import division
+
+from time import time
+
+from .stats import RunningStats
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# How many times per second the controller reads the sensor and corrects the course
+DEFAULT_CONTROL_RATE = 50  # Hz
+DEFAULT_GAINS = (1.5, 0, .05)  # A PD controller
+
+# Which edge of the line is followed: with LEFT the line stays to the right of the sensor
+LEFT = 1
+RIGHT = -1
+
+
+class PID(object):
+    def __init__(self, kp, ki=0, kd=0, setpoint=.5, output_limits=(-1, 1), integral_limit=None):
+        """
+        A PID controller. The derivative is taken on the measurement, so changing the
+        setpoint does not kick the output.
+        :param kp: The proportional gain.
+        :param ki: The integral gain. 0 makes it a PD controller.
+        :param kd: The derivative gain.
+        :param setpoint: The value to keep the measurement at.
+        :param output_limits: The (min, max) of the output.
+        :param integral_limit: The maximum absolute contribution of the integral term. Defaults
+        to the output limits.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.setpoint = setpoint
+        self.output_limits = output_limits
+        self.integral_limit = integral_limit if integral_limit is not None else max(map(abs, output_limits))
+        self.reset()
+
+    def reset(self):
+        self._integral = 0
+        self._last = None
+
+    def update(self, measurement, dt):
+        """
+        :param measurement: The current value.
+        :param dt: The seconds since the previous update.
+        :return: The control output.
+        """
+        error = self.setpoint - measurement
+        if self.ki and dt > 0:
+            limit = self.integral_limit / self.ki
+            self._integral = min(max(self._integral + error * dt, -limit), limit)
+
+        derivative = 0
+        if self._last is not None and dt > 0:
+            derivative = -(measurement - self._last) / dt
+        self._last = measurement
+
+        output = self.kp * error + self.ki * self._integral + self.kd * derivative
+        low, high = self.output_limits
+        return min(max(output, low), high)
+
+
+def _clamp_power(power):
+    return int(round(min(max(power, -100), 100)))
+
+
+class LineFollower(object):
+    def __init__(self, robot, read=None, gains=DEFAULT_GAINS, power=None, rate=DEFAULT_CONTROL_RATE,
+                 edge=LEFT, steering=None):
+        """
+        Follows the edge of a line without ever stopping: at a fixed rate, a PID controller turns
+        the distance to the edge into a difference of power between the wheels.
+        :param robot: The Robot, with its synchronized motors initialized.
+        :param read: Callable returning the light level, 0 on the line and 1 off it. Defaults to
+        the latest light reading normalized with robot.light_normalizer (see Robot.calibrate_light).
+        :param gains: The (kp, ki, kd) tuple or a PID object.
+        :param power: The base power of the wheels. Defaults to the robot power.
+        :param rate: How many corrections per second.
+        :param edge: LEFT or RIGHT.
+        :param steering: The power difference for a full correction. Defaults to the base power.
+        """
+        if robot.left_motor is None or robot.right_motor is None:
+            raise ValueError('The line follower needs the synchronized motors. Invoke "init_synchronized_motors"')
+        self.robot = robot
+        self.read = read if read is not None else self._read_light
+        self.pid = gains if isinstance(gains, PID) else PID(*gains)
+        self.power = power if power is not None else robot.power
+        self.steering = steering if steering is not None else self.power
+        self.period = 1 / rate
+        self.edge = edge
+
+        # Differences between the actual and the expected period, and the time spent per iteration
+        self.jitter = RunningStats(percentiles=(.5, .95, .99))
+        self.busy = RunningStats(percentiles=(.5, .95))
+        self.overruns = 0
+        self._powers = None
+        self._thread = None
+
+    def _read_light(self):
+        if self.robot.light_normalizer is None:
+            raise ValueError('Calibrate the light sensor or give a read callable')
+        return self.robot.light_normalizer.lookup(self.robot.reading('light'))
+
+    def _drive(self, correction):
+        delta = correction * self.steering * self.edge
+        powers = _clamp_power(self.power - delta), _clamp_power(self.power + delta)
+        # Sending the same power again does not change anything and costs a round trip
+        if powers != self._powers:
+            # The odometry assumes the wheels kept their ratio since its last update
+            self.robot._update_pose()
+            self.robot.left_motor.run(powers[0])
+            self.robot.right_motor.run(powers[1])
+            self._powers = powers
+
+    def step(self, dt):
+        """
+        Reads the sensor once and corrects the course.
+        :param dt: The seconds since the previous step.
+        """
+        self._drive(self.pid.update(self.read(), dt))
+
+    def run(self, until=None, seconds=None, brake=True):
+        """
+        Follows the line until the condition is met, the time is over or the robot is stopped.
+        :param until: Callable that returns True to stop. Evaluated every iteration.
+        :param seconds: The maximum amount of seconds to follow the line.
+        :param brake: Whether to brake at the end.
+        """
+        robot = self.robot
+        self.pid.reset()
+        self._powers = None
+        robot.running = True
+        start = last = time()
+        next_step = start
+        try:
+            while robot.running:
+                now = time()
+                if seconds is not None and now - start >= seconds:
+                    break
+                if until is not None and until():
+                    break
+                self.step(now - last)
+                last = now
+
+                self.busy.add(time() - now)
+                next_step += self.period
+                delay = next_step - time()
+                if delay < 0:
+                    # Never try to catch up on missed iterations
+                    self.overruns += 1
+                    next_step = time()
+                    delay = 0
+                if robot.wait_until_stopped(delay):
+                    break
+                self.jitter.add(time() - now - self.period)
+        finally:
+            self._powers = None
+            if robot.running:
+                robot.stop(brake)
+            else:
+                robot._update_pose()
+
+    def start(self, until=None, seconds=None, brake=True):
+        """
+        Same as run, but in a background thread. Use robot.stop or self.stop to end it.
+        """
+        self._thread = threading.Thread(target=self.run, args=(until, seconds, brake), name='LineFollower')
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def stop(self, brake=True):
+        if self.robot.running:
+            self.robot.stop(brake)
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def report(self):
+        """
+        :return: A dict with the measured control rate and the jitter (seconds late per iteration)
+        and busy time of the loop.
+        """
+        iterations = self.jitter.count
+        mean_period = self.period + self.jitter.mean if iterations else None
+        return {
+            'iterations': iterations,
+            'rate': 1 / mean_period if mean_period else None,
+            'jitter_mean': self.jitter.mean if iterations else None,
+            'jitter_stdev': self.jitter.stdev,
+            'jitter_p95': self.jitter.percentile(.95),
+            'jitter_p99': self.jitter.percentile(.99),
+            'busy_p95': self.busy.percentile(.95),
+            'overruns': self.overruns,
+        }
@@ -0,0 +1,290 @@
+from __future__ import print_function
+from __future__ import division
+
+import json
+from time import time
+
+from .utils import BrickWrapper
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# Latencies are recorded in microseconds, from 1 us up to this many seconds
+HIGHEST_LATENCY = 60
+SIGNIFICANT_FIGURES = 2
+SUMMARY_PERCENTILES = (.5, .9, .99, .999)
+
+
+class LatencyHistogram(object):
+    def __init__(self, highest=HIGHEST_LATENCY, significant_figures=SIGNIFICANT_FIGURES):
+        """
+        A log-linear histogram as in HdrHistogram: values are grouped in buckets that double
+        in size, each one split in the same amount of linear sub-buckets. The relative error of
+        any value is below 10 ** -significant_figures and recording a value is O(1).
+        :param highest: The highest latency in seconds. Higher values are recorded as this one.
+        :param significant_figures: The decimal digits of precision, from 1 to 5.
+        """
+        if not 1 <= significant_figures <= 5:
+            raise ValueError('The significant figures must be between 1 and 5')
+        self.highest = int(highest * 1e6)
+        self.sub_bucket_bits = (2 * 10 ** significant_figures - 1).bit_length()
+        self.sub_bucket_half_bits = self.sub_bucket_bits - 1
+        self.sub_bucket_half = 1 << self.sub_bucket_half_bits
+
+        buckets = 1
+        while (1 << self.sub_bucket_bits) << (buckets - 1) <= self.highest:
+            buckets += 1
+        self.counts = [0] * ((buckets + 1) * self.sub_bucket_half)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        bucket = max(value.bit_length() - self.sub_bucket_bits, 0)
+        sub_bucket = value >> bucket
+        return ((bucket + 1) << self.sub_bucket_half_bits) + sub_bucket - self.sub_bucket_half
+
+    def _value(self, index):
+        bucket = (index >> self.sub_bucket_half_bits) - 1
+        sub_bucket = (index & (self.sub_bucket_half - 1)) + self.sub_bucket_half
+        if bucket < 0:
+            sub_bucket -= self.sub_bucket_half
+            bucket = 0
+        # The middle of the sub-bucket
+        return (sub_bucket << bucket) + ((1 << bucket) >> 1)
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.highest)
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, q):
+        """
+        :param q: The quantile, between 0 and 1.
+        :return: The latency in seconds or None if nothing was recorded.
+        """
+        if not self.count:
+            return None
+        target = max(1, int(round(q * self.count)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(self._value(index), self.min), self.max) / 1e6
+        return self.max / 1e6
+
+    @property
+    def mean(self):
+        return self.total / self.count / 1e6 if self.count else None
+
+    def merge(self, other):
+        if len(other.counts) != len(self.counts):
+            raise ValueError('Only histograms with the same range and precision can be merged')
+        with self._lock:
+            for index, count in enumerate(other.counts):
+                self.counts[index] += count
+            self.count += other.count
+            self.total += other.total
+            if other.count:
+                self.min = other.min if self.min is None else min(self.min, other.min)
+                self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.count = 0
+            self.total = 0
+            self.min = None
+            self.max = None
+
+    def summary(self):
+        """
+        :return: A dict with the count and the mean, min, max and some percentiles in seconds.
+        """
+        summary = {
+            'count': self.count,
+            'mean': self.mean,
+            'min': self.min / 1e6 if self.min is not None else None,
+            'max': self.max / 1e6 if self.max is not None else None,
+        }
+        for q in SUMMARY_PERCENTILES:
+            summary['p%s' % ('%g' % (q * 100)).replace('.', '')] = self.percentile(q)
+        return summary
+
+
+class _Timer(object):
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time() - self.start)
+
+
+class Metrics(object):
+    def __init__(self, debug=print):
+        """
+        A set of named LatencyHistogram, one per operation.
+        :param debug: The function used by the periodic dump.
+        """
+        self.histograms = {}
+        self.debug = debug
+        self._lock = threading.Lock()
+        self._dump_stop = None
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def timer(self, name):
+        """
+        :return: A context manager that records how long its block takes.
+        """
+        return _Timer(self.histogram(name))
+
+    def wrap(self, name, func):
+        """
+        :return: A callable that calls func and records how long it takes.
+        """
+        histogram = self.histogram(name)
+
+        def measured(*args, **kwargs):
+            start = time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.record(time() - start)
+        measured.__name__ = getattr(func, '__name__', name)
+        return measured
+
+    def instrument(self, obj, prefix, methods):
+        """
+        Replaces the given methods of an object by measured ones.
+        :param obj: The object, e.g. a Motor.
+        :param prefix: Prepended to the method names, e.g. 'motor' records 'motor.turn'.
+        :param methods: The method names.
+        :return: The object.
+        """
+        for method in methods:
+            if hasattr(obj, method):
+                setattr(obj, method, self.wrap('%s.%s' % (prefix, method), getattr(obj, method)))
+        return obj
+
+    def loop(self, name, condition):
+        """
+        Measures a polling loop: how long every evaluation of the condition takes and how
+        much time goes by between two evaluations.
+        :param name: Records name.condition and name.interval.
+        :param condition: The callable evaluated by the loop.
+        """
+        timed = self.histogram('%s.condition' % name)
+        intervals = self.histogram('%s.interval' % name)
+        last = [None]
+
+        def measured(*args, **kwargs):
+            start = time()
+            if last[0] is not None:
+                intervals.record(start - last[0])
+            last[0] = start
+            try:
+                return condition(*args, **kwargs)
+            finally:
+                timed.record(time() - start)
+        return measured
+
+    def snapshot(self):
+        """
+        :return: A dict of operation name -> summary, see LatencyHistogram.summary.
+        """
+        with self._lock:
+            histograms = dict(self.histograms)
+        return dict((name, histogram.summary()) for name, histogram in sorted(histograms.items()))
+
+    def reset(self):
+        with self._lock:
+            histograms = list(self.histograms.values())
+        for histogram in histograms:
+            histogram.reset()
+
+    def dump(self):
+        """
+        Prints a line per operation with its count and latencies in milliseconds.
+        """
+        for name, summary in self.snapshot().items():
+            if summary['count']:
+                self.debug('%-32s n=%-7d mean=%8.2f p50=%8.2f p99=%8.2f max=%8.2f ms' % (
+                    name, summary['count'], summary['mean'] * 1e3, summary['p50'] * 1e3,
+                    summary['p99'] * 1e3, summary['max'] * 1e3))
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def start_dump(self, interval):
+        """
+        Dumps the metrics every interval seconds from a daemon thread.
+        """
+        self.stop_dump()
+        stop = self._dump_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.dump()
+        thread = threading.Thread(target=run, name='MetricsDump')
+        thread.daemon = True
+        thread.start()
+
+    def stop_dump(self):
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+
+
+class MeasuredBrick(BrickWrapper):
+    def __init__(self, brick, metrics):
+        """
+        Measures every command sent to the brick, recorded as 'brick.<command>'.
+        :param brick: The brick.
+        :param metrics: The Metrics.
+        """
+        super(MeasuredBrick, self).__init__(brick)
+        self.metrics = metrics
+
+    def __getattr__(self, name):
+        attr = super(MeasuredBrick, self).__getattr__(name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        histogram = self.metrics.histogram('brick.%s' % name)
+        wrapped = self
+
+        def command(*args, **kwargs):
+            start = time()
+            try:
+                # Looked up on every call, the wrapped brick may reconnect
+                return getattr(wrapped.brick, name)(*args, **kwargs)
+            finally:
+                histogram.record(time() - start)
+        command.__name__ = name
+        # Later lookups do not go through __getattr__
+        self.__dict__[name] = command
+        return command
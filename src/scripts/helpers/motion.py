@@ -0,0 +1,169 @@
+from __future__ import division
+
+from math import pi
+from collections import namedtuple
+
+from .motors import ManeuverWatch, start_synchronized
+from .robot import RobotError, DISTANCE_PER_ROTATION, WHEELS_DISTANCE
+
+import time
+
+# One maneuver of a plan. degrees: what the fastest wheel turns, always positive.
+# left and right: the signed degrees expected from each wheel
+Segment = namedtuple('Segment', ['kind', 'power', 'degrees', 'turn_ratio', 'left', 'right'])
+
+
+def _wheel_degrees(dist):
+    return dist / DISTANCE_PER_ROTATION * 360
+
+
+class MotionPlan(object):
+    def __init__(self, robot, power=None):
+        """
+        A list of maneuvers for the synchronized motors, sent one after the other without
+        stopping in between: the next one is sent as soon as the previous one reaches its tacho
+        target. The tacho limits and turn ratios are computed when the segments are added.
+        Use Robot.plan to create one. Segments can be chained: plan.straight(20).spin(250).run().
+        :param robot: The Robot.
+        :param power: The default power of the segments. Defaults to the robot power.
+        """
+        self.robot = robot
+        self.power = power if power is not None else robot.power
+        self.segments = []
+        # Seconds the wheels were idle between two segments, measured by the last run
+        self.gaps = []
+
+    def _add(self, kind, power, left, right):
+        if power is None:
+            power = self.power
+        power = abs(power)
+        fastest, slowest = (left, right) if abs(left) >= abs(right) else (right, left)
+        if abs(fastest) < 1:
+            # Nothing to do
+            return self
+        factor = slowest / fastest
+        # The firmware slows the follower down: factor = 1 - 2 * ratio / 100
+        turn_ratio = int(round((1 - factor) * 50))
+        if abs(right) > abs(left):
+            # The right wheel leads, see start_synchronized
+            turn_ratio = -turn_ratio
+        self.segments.append(Segment(kind, power if fastest > 0 else -power, abs(fastest), turn_ratio, left, right))
+        return self
+
+    def straight(self, dist, power=None):
+        """
+        :param dist: The distance in cm. Negative moves backwards.
+        """
+        degrees = _wheel_degrees(dist)
+        return self._add('straight', power, degrees, degrees)
+
+    def spin(self, degrees, power=None):
+        """
+        Same as Robot.spin.
+        :param degrees: The degrees each wheel turns. Positive spins to the right.
+        """
+        return self._add('spin', power, degrees, -degrees)
+
+    def arc(self, radius, angle, power=None):
+        """
+        Moves along a circle.
+        :param radius: The radius of the circle in cm, measured at the middle of the wheels.
+        :param angle: How many degrees the robot turns, positive to the right. Negative radiuses
+        move backwards.
+        """
+        arc = angle * pi / 180
+        outer = _wheel_degrees((radius + WHEELS_DISTANCE / 2) * abs(arc))
+        inner = _wheel_degrees((radius - WHEELS_DISTANCE / 2) * abs(arc))
+        if angle >= 0:
+            return self._add('arc', power, outer, inner)
+        return self._add('arc', power, inner, outer)
+
+    def clear(self):
+        del self.segments[:]
+        return self
+
+    def __len__(self):
+        return len(self.segments)
+
+    def duration(self):
+        """
+        :return: The estimated seconds to run the plan, as the motors estimate it.
+        """
+        return sum(seg.degrees / abs(seg.power) / 5 for seg in self.segments if seg.power)
+
+    def run(self, brake=True, timeout=1):
+        """
+        Runs every segment and waits for the last one. Invoking robot.stop aborts it.
+        Each segment is sent as soon as the leader of the previous one reaches its target,
+        without waiting for the follower, which may still be a few degrees short of its own.
+        :param brake: Whether the motors are braked at the end, otherwise they are left idle.
+        :param timeout: Seconds without progress after which a BlockedException is raised.
+        :return: Whether the whole plan was run. False if the robot was stopped meanwhile.
+        """
+        robot = self.robot
+        if robot.move is None:
+            raise RobotError(
+                'Cannot move without a synchronized motor bound to self.move. '
+                'Invoke "init_synchronized_motors"'
+            )
+        left, right = robot.left_motor, robot.right_motor
+        del self.gaps[:]
+        # Where each wheel is expected to be (rotation counts), so that no tacho is read before
+        # sending a segment. They only pace the polling
+        expected = robot._wheel_positions()
+        if expected is None:
+            expected = {left.port: left.get_tacho().rotation_count, right.port: right.get_tacho().rotation_count}
+
+        robot.running = True
+        finished = None
+        completed = False
+        try:
+            for i, segment in enumerate(self.segments):
+                if not robot.running:
+                    return False
+                last = i == len(self.segments) - 1
+                # Only the last segment stops the motors, the brick brakes them at the limit
+                leader, target = start_synchronized(robot.move, segment.power, segment.degrees, segment.turn_ratio,
+                                                    expected, brake and last)
+                if not robot.running:
+                    # robot.stop came in between, after it had stopped the motors
+                    left.idle()
+                    right.idle()
+                    return False
+                if finished is not None:
+                    self.gaps.append(time.time() - finished)
+                    # After sending, so that it does not delay the segment
+                    robot._update_pose()
+                expected[left.port] += segment.left
+                expected[right.port] += segment.right
+
+                follower = right if leader is left else left
+                watch = ManeuverWatch(leader, target, segment.power, timeout, follower if last else None,
+                                      segment.degrees)
+                if robot.wait_until_stopped(watch.delay()):
+                    return False
+                while True:
+                    motor = watch.motor
+                    state, tacho = motor._read_state()
+                    # The positions are known again
+                    expected[motor.port] = tacho.rotation_count
+                    if watch.done(state, tacho):
+                        break
+                    if watch.motor is motor and robot.wait_until_stopped(watch.delay(tacho)):
+                        return False
+                finished = time.time()
+            completed = True
+            return True
+        finally:
+            # Unless robot.stop already stopped the motors
+            if robot.running:
+                if not completed:
+                    if brake:
+                        left.brake()
+                        right.brake()
+                    else:
+                        left.idle()
+                        right.idle()
+                robot.running = False
+                # Both wheels were read by the last segment
+                robot._update_pose(expected if completed and self.segments else None)
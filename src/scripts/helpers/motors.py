@@ -0,0 +1,343 @@
+from __future__ import division
+
+from nxt.motor import BlockedException, MODE_MOTOR_ON, MODE_BRAKE, MODE_REGULATED, REGULATION_MOTOR_SYNC, \
+    RUN_STATE_IDLE, RUN_STATE_RUNNING
+
+import time
+import queue
+from concurrent.futures import Future
+
+from .utils import BrickWrapper
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+
+# Minimum amount of seconds between two tacho readings while waiting for a maneuver
+MIN_POLL_INTERVAL = .01
+
+
+class _MotorWorker(object):
+    def __init__(self, port):
+        self.port = port
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name='MotorWorker-%s' % str(port))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def stop(self, wait=True):
+        self.jobs.put(None)
+        if wait and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
+class MotorPool(object):
+    def __init__(self):
+        """
+        Long lived workers to drive the motors, one per port. Since the workers are
+        already waiting for jobs, motors submitted together start moving together
+        and no thread is created for each maneuver.
+        """
+        self._workers = {}
+        self._lock = threading.Lock()
+
+    def start(self, *motors):
+        """
+        Starts the workers of the given motors in advance.
+        :param motors: The Motor objects.
+        """
+        for motor in motors:
+            self._worker(motor)
+
+    def _worker(self, motor):
+        with self._lock:
+            worker = self._workers.get(motor.port)
+            if worker is None:
+                worker = self._workers[motor.port] = _MotorWorker(motor.port)
+            return worker
+
+    def submit(self, motor, func, *args, **kwargs):
+        """
+        Runs func in the worker of the given motor. Jobs for the same motor run one after the other.
+        :param motor: The Motor object.
+        :param func: The callable to run.
+        :return: A concurrent.futures.Future with the result of func.
+        """
+        future = Future()
+        self._worker(motor).jobs.put((future, func, args, kwargs))
+        return future
+
+    def turn(self, motor, power, degrees, **kwargs):
+        """
+        Submits Motor.turn to the worker of the given motor.
+        :return: A concurrent.futures.Future.
+        """
+        return self.submit(motor, motor.turn, power, degrees, **kwargs)
+
+    def shutdown(self, wait=True):
+        """
+        Stops every worker once the jobs submitted so far are done.
+        :param wait: Whether to wait for the workers to finish.
+        """
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+        for worker in workers:
+            worker.stop(wait)
+
+
+def wait_all(futures):
+    """
+    Waits for every future and raises the first exception, if any.
+    :param futures: An iterable of concurrent.futures.Future.
+    :return: The list of results.
+    """
+    futures = list(futures)
+    for future in futures:
+        future.exception()
+    return [future.result() for future in futures]
+
+
+def start_synchronized(move, power, degrees, turn_ratio=0, positions=None, brake=False):
+    """
+    Sends a single regulated and tacho limited command to the motors of a SynchronizedMotors.
+    The brick stops both motors by itself once the fastest one has turned the given degrees.
+    :param move: The SynchronizedMotors object.
+    :param power: The power to use. Negative values move backwards.
+    :param degrees: The amount of degrees to turn the fastest motor.
+    :param turn_ratio: From -100 to 100. 0 moves straight, 100 spins on the axis by turning the
+    follower backwards and -100 spins the other way around by turning the leader backwards.
+    :param positions: A dict of port -> rotation count, if the caller already knows where the
+    motors are, e.g. from the last odometry update. Otherwise the leader is read. The target is
+    only used to pace the polling, so a stale position costs reads but never accuracy.
+    :param brake: Whether the brick brakes the motors once the limit is reached, otherwise they coast.
+    :return: The (leader, target rotation count) tuple needed by wait_synchronized.
+    """
+    if degrees < 0:
+        raise ValueError('degrees must be greater than 0!')
+
+    leader, follower = move.leader, move.follower
+    if turn_ratio < 0:
+        # The firmware always slows down the follower, so the fastest motor must lead
+        leader, follower = follower, leader
+        turn_ratio = -turn_ratio
+
+    # Same convention as SynchronizedMotors: the ratio depends on the ports order
+    if leader.port < follower.port:
+        turn_ratio = -turn_ratio
+
+    if positions is None:
+        start = leader.get_tacho().rotation_count
+    else:
+        start = positions[leader.port]
+    state = leader._get_new_state()
+    state.power = power
+    state.mode = MODE_MOTOR_ON | MODE_REGULATED
+    if brake:
+        state.mode |= MODE_BRAKE
+    state.regulation = REGULATION_MOTOR_SYNC
+    state.turn_ratio = turn_ratio
+    state.run_state = RUN_STATE_RUNNING
+    state.tacho_limit = int(round(degrees))
+    leader._set_state(state)
+    follower._set_state(state)
+
+    direction = 1 if power > 0 else -1
+    return leader, start + direction * int(round(degrees))
+
+
+class ManeuverWatch(object):
+    def __init__(self, leader, target, power, timeout=1, follower=None, degrees=None):
+        """
+        Tracks the progress of a maneuver started by start_synchronized from the output states
+        of its motors. The brick enforces the tacho limit by itself, so the maneuver is over
+        once it reports the motors idle: first the leader, then the follower if given.
+        Read the state of watch.motor, which switches to the follower once the leader is idle.
+        :param leader: The leader Motor returned by start_synchronized.
+        :param target: The target rotation count returned by start_synchronized.
+        :param power: The power given to start_synchronized.
+        :param timeout: Seconds without progress after which the maneuver is considered blocked.
+        :param follower: The other Motor of the maneuver.
+        :param degrees: The degrees given to start_synchronized, to wait before the first read.
+        """
+        self.leader = leader
+        self.follower = follower
+        self.motor = leader
+        self.target = target
+        self.power = power
+        self.timeout = timeout
+        self.degrees = degrees
+        self.direction = 1 if power > 0 else -1
+        # port -> the last rotation count read
+        self.positions = {}
+        self._last_tacho = None
+        self._last_progress = time.time()
+
+    def done(self, state, tacho):
+        """
+        :param state: The OutputState of watch.motor.
+        :param tacho: The TachoInfo of watch.motor.
+        :return: Whether the maneuver is over. Raises BlockedException if it is blocked.
+        """
+        now = time.time()
+        self.positions[self.motor.port] = tacho.rotation_count
+        if state.run_state == RUN_STATE_IDLE:
+            if self.motor is self.follower or self.follower is None:
+                return True
+            self.motor = self.follower
+            self._last_tacho = None
+            self._last_progress = now
+            return False
+
+        if self._last_tacho is None:
+            progressing = True
+        elif self.motor is self.leader:
+            progressing = not self.leader._is_blocked(tacho, self._last_tacho, self.direction)
+        else:
+            # The follower may turn the other way around
+            progressing = tacho.tacho_count != self._last_tacho.tacho_count
+        if progressing:
+            self._last_tacho = tacho
+            self._last_progress = now
+        elif now - self._last_progress > self.timeout:
+            raise BlockedException('Blocked!')
+        return False
+
+    def delay(self, tacho=None):
+        """
+        :param tacho: The last TachoInfo of watch.motor. None before the first read.
+        :return: The seconds to wait before reading the state of watch.motor again.
+        """
+        if self.motor is not self.leader:
+            return MIN_POLL_INTERVAL
+        remaining = (self.degrees or 0) if tacho is None else abs(self.target - tacho.rotation_count)
+        # Same estimate as Motor._eta, which is rather pessimistic: half of it is waited
+        return max(MIN_POLL_INTERVAL, remaining / abs(self.power) / 5 / 2)
+
+
+def wait_synchronized(leader, target, power, timeout=1, follower=None, degrees=None):
+    """
+    Waits for a maneuver started by start_synchronized by polling its motors.
+    See ManeuverWatch for the meaning of the arguments.
+    :return: The dict of port -> rotation count read last, once the motors are idle.
+    """
+    watch = ManeuverWatch(leader, target, power, timeout, follower, degrees)
+    # Nothing worth reading right after sending the command
+    time.sleep(watch.delay())
+    while True:
+        motor = watch.motor
+        state, tacho = motor._read_state()
+        if watch.done(state, tacho):
+            return watch.positions
+        # The follower is read right away, it is usually idle by then too
+        if watch.motor is motor:
+            time.sleep(watch.delay(tacho))
+
+
+def _other(move, motor):
+    return move.follower if motor is move.leader else move.leader
+
+
+def synchronized_turn(move, power, degrees, turn_ratio=0, brake=True, timeout=1, positions=None):
+    """
+    Turns both motors of a SynchronizedMotors with one tacho limited command and waits until
+    the brick reports both idle. The brick itself brakes them at the limit, so nothing else is
+    sent unless the maneuver fails.
+    See start_synchronized for the meaning of the arguments.
+    :param brake: Whether the motors are braked at the end, otherwise they are left idle.
+    :param timeout: Seconds without progress after which a BlockedException is raised.
+    :return: The dict of port -> rotation count of both motors once they are idle.
+    """
+    leader, target = start_synchronized(move, power, degrees, turn_ratio, positions, brake)
+    try:
+        return wait_synchronized(leader, target, power, timeout, _other(move, leader), degrees)
+    except BaseException:
+        if brake:
+            move.leader.brake()
+            move.follower.brake()
+        else:
+            move.leader.idle()
+            move.follower.idle()
+        raise
+
+
+class MotorStateCache(BrickWrapper):
+    def __init__(self, brick):
+        """
+        Remembers the last state sent to every motor port and drops set_output_state commands
+        that would not change it. Only commands without a tacho limit are dropped: a tacho
+        limited command is always sent, and afterwards the state of its port is unknown since
+        the brick changes it by itself once the limit is reached.
+        Motors must be created with this object as their brick.
+        :param brick: The brick.
+        """
+        super(MotorStateCache, self).__init__(brick)
+        self.dropped = 0
+        self._states = {}
+        # Incremented every time a command for the port reaches the brick
+        self._generations = {}
+        self._reconnects = getattr(brick, 'reconnects', 0)
+        self._lock = threading.Lock()
+
+    def _check_link(self):
+        # A brick that reconnected may have been reset
+        reconnects = getattr(self.brick, 'reconnects', 0)
+        if reconnects != self._reconnects:
+            self._reconnects = reconnects
+            self.invalidate()
+
+    def set_output_state(self, port, power, mode, regulation, turn_ratio, run_state, tacho_limit):
+        state = (power, mode, regulation, turn_ratio, run_state, tacho_limit)
+        self._check_link()
+        with self._lock:
+            if not tacho_limit and self._states.get(port) == state:
+                self.dropped += 1
+                return
+            if tacho_limit:
+                self._states.pop(port, None)
+            else:
+                self._states[port] = state
+            self._generations[port] = self._generations.get(port, 0) + 1
+        try:
+            self.brick.set_output_state(port, power, mode, regulation, turn_ratio, run_state, tacho_limit)
+        except BaseException:
+            self.invalidate(port)
+            raise
+
+    def invalidate(self, *ports):
+        """
+        Forgets the state of the given ports, or of every port if none is given, so that
+        the next command is sent no matter what.
+        """
+        with self._lock:
+            for port in ports or list(self._states):
+                self._states.pop(port, None)
+                self._generations[port] = self._generations.get(port, 0) + 1
+
+    def state(self, port):
+        """
+        :return: The (power, mode, regulation, turn ratio, run state, tacho limit) tuple last
+        sent to the port or None if it is unknown.
+        """
+        return self._states.get(port)
+
+    def generation(self, *ports):
+        """
+        :return: A value that changes whenever a command for any of the ports reaches the brick.
+        """
+        return tuple(self._generations.get(port, 0) for port in ports)
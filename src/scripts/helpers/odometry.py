@@ -0,0 +1,176 @@
+from __future__ import division
+
+from array import array
+from collections import namedtuple
+from math import pi, sin, cos, atan2, hypot
+
+# Robot pose. x and y in the same unit as the wheel diameter, heading in radians,
+# counterclockwise from the starting direction
+Pose = namedtuple('Pose', ['x', 'y', 'heading'])
+
+# Entries of the MoveLog
+STEP = 0
+SPIN = 1
+# Amounts closer to zero than this are dropped
+EPSILON = 1e-9
+
+
+def normalize_angle(angle):
+    """
+    :return: The same angle between -pi and pi.
+    """
+    return (angle + pi) % (2 * pi) - pi
+
+
+def spin_degrees(angle, wheel_diameter, wheels_distance):
+    """
+    Converts a rotation of the robot on its axis into the degrees each wheel turns.
+    :param angle: The rotation in radians, counterclockwise.
+    :return: The degrees for Robot.spin, which spins clockwise for positive values.
+    """
+    arc = angle * wheels_distance / 2
+    return -arc / (pi * wheel_diameter) * 360
+
+
+class PoseTracker(object):
+    def __init__(self, left_motor, right_motor, wheel_diameter, wheels_distance):
+        """
+        Dead reckoning from the rotation counts of the wheels. Since the counts are never reset
+        by motor commands, the pose is exact whatever moved the wheels as long as update is
+        invoked whenever the wheels change their speed ratio (e.g. after every maneuver).
+        :param left_motor: The Motor of the left wheel.
+        :param right_motor: The Motor of the right wheel.
+        :param wheel_diameter: The diameter of the wheels.
+        :param wheels_distance: The distance between the wheels, in the same unit.
+        """
+        self.left_motor = left_motor
+        self.right_motor = right_motor
+        self.wheel_diameter = wheel_diameter
+        self.wheels_distance = wheels_distance
+        self.x = 0
+        self.y = 0
+        self.heading = 0
+        self._last = None
+        self.reset()
+
+    def _read(self):
+        return self.left_motor.get_tacho().rotation_count, self.right_motor.get_tacho().rotation_count
+
+    def reset(self):
+        """
+        Makes the current position the origin.
+        """
+        self._last = self._read()
+        self.x = self.y = self.heading = 0
+
+    @property
+    def positions(self):
+        """
+        :return: The dict of port -> rotation count of the wheels as of the last update.
+        """
+        return {self.left_motor.port: self._last[0], self.right_motor.port: self._last[1]}
+
+    def update(self, positions=None):
+        """
+        Reads the wheels and integrates the movement since the last update.
+        :param positions: A dict of port -> rotation count just read by someone else, to
+        save the reads.
+        :return: The Pose.
+        """
+        if positions is None:
+            left, right = self._read()
+        else:
+            left, right = positions[self.left_motor.port], positions[self.right_motor.port]
+        per_degree = pi * self.wheel_diameter / 360
+        d_left = (left - self._last[0]) * per_degree
+        d_right = (right - self._last[1]) * per_degree
+        self._last = left, right
+
+        distance = (d_left + d_right) / 2
+        d_heading = (d_right - d_left) / self.wheels_distance
+        if abs(d_heading) < EPSILON:
+            self.x += distance * cos(self.heading)
+            self.y += distance * sin(self.heading)
+        else:
+            # Both wheels kept the same ratio, so the robot moved along an arc
+            radius = distance / d_heading
+            self.x += radius * (sin(self.heading + d_heading) - sin(self.heading))
+            self.y -= radius * (cos(self.heading + d_heading) - cos(self.heading))
+        self.heading = normalize_angle(self.heading + d_heading)
+        return self.pose
+
+    @property
+    def pose(self):
+        return Pose(self.x, self.y, self.heading)
+
+    def path_to_start(self):
+        """
+        The shortest way back: one spin and one straight line. If the start is behind the robot,
+        it moves backwards instead of spinning around.
+        :return: The (rotation in radians, counterclockwise; signed distance) tuple.
+        """
+        distance = hypot(self.x, self.y)
+        if distance < EPSILON:
+            return 0, 0
+        rotation = normalize_angle(atan2(-self.y, -self.x) - self.heading)
+        if abs(rotation) > pi / 2:
+            return normalize_angle(rotation + pi), -distance
+        return rotation, distance
+
+
+class MoveLog(object):
+    def __init__(self):
+        """
+        The moves made by a robot, kept compact: consecutive steps are merged into one and
+        consecutive spins add up, so a spin and its opposite cancel each other out.
+        """
+        self.kinds = array('B')
+        self.amounts = array('d')
+
+    def _add(self, kind, amount):
+        if self.kinds and self.kinds[-1] == kind:
+            self.amounts[-1] += amount
+            if abs(self.amounts[-1]) < EPSILON:
+                self.kinds.pop()
+                self.amounts.pop()
+        elif abs(amount) >= EPSILON:
+            self.kinds.append(kind)
+            self.amounts.append(amount)
+
+    def step(self, dist):
+        """
+        :param dist: The distance moved. Negative when moving backwards.
+        """
+        self._add(STEP, dist)
+
+    def spin(self, degrees):
+        """
+        :param degrees: The degrees given to Robot.spin. Negative spins to the left.
+        """
+        self._add(SPIN, degrees)
+
+    def clear(self):
+        del self.kinds[:]
+        del self.amounts[:]
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __iter__(self):
+        return zip(self.kinds, self.amounts)
+
+    def __repr__(self):
+        return 'MoveLog(%s)' % ', '.join(
+            '%s %g' % ('step' if kind == STEP else 'spin', amount) for kind, amount in self)
+
+    def undo(self, robot):
+        """
+        Makes the robot undo every move, last first, and clears the log.
+        :param robot: The Robot.
+        """
+        for kind, amount in reversed(list(self)):
+            if kind == STEP:
+                robot.move_forward(dist=-amount)
+            else:
+                robot.spin(-amount)
+        self.clear()
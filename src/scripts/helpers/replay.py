@@ -0,0 +1,219 @@
+from __future__ import division
+
+import time
+from bisect import bisect_right
+from collections import namedtuple, defaultdict
+
+from nxt.motor import LIMIT_RUN_FOREVER, MODE_IDLE, REGULATION_IDLE, RUN_STATE_IDLE
+
+from .robot import Robot, RobotError
+from .simulator import SimulatedSock
+from .telemetry import COMMAND, OUTPUT, INPUT, I2C, read_telemetry, unpack_command
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+Command = namedtuple('Command', ['time', 'args'])
+CommandDiff = namedtuple('CommandDiff', ['index', 'expected', 'actual', 'time_shift'])
+
+
+class ReplayFinished(RobotError):
+    pass
+
+
+class _Track(object):
+    def __init__(self):
+        self.times = []
+        self.values = []
+        self.position = 0
+
+    def append(self, timestamp, value):
+        self.times.append(timestamp)
+        self.values.append(value)
+
+    def next(self):
+        """
+        :return: The (time, value) of the next record that was not served yet.
+        """
+        if self.position >= len(self.values):
+            raise ReplayFinished('The trace has no more records')
+        self.position += 1
+        return self.times[self.position - 1], self.values[self.position - 1]
+
+    def at(self, timestamp):
+        """
+        :return: The (time, value) of the latest record at the given time.
+        """
+        if timestamp > self.times[-1]:
+            raise ReplayFinished('The trace is over')
+        index = max(bisect_right(self.times, timestamp) - 1, 0)
+        return self.times[index], self.values[index]
+
+
+def _load(trace):
+    if isinstance(trace, str):
+        trace = read_telemetry(trace)
+    # numpy records become tuples of Python numbers
+    return [record.item() if hasattr(record, 'item') else tuple(record) for record in trace]
+
+
+class ReplayBrick(object):
+    def __init__(self, trace, speed=None, sock_type='usb'):
+        """
+        A brick that answers the sensor readings and motor states of a recorded run (see
+        telemetry.TelemetryRecorder) and captures the motor commands it is sent.
+        :param trace: The path of a telemetry file or the records of a TelemetryRecorder.
+        :param speed: None serves the records of every port one after the other, as fast as
+        they are asked for. A number follows the timestamps of the trace at that speed, e.g. 1
+        for real time or 10 for ten times faster.
+        :param sock_type: The connection type to report, which nxt.motor uses to choose the accuracy.
+        """
+        records = _load(trace)
+        self.speed = speed
+        self.sock = SimulatedSock(sock_type, 'replay')
+        self.lock = threading.Lock()
+        self.start_time = records[0][0] if records else 0
+        self.clock = self.start_time
+        self._started = None
+
+        self._inputs = defaultdict(_Track)
+        self._outputs = defaultdict(_Track)
+        self._i2c = defaultdict(_Track)
+        self.expected = []
+        for record in records:
+            timestamp, kind, port = record[:3]
+            if kind == INPUT:
+                self._inputs[port].append(timestamp, record[3:])
+            elif kind == OUTPUT:
+                self._outputs[port].append(timestamp, record[3:])
+            elif kind == I2C:
+                self._i2c[port].append(timestamp, record[3:])
+            elif kind == COMMAND:
+                self.expected.append(Command(timestamp - self.start_time, unpack_command(record)))
+
+        self.commands = []
+        self.tones = []
+        self._states = {}
+        self._input_modes = {}
+        self._i2c_lengths = {}
+
+    def _read(self, tracks, port):
+        track = tracks.get(port)
+        if track is None:
+            raise ReplayFinished('The trace has no records for port %s' % str(port))
+
+        if self.speed is None:
+            timestamp, value = track.next()
+            self.clock = max(self.clock, timestamp)
+            return value
+
+        if self._started is None:
+            self._started = time.time()
+        self.clock = self.start_time + (time.time() - self._started) * self.speed
+        return track.at(self.clock)[1]
+
+    @property
+    def elapsed(self):
+        """
+        :return: The seconds of the trace replayed so far.
+        """
+        return self.clock - self.start_time
+
+    # Direct commands
+    def set_output_state(self, port, power, mode, regulation, turn_ratio, run_state, tacho_limit):
+        with self.lock:
+            self._states[port] = (power, mode, regulation, turn_ratio, run_state, tacho_limit)
+            self.commands.append(Command(self.elapsed, (port, power, mode, regulation, turn_ratio,
+                                                        run_state, tacho_limit)))
+
+    def get_output_state(self, port):
+        with self.lock:
+            run_state, power, tacho_count, block_tacho_count, rotation_count = self._read(self._outputs, port)
+            _, mode, regulation, turn_ratio, _, tacho_limit = self._states.get(
+                port, (0, MODE_IDLE, REGULATION_IDLE, 0, RUN_STATE_IDLE, LIMIT_RUN_FOREVER))
+            return (port, power, mode, regulation, turn_ratio, run_state, tacho_limit,
+                    tacho_count, block_tacho_count, rotation_count)
+
+    def reset_motor_position(self, port, relative):
+        pass
+
+    def set_input_mode(self, port, sensor_type, sensor_mode):
+        with self.lock:
+            self._input_modes[port] = (sensor_type, sensor_mode)
+
+    def get_input_values(self, port):
+        with self.lock:
+            valid, _, scaled, raw, normalized = self._read(self._inputs, port)
+            sensor_type, sensor_mode = self._input_modes.get(port, (0, 0))
+            return port, bool(valid), False, sensor_type, sensor_mode, raw, normalized, scaled, 0
+
+    def reset_input_scaled_value(self, port=None):
+        pass
+
+    def ls_write(self, port, tx_data, rx_bytes):
+        with self.lock:
+            self._i2c_lengths[port] = rx_bytes
+
+    def ls_get_status(self, port):
+        return self._i2c_lengths.get(port, 0)
+
+    def ls_read(self, port):
+        with self.lock:
+            length, _, value = self._read(self._i2c, port)[:3]
+            data = value.to_bytes(4, 'little', signed=True)[:length]
+            return data.ljust(self._i2c_lengths.pop(port, length), b'\0')
+
+    def play_tone(self, frequency, duration):
+        with self.lock:
+            self.tones.append((self.elapsed, frequency, duration))
+
+    def play_tone_and_wait(self, frequency, duration):
+        self.play_tone(frequency, duration)
+        if self.speed is not None:
+            time.sleep(duration / 1000 / self.speed)
+
+    def stop_sound_playback(self):
+        pass
+
+    def get_battery_level(self):
+        return 8000
+
+    def keep_alive(self):
+        return 600000
+
+    def get_device_info(self):
+        return 'Replay', self.sock.host, 0, 0
+
+    # Results
+    def diff(self, tolerance=None):
+        """
+        Compares the motor commands sent during the replay with those of the recorded run.
+        :param tolerance: If given, commands sent more than these seconds earlier or later
+        than in the recorded run are reported too.
+        :return: A list of CommandDiff. expected or actual is None if a command is missing.
+        """
+        diffs = []
+        for index in range(max(len(self.expected), len(self.commands))):
+            expected = self.expected[index] if index < len(self.expected) else None
+            actual = self.commands[index] if index < len(self.commands) else None
+            if expected is None or actual is None:
+                diffs.append(CommandDiff(index, expected and expected.args, actual and actual.args, None))
+                continue
+
+            shift = actual.time - expected.time
+            if expected.args != actual.args or (tolerance is not None and abs(shift) > tolerance):
+                diffs.append(CommandDiff(index, expected.args, actual.args, shift))
+        return diffs
+
+
+def replay_robot(trace, speed=None, **kwargs):
+    """
+    Creates a Robot whose sensors and motors read a recorded run. See ReplayBrick.
+    :param trace: The path of a telemetry file or the records of a TelemetryRecorder.
+    :param speed: None for as fast as possible or the speed factor.
+    :param kwargs: Given to the Robot.
+    """
+    kwargs.setdefault('calibration_cache', False)
+    return Robot(ReplayBrick(trace, speed), **kwargs)
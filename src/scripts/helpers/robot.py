@@ -1,16 +1,23 @@
 from __future__ import print_function
 from __future__ import division
 
-from nxt.locator import find_one_brick
 from nxt.sensor import *
 from nxt.motor import *
 
 import time
+from collections import namedtuple
 from math import pi
 from time import sleep
-from morse import string_to_morse
 
-from .utils import countdown
+from .utils import poll_until, coalesce, Deadline, Normalizer
+from .motors import MotorPool, MotorStateCache, wait_all, synchronized_turn
+from .calibration import CalibrationCache, brick_identity
+from .stats import sample_for
+from .connection import connect
+from .telemetry import TelemetryRecorder, TelemetryBrick, RUNNING
+from .metrics import Metrics, MeasuredBrick
+from .tones import compile_morse, encode, play, DEFAULT_WPM, DEFAULT_FREQUENCY
+from .odometry import PoseTracker, spin_degrees
 
 try:
     import threading
@@ -28,6 +35,18 @@ SERVO_DOWN = 0xF0
 SERVO_NICE = 0xFF
 ON = True
 OFF = False
+DEFAULT_SAMPLE_RATE = 20  # Hz
+DEFAULT_POLL_RATE = 100  # Hz
+VERIFY_SAMPLES = 5  # Readings taken to check a cached calibration
+CALIBRATION_TOLERANCE = .1  # Fraction of the calibrated range that readings may fall outside of
+CALIBRATION_RATE = 50  # Hz
+
+# Operations measured when the robot has metrics enabled
+SENSOR_OPERATIONS = ('get_sample', 'get_lightness', 'get_loudness', 'is_pressed', 'get_distance')
+MOTOR_OPERATIONS = ('run', 'turn', 'brake', 'idle', 'get_tacho')
+
+# A sensor reading as published by the SensorSampler
+Sample = namedtuple('Sample', ['value', 'timestamp'])
 
 
 class _Meta(type):
@@ -51,21 +70,51 @@ class Robot(object, metaclass=_Meta):
     def __init__(self, brick=None, debug=True, verbose=False, **kwargs):
         """
         Initialize a new Robot object.
-        :param brick: The brick. Use nxt.locator.find_one_brick. If none brick is given,
-        an attempt to find one brick will be made.
+        :param brick: The brick. Use scripts.helpers.connect. If none brick is given, one is
+        connected to, trying the last brick used first, and reconnected to if the link drops.
         :param debug: Whether print debug messages or not.
         :param verbose: Whether print high verbosity messages or not
         :param kwargs:
         """
         if brick is None:
-            self.brick = find_one_brick(debug=debug)
+            self.brick = connect(debug=debug)
         else:
             self.brick = brick
 
+        # Latency histograms of every brick command and motor and sensor operation, see self.stats.
+        # Either True or a Metrics object. Nothing is wrapped when disabled
+        self.metrics = kwargs.get('metrics', None)
+        if self.metrics is True:
+            self.metrics = Metrics(debug=print)
+        if self.metrics:
+            self.brick = MeasuredBrick(self.brick, self.metrics)
+            if kwargs.get('metrics_interval'):
+                self.metrics.start_dump(kwargs['metrics_interval'])
+        else:
+            self.metrics = None
+
+        # Record every command and reading. Either a TelemetryRecorder or the path of the file to record to
+        self.telemetry = kwargs.get('telemetry', None)
+        self._owns_telemetry = isinstance(self.telemetry, str)
+        if self._owns_telemetry:
+            self.telemetry = TelemetryRecorder(self.telemetry)
+        if self.telemetry is not None:
+            self.brick = TelemetryBrick(self.brick, self.telemetry)
+
+        # The motors created by the robot skip the commands that would not change their state.
+        # Pass motor_cache=False to send every command
+        self.motor_cache = MotorStateCache(self.brick) if kwargs.get('motor_cache', True) else None
+        # The power and the cache generation of the last self.move.run, see self._run
+        self._last_run = None
+
         self.debug = print if debug else lambda *x, **y: None
         self.verbose = print if verbose else lambda *x, **y: None
         self.lock = threading.Lock()
         self._running = False
+        # Set whenever the robot is not running, see self.wait_until_stopped
+        self._stopped = threading.Event()
+        self._stopped.set()
+        self._stop_callbacks = []
 
         # Check if any sensor was given as kwarg
         if 'light' in kwargs:
@@ -83,6 +132,13 @@ class Robot(object, metaclass=_Meta):
         # Now check if a global power was given
         self.power = kwargs.get('power', 100)
 
+        # Sensor reads started less than this many seconds ago are shared instead of repeated.
+        # Reads in progress are always shared between threads, see self._init_sensor
+        self.read_ttl = kwargs.get('read_ttl', 0)
+
+        # How often (in Hz) the until callables are evaluated
+        self.poll_rate = kwargs.get('poll_rate', DEFAULT_POLL_RATE)
+
         # Is there a SynchronizedMotors?
         if 'synchronized' in kwargs:
             self.movement_motor = kwargs['synchronized']
@@ -100,9 +156,45 @@ class Robot(object, metaclass=_Meta):
         # Is there a Servo?
         self.servo = kwargs.get('servo', None)
 
+        # Background sensor sampling, see self.start_sampler
+        self.sampler = None
+
+        # Calibrations are reused between runs. Pass calibration_cache=False to disable it
+        self.calibration_cache = kwargs.get('calibration_cache', None)
+        if self.calibration_cache is None:
+            self.calibration_cache = CalibrationCache()
+        self._brick_id = None
+
+        # Set once the sensors are calibrated
+        self.light_normalizer = None
+        self.sound_normalizer = None
+
+        # Tracks the position of the robot from the wheels, see self.pose. Pass odometry=False to disable it
+        self.odometry = None
+        self._odometry_enabled = kwargs.get('odometry', True)
+
+        # Whether spins and distance moves are done by the synchronized motors with a single command
+        self.synchronized_turns = kwargs.get('synchronized_turns', True)
+
+        # The morse message being played, see self.morse
+        self._playback = None
+
+        # Workers that drive each wheel on its own
+        self.motor_pool = MotorPool()
+        if self.left_motor is not None and self.right_motor is not None:
+            self.motor_pool.start(self.left_motor, self.right_motor)
+            self._init_odometry()
+
     def _init_sensor(self, port, sensor):
         self.debug('Initializing sensor %s at port %s' % (sensor.__name__, str(port)))
-        return sensor(self.brick, port)
+        instance = sensor(self.brick, port)
+        # The sampler, the until callables and the main thread may read it at the same time
+        coalesce(instance, SENSOR_OPERATIONS, self.read_ttl)
+        if self.metrics is not None:
+            self.metrics.instrument(instance, sensor.__name__.lower(), SENSOR_OPERATIONS)
+        if self.sampler is not None:
+            self.sampler.add(sensor.__name__.lower(), instance)
+        return instance
 
     def init_synchronized_motors(self, port_left_motor, port_right_motor):
         """
@@ -111,20 +203,110 @@ class Robot(object, metaclass=_Meta):
         :param port_right_motor:  The port of the right motor.
         :return: The newly created SynchronizedMotors object.
         """
-        self.left_motor = Motor(self.brick, port_left_motor)
-        self.right_motor = Motor(self.brick, port_right_motor)
+        self.left_motor = Motor(self._motor_brick, port_left_motor)
+        self.right_motor = Motor(self._motor_brick, port_right_motor)
         self.movement_motor = SynchronizedMotors(self.left_motor, self.right_motor, 0)
+        if self.metrics is not None:
+            self.metrics.instrument(self.left_motor, 'motor', MOTOR_OPERATIONS)
+            self.metrics.instrument(self.right_motor, 'motor', MOTOR_OPERATIONS)
+            self.metrics.instrument(self.movement_motor, 'move', MOTOR_OPERATIONS)
+        self.motor_pool.start(self.left_motor, self.right_motor)
+        self._init_odometry()
         return self.move
 
+    @property
+    def _motor_brick(self):
+        return self.motor_cache if self.motor_cache is not None else self.brick
+
+    @property
+    def _motors_cached(self):
+        # Motors given to the constructor may bypass the cache
+        return self.left_motor.brick is self.motor_cache and self.right_motor.brick is self.motor_cache
+
+    def _init_odometry(self):
+        if self._odometry_enabled:
+            self.odometry = PoseTracker(self.left_motor, self.right_motor, WHEEL_DIAMETER, WHEELS_DISTANCE)
+
     def init_servo(self, port):
         """
         Initializes a servo motor. It does not change its initial position, though.
         :param port: The port where the servo motor is connected to.
         :return: The newly created Motor object
         """
-        self.servo = Motor(self.brick, port)
+        self.servo = Motor(self._motor_brick, port)
+        if self.metrics is not None:
+            self.metrics.instrument(self.servo, 'servo', MOTOR_OPERATIONS)
         return self.servo
 
+    def start_sampler(self, rate=DEFAULT_SAMPLE_RATE, rates=None):
+        """
+        Starts reading every initialized sensor from a single background thread.
+        Sensors initialized afterwards are sampled as well.
+        Use self.reading to get the latest value of a sensor without touching the brick.
+        :param rate: The default sampling rate in Hz.
+        :param rates: A dict of port -> rate (in Hz) overriding the default rate for that port.
+        :return: The SensorSampler object.
+        """
+        if self.sampler is None:
+            self.sampler = SensorSampler(rate=rate, rates=rates, debug=self.debug)
+
+        for sensor in AVAILABLE_SENSORS:
+            name = sensor.__name__.lower()
+            instance = getattr(self, name)
+            if instance is not None:
+                self.sampler.add(name, instance)
+
+        self.sampler.start()
+        return self.sampler
+
+    def stop_sampler(self):
+        """
+        Stops the background sensor sampling, if any.
+        """
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+
+    def close(self):
+        """
+        Stops the background threads used by the robot: the sensor sampler and the motor workers.
+        Closes the telemetry file if the robot opened it.
+        """
+        self.stop_sampler()
+        self.stop_morse()
+        self.motor_pool.shutdown()
+        if self._owns_telemetry:
+            self.telemetry.close()
+        if self.metrics is not None:
+            self.metrics.stop_dump()
+
+    def stats(self):
+        """
+        :return: A dict of operation -> count, mean, min, max and percentiles of its latency in seconds.
+        Brick commands are named 'brick.<command>', e.g. 'brick.get_input_values'. Empty if the robot
+        was created without metrics=True.
+        """
+        if self.metrics is None:
+            return {}
+        return self.metrics.snapshot()
+
+    def reading(self, name):
+        """
+        Returns the latest value of a sensor. If the sampler is running the cached value is
+        returned, otherwise the sensor is read from the brick.
+        :param name: The sensor name: 'light', 'sound', 'touch' or 'ultrasonic'.
+        :return: The sensor value.
+        """
+        if self.sampler is not None:
+            sample = self.sampler.latest(name)
+            if sample is not None:
+                return sample.value
+
+        sensor = getattr(self, name, None)
+        if sensor is None:
+            raise RobotError('No %s sensor to read.' % name)
+        return sensor.get_sample()
+
     # utils functions
     def _move(self, dist=None, until=None, seconds=None, until_args=(), until_kwargs=None, **kwargs):
         if not self.move:
@@ -153,25 +335,30 @@ class Robot(object, metaclass=_Meta):
 
             }
             if until is not None:
+                # Imported here, the conditions are built on top of the robot
+                from .conditions import Condition
+                if isinstance(until, Condition):
+                    until = until.compile(self)
                 if not callable(until):
                     raise RobotError('Parameter "until" must be a callable and must return boolean')
                 else:
                     thread_kwargs['args'] = until_args
                     thread_kwargs['kwargs'] = until_kwargs
+                    thread_kwargs['poll_rate'] = kwargs.get('poll_rate', self.poll_rate)
+                    thread_kwargs['backoff'] = kwargs.get('backoff', 1)
+                    thread_kwargs['max_poll_interval'] = kwargs.get('max_poll_interval', None)
                     thread = threading.Thread(target=self._move_until, args=(until,), kwargs=thread_kwargs)
             else:
-                thread_kwargs['args'] = (time.time(), seconds)
-                thread_kwargs['kwargs'] = {}
-                thread = threading.Thread(target=self._move_until, args=(countdown,), kwargs=thread_kwargs)
+                thread = threading.Thread(target=self._move_for, args=(seconds,), kwargs=thread_kwargs)
 
             thread.start()
-            if wait and self.running:
+            if wait:
                 self.verbose('Waiting for the robot to stop running...')
-                thread.join()
+                self.wait_until_stopped()
 
         else:
             self.verbose('Moving forever with power=%s' % str(power))
-            self.move.run(power)
+            self._run(power, kwargs.get('force', False))
             # When this part of the code is reached we face a little problem
             # self.running is set to True and is up to the developer to reset it
             if wait:
@@ -189,11 +376,16 @@ class Robot(object, metaclass=_Meta):
         the Thread execution will be stopped until the robot stops running.
         :param dist: The distance condition.
         :param until: The until condition. Must be a callable and must explicitly state that it
-        receives *args and **kwargs as its arguments.
+        receives *args and **kwargs as its arguments, or a conditions.Condition, e.g.
+        (Light() > .9) | Touch().pressed, which reads every sensor at most once per evaluation.
         :param seconds: The seconds condition.
         :param until_args: The list of arguments that will receive the until callable, if any given.
         :param until_kwargs:
         :param kwargs: The dict of keyword arguments that will be passed to the until callable.
+
+        Other accepted kwargs are power, brake, wait, poll_rate (how many times per second the
+        until callable is evaluated), backoff (factor by which the polling interval grows while
+        the until callable returns False) and max_poll_interval (upper bound for that interval).
         """
         if until_kwargs is None:
             until_kwargs = {}
@@ -218,11 +410,15 @@ class Robot(object, metaclass=_Meta):
         the Thread execution will be stopped until the robot stops running.
         :param dist: The distance condition.
         :param until: The until condition. Must be a callable and must explicitly state that it
-        receives *args and **kwargs as its arguments.
+        receives *args and **kwargs as its arguments, or a conditions.Condition.
         :param seconds: The seconds condition.
         :param until_args: The list of arguments that will receive the until callable, if any given.
         :param until_kwargs: The dict of keyword arguments that will be passed to the until callable.
         :param kwargs: The dict of keyword arguments that will be passed to the until callable.
+
+        Other accepted kwargs are power, brake, wait, poll_rate (how many times per second the
+        until callable is evaluated), backoff (factor by which the polling interval grows while
+        the until callable returns False) and max_poll_interval (upper bound for that interval).
         """
         if until_kwargs is None:
             until_kwargs = {}
@@ -237,7 +433,8 @@ class Robot(object, metaclass=_Meta):
             self.running = False
             raise e
 
-    def _move_until(self, until, power=None, brake=False, args=(), kwargs=None):
+    def _move_until(self, until, power=None, brake=False, args=(), kwargs=None, poll_rate=None, backoff=1,
+                    max_poll_interval=None):
         """
         Warning: This function is intended to be invoked by a separate thread.
 
@@ -246,27 +443,84 @@ class Robot(object, metaclass=_Meta):
         :param power: The power that will be used to move the motors.
         :param brake: Whether the motors should be braked at the end of the execution.
         :param kwargs: The until callable kwargs
+        :param poll_rate: How many times per second the until callable is evaluated.
+        :param backoff: Factor by which the polling interval grows while until returns False.
+        :param max_poll_interval: Upper bound in seconds for the polling interval.
         """
         if kwargs is None:
             kwargs = {}
         if power is None:
             power = self.power
+        if poll_rate is None:
+            poll_rate = self.poll_rate
+        if self.metrics is not None:
+            until = self.metrics.loop('move_until', until)
+        try:
+            self._run(power)
+            # If self.stop was invoked meanwhile there is nothing left to do
+            if poll_until(until, 1 / poll_rate, args=args, kwargs=kwargs, event=self._stopped, backoff=backoff,
+                          max_interval=max_poll_interval):
+                self.stop(brake)
+        except BaseException:
+            # Do not leave anyone waiting for a robot that will never stop
+            self.running = False
+            raise
+
+    def _move_for(self, seconds, power=None, brake=False):
+        """
+        Warning: This function is intended to be invoked by a separate thread.
+
+        :param seconds: The amount of seconds to move.
+        :param power: The power that will be used to move the motors.
+        :param brake: Whether the motors should be braked at the end of the execution.
+        """
+        if power is None:
+            power = self.power
+        try:
+            self._run(power)
+            if Deadline(seconds).wait(self._stopped):
+                self.stop(brake)
+        except BaseException:
+            self.running = False
+            raise
+
+    def _run(self, power, force=False):
+        """
+        Runs the synchronized motors unless they already run with that power, e.g. when
+        move_forward is invoked again while moving forward.
+        :param power: The power.
+        :param force: Whether to send the commands anyway.
+        """
+        if self.motor_cache is None or not self._motors_cached:
+            self.move.run(power)
+            return
+        ports = self.left_motor.port, self.right_motor.port
+        if not force and self._last_run == (power, self.motor_cache.generation(*ports)):
+            self.verbose('Already running with power=%s' % str(power))
+            return
         self.move.run(power)
-        while not until(*args, **kwargs):
-            pass
-        self.stop(brake)
+        self._last_run = power, self.motor_cache.generation(*ports)
 
-    def stop(self, brake=False):
+    def stop(self, brake=False, force=False):
         """
         If the robot is running, this method will stop it immediately.
         Otherwise, it will have no effect on the robot.
         :param brake: Whether the motors should be braked after stop them.
+        :param force: Whether to send the commands even if the motors seem to be stopped
+        already, e.g. after moving them with a tool other than this robot.
         """
+        if force and self.motor_cache is not None:
+            self.motor_cache.invalidate(self.left_motor.port, self.right_motor.port)
+        was_running = self.running
         self.move.idle()
         if brake:
             self.move.brake()
+        self._last_run = None
 
         self.running = False
+        # The wheels of an idle robot did not move since the last update
+        if was_running:
+            self._update_pose()
 
     def turn_right(self, power=None, degrees=0):
         """
@@ -279,6 +533,7 @@ class Robot(object, metaclass=_Meta):
             power = self.power
         self.stop()
         self.left_motor.turn(power, degrees)
+        self._update_pose()
 
     def turn_left(self, power=None, degrees=0):
         """
@@ -291,6 +546,7 @@ class Robot(object, metaclass=_Meta):
             power = self.power
         self.stop()
         self.right_motor.turn(power, degrees)
+        self._update_pose()
 
     def _move_dist(self, dist, power=None):
         """
@@ -312,14 +568,19 @@ class Robot(object, metaclass=_Meta):
 
         power = power if dist > 0 else power * -1
         dist = abs(dist)
-        left_turn = threading.Thread(target=self.left_motor.turn, args=(power, dist))
-        right_turn = threading.Thread(target=self.right_motor.turn, args=(power, dist))
-
-        left_turn.start()
-        right_turn.start()
-
-        left_turn.join()
-        right_turn.join()
+        positions = None
+        try:
+            if self.synchronized_turns:
+                positions = synchronized_turn(self.move, power, dist, positions=self._wheel_positions())
+                return
+
+            wait_all([
+                self.motor_pool.turn(self.left_motor, power, dist),
+                self.motor_pool.turn(self.right_motor, power, dist),
+            ])
+        finally:
+            # A synchronized maneuver already read where the wheels ended
+            self._update_pose(positions)
 
     def spin(self, degrees, power=None):
         """
@@ -344,33 +605,95 @@ class Robot(object, metaclass=_Meta):
         degrees = abs(degrees)
         self.verbose('Left power', left_power)
         self.verbose('Right power', right_power)
-        left_turn = threading.Thread(target=self.left_motor.turn, args=(left_power, degrees))
-        right_turn = threading.Thread(target=self.right_motor.turn, args=(right_power, degrees))
+        positions = None
+        try:
+            if self.synchronized_turns:
+                # The right wheel follows the left one in the opposite direction
+                positions = synchronized_turn(self.move, left_power, degrees, turn_ratio=100,
+                                              positions=self._wheel_positions())
+                return
+
+            wait_all([
+                self.motor_pool.turn(self.left_motor, left_power, degrees),
+                self.motor_pool.turn(self.right_motor, right_power, degrees),
+            ])
+        finally:
+            self._update_pose(positions)
 
-        left_turn.start()
-        right_turn.start()
+    def plan(self, power=None):
+        """
+        Starts a motion plan: straight, spin and arc segments run back to back by the
+        synchronized motors, e.g. robot.plan().straight(10).spin(270).run().
+        :param power: The default power of the segments.
+        :return: The motion.MotionPlan.
+        """
+        # Imported here, the plans are built on top of the robot
+        from .motion import MotionPlan
+        return MotionPlan(self, power)
 
-        left_turn.join()
-        right_turn.join()
+    def _update_pose(self, positions=None):
+        if self.odometry is not None:
+            self.odometry.update(positions)
 
-    def morse(self, message):
+    def _wheel_positions(self):
+        # Where the wheels were at the last pose update. They only pace the polling of
+        # maneuvers, so it does not matter if they are outdated
+        return self.odometry.positions if self.odometry is not None else None
+
+    @property
+    def pose(self):
         """
-        Causes the brick to play a sequence of tones representing morse code.
+        :return: The odometry.Pose of the robot relative to where the synchronized motors were
+        initialized, or None if there is no odometry.
+        """
+        if self.odometry is None:
+            return None
+        return self.odometry.update()
+
+    def return_to_start(self, power=None):
+        """
+        Goes back to where the synchronized motors were initialized by the shortest path:
+        a single spin and a single straight move, backwards if the start is behind the robot.
+        :param power: The power to use.
+        """
+        if self.odometry is None:
+            raise RobotError('Cannot return to start without odometry. Invoke "init_synchronized_motors"')
+        self.odometry.update()
+        rotation, distance = self.odometry.path_to_start()
+        self.debug('Returning to start: spin %.1f degrees and move %.1f' % (rotation * 180 / pi, distance))
+        degrees = spin_degrees(rotation, self.odometry.wheel_diameter, self.odometry.wheels_distance)
+        if abs(degrees) >= 1:
+            self.spin(degrees, power)
+        if abs(distance) >= DISTANCE_PER_ROTATION / 360:
+            self.move_forward(dist=distance, power=power if power is not None else self.power)
+
+    def morse(self, message, wait=True, wpm=DEFAULT_WPM, freq=DEFAULT_FREQUENCY):
+        """
+        Causes the brick to play a sequence of tones representing morse code, with the standard
+        timing. The tones are sent from a background thread, so the robot can keep moving.
+        A message being played is cancelled by the next one.
         :param message: The message to encode as morse code.
+        :param wait: Whether to block until the message is over.
+        :param wpm: The speed in words per minute.
+        :param freq: The tone frequency in Hz.
+        :return: The tones.Playback, which can be cancelled.
         """
-        # TODO: Adjust the wait and sleep values
         self.debug('Playing message: %s' % message)
-        as_morse = string_to_morse(message)
-        self.verbose('Morse repr: %s' % str(as_morse))
-        freq = 1000
-        for letter in as_morse:
-            for m in letter:
-                if m == '.':
-                    self.brick.play_tone_and_wait(freq, 50)
-                else:
-                    self.brick.play_tone_and_wait(freq, 100)
-                sleep(.2)
-            sleep(.4)
+        schedule = compile_morse(message, wpm, freq)
+        self.verbose('Morse repr: %s' % str(encode(message)))
+        self.stop_morse()
+        self._playback = play(self.brick, schedule)
+        if wait:
+            self._playback.wait()
+        return self._playback
+
+    def stop_morse(self):
+        """
+        Cancels the morse message being played, if any.
+        """
+        if self._playback is not None:
+            self._playback.cancel()
+            self._playback = None
 
     # Props
     @property
@@ -379,33 +702,103 @@ class Robot(object, metaclass=_Meta):
 
     @property
     def running(self):
-        try:
-            self.lock.acquire()
-            # self.verbose('Acquired lock in Robot.running')
-            return self._running
-        finally:
-            self.lock.release()
-            # self.verbose('Released lock in Robot.running')
+        # Reading a bool is atomic, only writers take the lock
+        return self._running
 
     @running.setter
     def running(self, val):
-        self.lock.acquire()
-        # self.verbose('Acquired lock in running property in thread', threading.get_ident())
-        self._running = val
-        self.lock.release()
-        # self.verbose('Released lock in running property in thread', threading.get_ident())
+        with self.lock:
+            stopping = self._running and not val
+            self._running = val
+            if val:
+                self._stopped.clear()
+            else:
+                self._stopped.set()
+            callbacks = list(self._stop_callbacks) if stopping else []
+            if self.telemetry is not None:
+                self.telemetry.record(RUNNING, value=int(bool(val)))
+
+        for callback in callbacks:
+            callback(self)
+
+    def wait_until_stopped(self, timeout=None):
+        """
+        Blocks the calling thread until the robot stops running. The thread sleeps meanwhile
+        and is woken up as soon as the robot stops.
+        :param timeout: The maximum amount of seconds to wait. None waits forever.
+        :return: True if the robot is stopped, False if the timeout expired first.
+        """
+        return self._stopped.wait(timeout)
+
+    def on_stop(self, callback):
+        """
+        Registers a callable that is invoked with the robot every time it stops running.
+        It can be used as a decorator.
+        :param callback: The callable.
+        :return: The callable.
+        """
+        with self.lock:
+            self._stop_callbacks.append(callback)
+        return callback
+
+    def remove_on_stop(self, callback):
+        with self.lock:
+            if callback in self._stop_callbacks:
+                self._stop_callbacks.remove(callback)
 
     # Calibration stuff
-    def calibrate_light(self, interactive=False):
+    @property
+    def brick_id(self):
+        if self._brick_id is None:
+            self._brick_id = brick_identity(self.brick)
+        return self._brick_id
+
+    def _cached_calibration(self, sensor):
+        if not self.calibration_cache:
+            return None
+        return self.calibration_cache.get(self.brick_id, sensor.port, type(sensor).__name__)
+
+    def _store_calibration(self, sensor, values):
+        if self.calibration_cache:
+            self.calibration_cache.put(self.brick_id, sensor.port, type(sensor).__name__, values)
+
+    def _verify_calibration(self, sensor, lower, upper):
+        """
+        Takes a few samples and checks that all of them are within the given bounds.
+        """
+        for _ in range(VERIFY_SAMPLES):
+            reading = sensor.get_sample()
+            self.verbose('[VERIFY] %s reading:' % type(sensor).__name__, reading)
+            if not lower <= reading <= upper:
+                return False
+        return True
+
+    def calibrate_light(self, interactive=False, recalibrate=False, verify=True):
         """
         Calibrates the light sensor. The first return number represents the lowest value read.
-        The second one is the highest value read.
+        The second one is the highest value read. Afterwards self.light_normalizer maps the
+        readings to the [0, 1] range.
+        If the calibration cache has values for this brick and sensor, those are used instead
+        once a few readings confirm that they still make sense.
         :param interactive: Whether it should wait until the user press the enter key to continue.
+        :param recalibrate: Whether to ignore the cached values.
+        :param verify: Whether to check the cached values against a few readings.
         :return: A tuple with the minimum value read and the maximum value read.
         """
         if self.light is None:
             raise RobotError('No light sensor to calibrate.')
 
+        cached = None if recalibrate else self._cached_calibration(self.light)
+        if cached is not None:
+            black, white = cached
+            margin = CALIBRATION_TOLERANCE * abs(white - black)
+            if not verify or self._verify_calibration(self.light, min(black, white) - margin,
+                                                      max(black, white) + margin):
+                self.debug('Cached calibration values: white=%d, black=%d' % (white, black))
+                self.light_normalizer = Normalizer(black, white)
+                return black, white
+            self.debug('Cached calibration does not match the readings.')
+
         self.debug('Calibrating light sensor...')
 
         end = ' ' if interactive else '\n'
@@ -417,7 +810,7 @@ class Robot(object, metaclass=_Meta):
         else:
             sleep(4)
         print('Reading white value...')
-        white = self.light.get_lightness()
+        white = self._sample_light()
 
         sleep(.5)
         print('Please point the sensor to the black line', end=end)
@@ -426,23 +819,49 @@ class Robot(object, metaclass=_Meta):
         else:
             sleep(4)
         print('Reading black value...')
-        black = self.light.get_lightness()
+        black = self._sample_light()
 
         self.debug('Calibration values: white=%d, black=%d' % (white, black))
+        self._store_calibration(self.light, (black, white))
+        self.light_normalizer = Normalizer(black, white)
         return black, white
 
+    def _sample_light(self, seconds=.5):
+        """
+        :return: The median of the light readings taken during the given seconds.
+        """
+        stats = sample_for(self.light.get_lightness, seconds, CALIBRATION_RATE)
+        self.verbose('Light readings: %s' % repr(stats))
+        return int(round(stats.percentile(.5)))
+
     def calibrate_ultrasonic(self):
         if self.ultrasonic is None:
             raise RobotError('No ultrasound sensor to calibrate.')
 
-    def calibrate_sound(self, interactive=False):
+    def calibrate_sound(self, interactive=False, recalibrate=False, verify=True):
         """
-        Calibrates the sound sensor.
+        Calibrates the sound sensor. Afterwards self.sound_normalizer maps the readings
+        to the [0, 1] range.
+        If the calibration cache has values for this brick and sensor, those are used instead
+        once a few readings confirm that the environment is still quiet.
         :param interactive: Whether the process should be interactive with the user or not.
+        :param recalibrate: Whether to ignore the cached values.
+        :param verify: Whether to check the cached values against a few readings.
+        :return: A tuple with the quiet and the loud values.
         """
         if self.sound is None:
             raise RobotError('No sound sensor to calibrate.')
 
+        cached = None if recalibrate else self._cached_calibration(self.sound)
+        if cached is not None:
+            quiet, loud = cached
+            upper = quiet + CALIBRATION_TOLERANCE * (loud - quiet)
+            if not verify or self._verify_calibration(self.sound, 0, upper):
+                self.debug('Cached calibration values: quiet=%f, loud=%f' % (quiet, loud))
+                self.sound_normalizer = Normalizer(quiet, loud)
+                return quiet, loud
+            self.debug('Cached calibration does not match the readings.')
+
         print("Calibrating sound sensor...")
         sleep(.5)
 
@@ -452,17 +871,13 @@ class Robot(object, metaclass=_Meta):
         else:
             sleep(1)
 
-        i = time.time()
-        s = 4
-        quiet_values = []
-        self.verbose('%s seconds remaining' % str(time.time() - i))
-        while not countdown(i, s):
-            reading = self.sound.get_sample()
-            self.verbose('[QUIET] Sound sample reading:', reading)
-            quiet_values.append(reading)
+        quiet_stats = sample_for(self.sound.get_sample, 4, CALIBRATION_RATE,
+                                 callback=lambda r: self.verbose('[QUIET] Sound sample reading:', r))
+        self.verbose('Quiet readings: %s' % repr(quiet_stats))
 
-        quiet = sum(quiet_values) / len(quiet_values)
-        max_quiet = max(quiet_values)
+        # Medians and percentiles are not thrown off by a single spike like the mean and max are
+        quiet = quiet_stats.percentile(.5)
+        max_quiet = quiet_stats.percentile(.95)
 
         print('Quiet environment calibrated')
         sleep(.5)
@@ -473,19 +888,18 @@ class Robot(object, metaclass=_Meta):
         else:
             sleep(1)
 
-        i = time.time()
-        s = 4
-        loud_values = []
-        while not countdown(i, s):
-            reading = self.sound.get_sample()
-            self.verbose('[LOUD] Sound sample reading:', reading)
-            if reading > max_quiet:
-                loud_values.append(reading)
+        loud_stats = sample_for(self.sound.get_sample, 4, CALIBRATION_RATE, accept=lambda r: r > max_quiet,
+                                callback=lambda r: self.verbose('[LOUD] Sound sample reading:', r))
+        self.verbose('Loud readings: %s' % repr(loud_stats))
+        if loud_stats.count == 0:
+            raise RobotError('No sound was louder than the quiet environment. Calibrate again.')
 
-        loud = sum(loud_values) / len(loud_values)
+        loud = loud_stats.percentile(.5)
 
         print('Loud environment calibrated')
         self.debug('Calibration values: quiet=%f, loud=%f' % (quiet, loud))
+        self._store_calibration(self.sound, (quiet, loud))
+        self.sound_normalizer = Normalizer(quiet, loud)
 
         return quiet, loud
 
@@ -534,5 +948,123 @@ class Robot(object, metaclass=_Meta):
         self.light.set_illuminated(state)
 
 
+class SensorSampler(object):
+    def __init__(self, rate=DEFAULT_SAMPLE_RATE, rates=None, debug=None):
+        """
+        Reads a set of sensors from one background thread and keeps the latest
+        timestamped value of each one, so that readers never go through the brick.
+        :param rate: The default sampling rate in Hz.
+        :param rates: A dict of port -> rate (in Hz) overriding the default rate for that port.
+        :param debug: Callable used to report read errors.
+        """
+        self.rate = rate
+        self.rates = dict(rates or {})
+        self.debug = debug if debug is not None else lambda *x, **y: None
+        self.reads = 0
+        self.errors = 0
+
+        self._sensors = {}
+        self._samples = {}
+        self._due = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = True
+        self._thread = None
+
+    def add(self, name, sensor, rate=None):
+        """
+        Registers a sensor to be sampled. Registering a name again replaces the sensor.
+        :param name: The name under which the samples are published.
+        :param sensor: The sensor object. It must provide get_sample.
+        :param rate: The sampling rate in Hz. Defaults to the rate given for the sensor port.
+        """
+        if rate is None:
+            rate = self.rates.get(getattr(sensor, 'port', None), self.rate)
+        if rate <= 0:
+            raise RobotError('Sampling rate must be a positive number')
+
+        with self._lock:
+            self._sensors[name] = (sensor, 1 / rate)
+            self._due[name] = time.time()
+        self._wakeup.set()
+
+    def remove(self, name):
+        with self._lock:
+            self._sensors.pop(name, None)
+            self._samples.pop(name, None)
+            self._due.pop(name, None)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='SensorSampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and not self._stopped
+
+    def latest(self, name):
+        """
+        :param name: The sensor name.
+        :return: The latest Sample of the sensor or None if it was never read.
+        """
+        return self._samples.get(name)
+
+    def value(self, name, default=None):
+        sample = self._samples.get(name)
+        return default if sample is None else sample.value
+
+    def snapshot(self):
+        """
+        :return: A dict of name -> Sample with the latest reading of every sensor.
+        """
+        return dict(self._samples)
+
+    def _read(self, name, sensor):
+        try:
+            value = sensor.get_sample()
+        except Exception as e:
+            self.errors += 1
+            self.debug('Error reading sensor %s: %s' % (name, str(e)))
+            return
+        self.reads += 1
+        # Replacing the whole tuple keeps readers lock-free
+        self._samples[name] = Sample(value, time.time())
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.clear()
+            with self._lock:
+                sensors = list(self._sensors.items())
+
+            next_due = None
+            for name, (sensor, period) in sensors:
+                due = self._due.get(name)
+                if due is None:
+                    # Removed while we were reading other sensors
+                    continue
+                if due <= time.time():
+                    self._read(name, sensor)
+                    # Keep the schedule but never try to catch up on missed reads
+                    due = max(due + period, time.time())
+                    with self._lock:
+                        if name in self._due:
+                            self._due[name] = due
+                next_due = due if next_due is None else min(next_due, due)
+
+            timeout = None if next_due is None else max(0, next_due - time.time())
+            self._wakeup.wait(timeout)
+
+
 class RobotError(Exception):
     pass
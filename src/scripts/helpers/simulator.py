@@ -0,0 +1,343 @@
+from __future__ import division
+
+from nxt.motor import MODE_MOTOR_ON, REGULATION_MOTOR_SYNC, RUN_STATE_IDLE, LIMIT_RUN_FOREVER
+from nxt.sensor.common import Type, Mode
+
+import time
+import random
+from collections import Counter
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# Degrees per second that a motor turns for each unit of power (about 150 rpm at full power)
+DEGREES_PER_POWER = 9
+
+# I2C registers of the LEGO ultrasonic sensor
+ULTRASONIC_REGISTERS = {
+    0x00: b'V1.0\0\0\0\0',
+    0x08: b'LEGO\0\0\0\0',
+    0x10: b'Sonar\0\0\0',
+    0x14: b'10E-2m\0',
+}
+ULTRASONIC_MEASUREMENTS = 0x42
+
+DEFAULT_SENSOR_VALUES = {
+    Type.LIGHT_ACTIVE: 500,
+    Type.LIGHT_INACTIVE: 500,
+    Type.SOUND_DB: 20,
+    Type.SOUND_DBA: 20,
+    Type.SWITCH: False,
+    Type.LOW_SPEED_9V: 255,
+}
+
+
+class LatencyProfile(object):
+    def __init__(self, name, latency=0, reply_latency=None, jitter=0, commands=None):
+        """
+        Describes how long the direct commands take to go through the connection.
+        :param name: The connection type, 'usb' or 'bluetooth'. nxt.motor uses it to
+        choose the accuracy of Motor.turn.
+        :param latency: Seconds that a command without reply takes to be sent.
+        :param reply_latency: Seconds of the round trip of a command with reply.
+        Defaults to the latency.
+        :param jitter: Standard deviation (in seconds) of the time added to every command.
+        :param commands: A dict of command name -> (latency, jitter) overriding the values above.
+        """
+        self.name = name
+        self.latency = latency
+        self.reply_latency = latency if reply_latency is None else reply_latency
+        self.jitter = jitter
+        self.commands = dict(commands or {})
+
+    def delay(self, command, reply, rng=random):
+        """
+        :param command: The command name.
+        :param reply: Whether the command waits for a reply.
+        :param rng: The random.Random used for the jitter.
+        :return: The seconds that the given command takes.
+        """
+        if command in self.commands:
+            latency, jitter = self.commands[command]
+        else:
+            latency = self.reply_latency if reply else self.latency
+            jitter = self.jitter
+
+        if jitter:
+            latency += abs(rng.gauss(0, jitter))
+        return latency
+
+    def __repr__(self):
+        return 'LatencyProfile(%r, latency=%r, reply_latency=%r, jitter=%r)' % (
+            self.name, self.latency, self.reply_latency, self.jitter)
+
+
+NO_LATENCY = LatencyProfile('usb')
+USB = LatencyProfile('usb', latency=.001, reply_latency=.003, jitter=.0005)
+BLUETOOTH = LatencyProfile('bluetooth', latency=.015, reply_latency=.045, jitter=.01)
+
+
+class SimulatedSock(object):
+    bsize = 60
+
+    def __init__(self, type, host):
+        self.type = type
+        self.host = host
+
+    def __str__(self):
+        return 'Simulated %s (%s)' % (self.type, self.host)
+
+    def close(self):
+        pass
+
+
+class SimulatedMotor(object):
+    def __init__(self, port):
+        self.port = port
+        self.power = 0
+        self.mode = 0
+        self.regulation = 0
+        self.turn_ratio = 0
+        self.run_state = RUN_STATE_IDLE
+        self.tacho_limit = LIMIT_RUN_FOREVER
+        self.tacho_count = 0
+        self.block_tacho_count = 0
+        self.rotation_count = 0
+        # Fraction of the power actually used, see SimulatedBrick._sync_factor
+        self.factor = 1
+        self._limit_origin = 0
+        self._updated = time.time()
+
+    @property
+    def moving(self):
+        # MODE_BRAKE only changes how the motor stops: braked instead of coasting
+        return bool(self.mode & MODE_MOTOR_ON) and self.run_state != RUN_STATE_IDLE and self.power != 0
+
+    def update(self, now):
+        dt = now - self._updated
+        self._updated = now
+        if not self.moving:
+            return
+
+        delta = DEGREES_PER_POWER * self.power * self.factor * dt
+        if self.tacho_limit != LIMIT_RUN_FOREVER:
+            # Synchronized motors stop together, when the fastest one reaches the limit
+            limit = self.tacho_limit * abs(self.factor)
+            remaining = limit - abs(self.tacho_count - self._limit_origin)
+            if abs(delta) >= remaining:
+                # The factor may have changed since the limit was set, never turn back
+                remaining = max(remaining, 0)
+                delta = remaining if delta > 0 else -remaining
+                self.power = 0
+                self.run_state = RUN_STATE_IDLE
+
+        self.tacho_count += delta
+        self.block_tacho_count += delta
+        self.rotation_count += delta
+
+    def set_state(self, power, mode, regulation, turn_ratio, run_state, tacho_limit):
+        self.power = power
+        self.mode = mode
+        self.regulation = regulation
+        self.turn_ratio = turn_ratio
+        self.run_state = run_state
+        self.tacho_limit = tacho_limit
+        self._limit_origin = self.tacho_count
+
+
+class SimulatedSensor(object):
+    def __init__(self, port):
+        self.port = port
+        self.type = Type.NO_SENSOR
+        self.mode = Mode.RAW
+        self.source = None
+        self.pending = b''
+
+    def value(self):
+        source = self.source
+        if source is None:
+            return DEFAULT_SENSOR_VALUES.get(self.type, 0)
+        if callable(source):
+            return source()
+        return source
+
+
+def _command(reply):
+    """
+    Turns a method into a direct command of the simulated brick. Like on a real
+    brick only one command can go through the connection at a time.
+    """
+    def decorator(func):
+        name = func.__name__
+
+        def wrapper(self, *args, **kwargs):
+            with self.lock:
+                self.commands[name] += 1
+                delay = self.profile.delay(name, reply, self.random)
+                self.bus_time += delay
+                if delay:
+                    time.sleep(delay)
+                return func(self, *args, **kwargs)
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return decorator
+
+
+class SimulatedBrick(object):
+    def __init__(self, profile=NO_LATENCY, name='NXT', host='00:16:53:00:00:00', seed=None):
+        """
+        A stand-in for nxt.brick.Brick. It implements the direct commands used by the
+        motors and sensors of nxt-python, moving the motors and answering the sensors
+        as a real brick would, and takes as long as the given latency profile says.
+        :param profile: The LatencyProfile. Use NO_LATENCY, USB or BLUETOOTH.
+        :param name: The brick name.
+        :param host: The brick address.
+        :param seed: Seed for the latency jitter, for reproducible runs.
+        """
+        self.profile = profile
+        self.name = name
+        self.sock = SimulatedSock(profile.name, host)
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.commands = Counter()
+        self.bus_time = 0
+        self.tones = []
+
+        self.motors = dict((port, SimulatedMotor(port)) for port in range(3))
+        self.sensors = dict((port, SimulatedSensor(port)) for port in range(4))
+
+    # Simulation API
+    def set_sensor(self, port, value):
+        """
+        Sets what the sensor at the given port reads.
+        :param port: The sensor port.
+        :param value: A number (a boolean for touch sensors) or a callable returning one.
+        """
+        self.sensors[port].source = value
+
+    def reset_counters(self):
+        self.commands.clear()
+        self.bus_time = 0
+
+    @property
+    def total_commands(self):
+        return sum(self.commands.values())
+
+    def _update_motors(self):
+        now = time.time()
+        for motor in self.motors.values():
+            motor.factor = self._sync_factor(motor)
+            motor.update(now)
+
+    def _sync_factor(self, motor):
+        """
+        Synchronized motors with a turn ratio slow one of the wheels down: a positive ratio
+        slows the motor with the lowest port, a negative one the other motor. A ratio of 100
+        makes the slowed motor turn backwards at full power.
+        """
+        if motor.regulation != REGULATION_MOTOR_SYNC or not motor.turn_ratio:
+            return 1
+        synced = [m.port for m in self.motors.values() if m.regulation == REGULATION_MOTOR_SYNC]
+        if len(synced) < 2:
+            # The other motor has not been told to synchronize yet
+            return 1
+        lowest = motor.port == min(synced)
+        if (motor.turn_ratio > 0) == lowest:
+            return 1 - 2 * abs(motor.turn_ratio) / 100
+        return 1
+
+    # Direct commands
+    @_command(reply=False)
+    def set_output_state(self, port, power, mode, regulation, turn_ratio, run_state, tacho_limit):
+        self._update_motors()
+        self.motors[port].set_state(power, mode, regulation, turn_ratio, run_state, tacho_limit)
+
+    @_command(reply=True)
+    def get_output_state(self, port):
+        self._update_motors()
+        m = self.motors[port]
+        return (port, m.power, m.mode, m.regulation, m.turn_ratio, m.run_state, m.tacho_limit,
+                int(round(m.tacho_count)), int(round(m.block_tacho_count)), int(round(m.rotation_count)))
+
+    @_command(reply=True)
+    def reset_motor_position(self, port, relative):
+        self._update_motors()
+        if relative:
+            self.motors[port].block_tacho_count = 0
+        else:
+            self.motors[port].rotation_count = 0
+
+    @_command(reply=False)
+    def set_input_mode(self, port, sensor_type, sensor_mode):
+        self.sensors[port].type = sensor_type
+        self.sensors[port].mode = sensor_mode
+
+    @_command(reply=True)
+    def get_input_values(self, port):
+        sensor = self.sensors[port]
+        value = sensor.value()
+        if sensor.type == Type.SWITCH:
+            raw = 183 if value else 1023
+            scaled = 1 if value else 0
+        else:
+            raw = scaled = int(value)
+        return port, True, False, sensor.type, sensor.mode, raw, raw, scaled, 0
+
+    @_command(reply=True)
+    def reset_input_scaled_value(self, port=None):
+        pass
+
+    @_command(reply=True)
+    def ls_write(self, port, tx_data, rx_bytes):
+        sensor = self.sensors[port]
+        if isinstance(tx_data, str):
+            tx_data = tx_data.encode('latin-1')
+        address = tx_data[1]
+        if rx_bytes:
+            if address >= ULTRASONIC_MEASUREMENTS:
+                registers = bytes([int(sensor.value())] + [255] * 7)
+                data = registers[address - ULTRASONIC_MEASUREMENTS:]
+            else:
+                data = ULTRASONIC_REGISTERS.get(address, b'')
+            sensor.pending = data[:rx_bytes].ljust(rx_bytes, b'\0')
+
+    @_command(reply=True)
+    def ls_get_status(self, port):
+        return len(self.sensors[port].pending)
+
+    @_command(reply=True)
+    def ls_read(self, port):
+        data, self.sensors[port].pending = self.sensors[port].pending, b''
+        return data
+
+    @_command(reply=False)
+    def play_tone(self, frequency, duration):
+        self.tones.append((time.time(), frequency, duration))
+
+    def play_tone_and_wait(self, frequency, duration):
+        self.play_tone(frequency, duration)
+        time.sleep(duration / 1000)
+
+    @_command(reply=True)
+    def stop_sound_playback(self):
+        pass
+
+    @_command(reply=True)
+    def get_battery_level(self):
+        return 8000
+
+    @_command(reply=True)
+    def keep_alive(self):
+        return 600000
+
+    @_command(reply=True)
+    def get_device_info(self):
+        return self.name, self.sock.host, 0, 0
+
+    @_command(reply=True)
+    def message_write(self, inbox, message):
+        pass
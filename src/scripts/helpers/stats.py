@@ -0,0 +1,166 @@
+from __future__ import division
+
+from math import sqrt
+from time import time, sleep
+
+# Default sampling rate (in Hz) for calibrations
+DEFAULT_SAMPLING_RATE = 50
+
+
+class P2Quantile(object):
+    def __init__(self, q):
+        """
+        Estimates a quantile of a stream of values in constant memory with the
+        P-square algorithm (Jain & Chlamtac, 1985).
+        :param q: The quantile, between 0 and 1.
+        """
+        if not 0 < q < 1:
+            raise ValueError('The quantile must be between 0 and 1')
+        self.q = q
+        self._initial = []
+        self._heights = None
+        self._positions = [0, 1, 2, 3, 4]
+        self._desired = [0, 2 * q, 4 * q, 2 + 2 * q, 4]
+        self._increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                self._heights = sorted(self._initial)
+                self._initial = None
+            return
+
+        h, n = self._heights, self._positions
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not h[i - 1] < height < h[i + 1]:
+                    height = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        h, n = self._heights, self._positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        if self._heights is not None:
+            return self._heights[2]
+        if not self._initial:
+            return None
+        # Too few values for the estimator, interpolate between them
+        values = sorted(self._initial)
+        position = self.q * (len(values) - 1)
+        low = int(position)
+        high = min(low + 1, len(values) - 1)
+        return values[low] + (values[high] - values[low]) * (position - low)
+
+
+class RunningStats(object):
+    def __init__(self, percentiles=(.5, .95)):
+        """
+        Keeps the count, mean, variance, minimum, maximum and some percentiles of a
+        stream of values without storing the values.
+        :param percentiles: The quantiles (between 0 and 1) to estimate.
+        """
+        self.count = 0
+        self.mean = 0
+        self.min = None
+        self.max = None
+        self._m2 = 0
+        self._quantiles = dict((q, P2Quantile(q)) for q in percentiles)
+
+    def add(self, x):
+        self.count += 1
+        # Welford's algorithm
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+
+        for quantile in self._quantiles.values():
+            quantile.add(x)
+
+    def update(self, values):
+        for x in values:
+            self.add(x)
+        return self
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0
+
+    @property
+    def stdev(self):
+        return sqrt(self.variance)
+
+    def percentile(self, q):
+        """
+        :param q: One of the quantiles given to the constructor.
+        :return: The estimated value or None if nothing was added yet.
+        """
+        if q not in self._quantiles:
+            raise ValueError('Percentile %s is not tracked' % str(q))
+        return self._quantiles[q].value
+
+    def __repr__(self):
+        return 'RunningStats(count=%d, mean=%s, stdev=%s, min=%s, max=%s)' % (
+            self.count, str(self.mean), str(self.stdev), str(self.min), str(self.max))
+
+
+def sample_for(read, seconds, rate=DEFAULT_SAMPLING_RATE, stats=None, accept=None, callback=None):
+    """
+    Reads values for a given amount of seconds at a capped rate and feeds them to a RunningStats.
+    :param read: Callable that returns a reading, e.g. sensor.get_sample.
+    :param seconds: For how long to read.
+    :param rate: The maximum amount of readings per second.
+    :param stats: The RunningStats to feed. A new one is created if none is given.
+    :param accept: Callable that receives each reading and tells whether to keep it.
+    :param callback: Callable invoked with every reading.
+    :return: The RunningStats.
+    """
+    if stats is None:
+        stats = RunningStats()
+
+    end = time() + seconds
+    next_read = time()
+    while next_read < end:
+        reading = read()
+        if callback is not None:
+            callback(reading)
+        if accept is None or accept(reading):
+            stats.add(reading)
+
+        next_read += 1 / rate
+        delay = next_read - time()
+        if delay > 0:
+            sleep(delay)
+        else:
+            next_read = time()
+    return stats
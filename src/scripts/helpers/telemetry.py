@@ -0,0 +1,227 @@
+from __future__ import division
+
+import mmap
+import struct
+from time import time
+from collections import namedtuple
+
+from .utils import BrickWrapper
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Record kinds and the meaning of their fields:
+#   COMMAND     set_output_state   state=mode, level=turn ratio, value=power, aux=tacho limit,
+#                                  extra=regulation | run state << 8
+#   OUTPUT      get_output_state   state=run state, level=power, value=tacho count,
+#                                  aux=block tacho count, extra=rotation count
+#   INPUT       get_input_values   state=valid, value=scaled, aux=raw, extra=normalized
+#   INPUT_MODE  set_input_mode     state=sensor type, value=sensor mode
+#   I2C         ls_read            state=amount of bytes, value=first 4 bytes (little endian)
+#   RUNNING     Robot.running      value=1 or 0
+#   TONE        play_tone          value=frequency, aux=duration
+#   RESET       reset_motor_position  state=relative
+COMMAND = 1
+OUTPUT = 2
+INPUT = 3
+INPUT_MODE = 4
+I2C = 5
+RUNNING = 6
+TONE = 7
+RESET = 8
+
+KIND_NAMES = {COMMAND: 'command', OUTPUT: 'output', INPUT: 'input', INPUT_MODE: 'input_mode',
+              I2C: 'i2c', RUNNING: 'running', TONE: 'tone', RESET: 'reset'}
+
+Record = namedtuple('Record', ['time', 'kind', 'port', 'state', 'level', 'value', 'aux', 'extra'])
+RECORD = struct.Struct('<dBBBbiii')
+
+# magic, version, record size, capacity, records written so far
+HEADER = struct.Struct('<4sHHIQ')
+MAGIC = b'NXTT'
+VERSION = 1
+
+DEFAULT_CAPACITY = 1 << 16
+
+if numpy is not None:
+    RECORD_DTYPE = numpy.dtype([
+        ('time', '<f8'), ('kind', 'u1'), ('port', 'u1'), ('state', 'u1'), ('level', 'i1'),
+        ('value', '<i4'), ('aux', '<i4'), ('extra', '<i4'),
+    ])
+else:
+    RECORD_DTYPE = None
+
+
+class TelemetryRecorder(object):
+    def __init__(self, path=None, capacity=DEFAULT_CAPACITY):
+        """
+        Records fixed size entries in a ring buffer allocated up front, so recording costs a
+        struct.pack_into and memory never grows. Once full, the oldest records are overwritten.
+        :param path: The file to map the buffer to. The file always holds the latest records, even
+        if the program crashes. If none is given, the buffer is only kept in memory.
+        :param capacity: The amount of records kept.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.count = 0
+        self._lock = threading.Lock()
+        size = HEADER.size + capacity * RECORD.size
+
+        if path is None:
+            self._file = None
+            self._buffer = bytearray(size)
+        else:
+            self._file = open(path, 'w+b')
+            self._file.truncate(size)
+            self._buffer = mmap.mmap(self._file.fileno(), size)
+        self._write_header()
+
+    def _write_header(self):
+        HEADER.pack_into(self._buffer, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.count)
+
+    def record(self, kind, port=0, state=0, level=0, value=0, aux=0, extra=0, timestamp=None):
+        """
+        Appends a record. It is safe to call it from several threads.
+        :param kind: One of the record kinds, e.g. COMMAND.
+        :param timestamp: Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time()
+        with self._lock:
+            offset = HEADER.size + (self.count % self.capacity) * RECORD.size
+            RECORD.pack_into(self._buffer, offset, timestamp, kind, port, state, level, value, aux, extra)
+            self.count += 1
+            HEADER.pack_into(self._buffer, 0, MAGIC, VERSION, RECORD.size, self.capacity, self.count)
+
+    def records(self):
+        """
+        :return: The kept records, oldest first, as a numpy structured array if numpy is
+        installed or a list of Record otherwise.
+        """
+        with self._lock:
+            records = _ordered(self._buffer, self.capacity, self.count)
+            # Never hand out a view of the live buffer
+            return records.copy() if numpy is not None else records
+
+    def flush(self):
+        if self._file is not None:
+            self._buffer.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._buffer.flush()
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+def _ordered(buffer, capacity, count):
+    kept = min(count, capacity)
+    start = count % capacity if count > capacity else 0
+
+    if numpy is not None:
+        data = numpy.frombuffer(buffer, dtype=RECORD_DTYPE, count=capacity, offset=HEADER.size)
+        if not start:
+            return data[:kept]
+        return numpy.concatenate((data[start:], data[:start]))
+
+    records = [Record(*values) for values in RECORD.iter_unpack(
+        bytes(buffer[HEADER.size:HEADER.size + capacity * RECORD.size]))]
+    return records[start:kept] + records[:start]
+
+
+def read_telemetry(path):
+    """
+    Loads a telemetry file written by a TelemetryRecorder. With numpy the file is mapped
+    into a structured array, without parsing the records.
+    :param path: The file.
+    :return: The records, oldest first, as a numpy structured array if numpy is installed
+    or a list of Record otherwise.
+    """
+    with open(path, 'rb') as f:
+        magic, version, record_size, capacity, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or record_size != RECORD.size:
+            raise ValueError('%s is not a telemetry file' % path)
+        if numpy is not None:
+            data = numpy.memmap(f, dtype='u1', mode='r')
+        else:
+            f.seek(0)
+            data = f.read()
+    return _ordered(data, capacity, count)
+
+
+def unpack_command(record):
+    """
+    :param record: A COMMAND record, from a numpy array or a Record.
+    :return: The arguments of set_output_state:
+    (port, power, mode, regulation, turn ratio, run state, tacho limit).
+    """
+    _, _, port, mode, turn_ratio, power, tacho_limit, extra = [int(field) for field in record]
+    return port, power, mode, extra & 0xFF, turn_ratio, extra >> 8, tacho_limit
+
+
+def _int_from_bytes(data):
+    if isinstance(data, str):
+        data = data.encode('latin-1')
+    return int.from_bytes(bytes(data[:4]), 'little', signed=True)
+
+
+class TelemetryBrick(BrickWrapper):
+    def __init__(self, brick, recorder):
+        """
+        Records every motor command, motor state and sensor reading that goes through the brick.
+        :param brick: The brick.
+        :param recorder: The TelemetryRecorder.
+        """
+        super(TelemetryBrick, self).__init__(brick)
+        self.recorder = recorder
+
+    def set_output_state(self, port, power, mode, regulation, turn_ratio, run_state, tacho_limit):
+        self.brick.set_output_state(port, power, mode, regulation, turn_ratio, run_state, tacho_limit)
+        self.recorder.record(COMMAND, port, mode, turn_ratio, power, tacho_limit, regulation | run_state << 8)
+
+    def get_output_state(self, port):
+        values = self.brick.get_output_state(port)
+        self.recorder.record(OUTPUT, port, values[5], values[1], values[7], values[8], values[9])
+        return values
+
+    def get_input_values(self, port):
+        values = self.brick.get_input_values(port)
+        self.recorder.record(INPUT, port, values[1], 0, values[7], values[5], values[6])
+        return values
+
+    def set_input_mode(self, port, sensor_type, sensor_mode):
+        result = self.brick.set_input_mode(port, sensor_type, sensor_mode)
+        self.recorder.record(INPUT_MODE, port, sensor_type, 0, sensor_mode)
+        return result
+
+    def ls_read(self, port):
+        data = self.brick.ls_read(port)
+        self.recorder.record(I2C, port, len(data), 0, _int_from_bytes(data))
+        return data
+
+    def play_tone(self, frequency, duration):
+        result = self.brick.play_tone(frequency, duration)
+        self.recorder.record(TONE, 0, 0, 0, frequency, duration)
+        return result
+
+    def reset_motor_position(self, port, relative):
+        result = self.brick.reset_motor_position(port, relative)
+        self.recorder.record(RESET, port, int(bool(relative)))
+        return result
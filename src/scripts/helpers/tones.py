@@ -0,0 +1,126 @@
+from __future__ import division
+
+from time import time
+from functools import lru_cache
+from collections import namedtuple
+from morse import lookup
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# Standard morse timing in units: a dash is 3 dots long, symbols of a letter are separated by
+# one unit, letters by 3 and words by 7. A unit lasts 1.2 / wpm seconds (the PARIS standard)
+DOT = 1
+DASH = 3
+SYMBOL_GAP = 1
+LETTER_GAP = 3
+WORD_GAP = 7
+DEFAULT_WPM = 20
+DEFAULT_FREQUENCY = 1000
+
+# start: seconds since the beginning of the schedule, duration: milliseconds (as play_tone wants)
+Tone = namedtuple('Tone', ['start', 'frequency', 'duration'])
+Schedule = namedtuple('Schedule', ['tones', 'duration'])
+
+
+@lru_cache(maxsize=128)
+def encode(message):
+    """
+    :param message: The text. Letters, digits, spaces and some punctuation.
+    :return: A tuple with a tuple of morse patterns (e.g. '...') per word.
+    """
+    try:
+        return tuple(tuple(lookup[c] for c in word) for word in message.upper().split())
+    except KeyError as e:
+        raise ValueError('Cannot encode %s as morse code' % str(e))
+
+
+@lru_cache(maxsize=128)
+def compile_morse(message, wpm=DEFAULT_WPM, frequency=DEFAULT_FREQUENCY):
+    """
+    Computes when every tone of a message starts and how long it lasts.
+    :param message: The text.
+    :param wpm: Words per minute.
+    :param frequency: The tone frequency in Hz.
+    :return: A Schedule.
+    """
+    unit = 1.2 / wpm
+    tones = []
+    t = 0
+    for w, word in enumerate(encode(message)):
+        if w:
+            t += (WORD_GAP - SYMBOL_GAP) * unit
+        for l, letter in enumerate(word):
+            if l:
+                t += (LETTER_GAP - SYMBOL_GAP) * unit
+            for symbol in letter:
+                length = (DOT if symbol == '.' else DASH) * unit
+                tones.append(Tone(t, frequency, int(round(length * 1000))))
+                t += length + SYMBOL_GAP * unit
+    # The last symbol gap is not part of the message
+    return Schedule(tuple(tones), max(t - SYMBOL_GAP * unit, 0))
+
+
+class Playback(object):
+    def __init__(self, brick, schedule):
+        """
+        Plays a Schedule from a background thread. The brick plays every tone by itself, so
+        the thread only sends a command at the start of each tone and sleeps in between.
+        :param brick: The brick.
+        :param schedule: The Schedule.
+        """
+        self.brick = brick
+        self.schedule = schedule
+        self.played = 0
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='Morse')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start = time()
+        try:
+            for tone in self.schedule.tones:
+                if self._cancelled.wait(max(start + tone.start - time(), 0)):
+                    break
+                self.brick.play_tone(tone.frequency, tone.duration)
+                self.played += 1
+            else:
+                # Wait for the last tone, so that done means silence
+                self._cancelled.wait(max(start + self.schedule.duration - time(), 0))
+            if self._cancelled.is_set():
+                self.brick.stop_sound_playback()
+        finally:
+            self._done.set()
+
+    def cancel(self, wait=True):
+        """
+        Stops the playback, silencing the tone being played.
+        """
+        self._cancelled.set()
+        if wait and self._thread is not threading.current_thread():
+            self._done.wait()
+
+    def wait(self, timeout=None):
+        """
+        :return: True if the playback is over, False if the timeout expired first.
+        """
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+def play(brick, schedule):
+    """
+    Starts playing a Schedule in the background.
+    :return: The Playback.
+    """
+    return Playback(brick, schedule).start()
@@ -1,12 +1,233 @@
 from __future__ import division
-from time import time
+from time import time, sleep
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import threading
+except ImportError:
+    import dummy_threading as threading
+
+# The NXT sensors are read by a 10 bit ADC
+ADC_RESOLUTION = 1024
 
 
 def normalize(val, _min, _max):
     return (val - _min) / (_max - _min)
 
 
+class Normalizer(object):
+    def __init__(self, _min, _max, resolution=ADC_RESOLUTION):
+        """
+        Same as normalize with a fixed minimum and maximum, but the result for every
+        possible raw reading (0 to resolution - 1) is computed in advance.
+        Calling it accepts any value. Hot loops reading a sensor directly should use
+        self.lookup instead, which only accepts integers from 0 to resolution - 1 but is a
+        plain list index.
+        :param _min: The value that maps to 0.
+        :param _max: The value that maps to 1.
+        :param resolution: How many raw values to precompute.
+        """
+        if _min == _max:
+            raise ValueError('The minimum and the maximum must be different')
+        self.min = _min
+        self.max = _max
+        self.table = [normalize(val, _min, _max) for val in range(resolution)]
+        # A bound method of the table, so that no method of this class is dispatched
+        self.lookup = self.table.__getitem__
+        self._array = None
+
+    def __call__(self, val):
+        try:
+            if val >= 0:
+                return self.table[val]
+        except (IndexError, TypeError):
+            # Out of range or not an integer
+            pass
+        return normalize(val, self.min, self.max)
+
+    def batch(self, values):
+        """
+        Normalizes a whole sequence of readings at once. NumPy is used if it is installed.
+        :param values: A sequence or array of readings.
+        :return: A NumPy array, or a list if NumPy is not available.
+        """
+        if numpy is None:
+            return [self(val) for val in values]
+
+        values = numpy.asarray(values)
+        if values.dtype.kind in 'iub' and values.size and \
+                values.min() >= 0 and values.max() < len(self.table):
+            if self._array is None:
+                self._array = numpy.array(self.table)
+            return self._array[values]
+        return (values - self.min) / (self.max - self.min)
+
+
 def countdown(initial_time, seconds):
     if time() - initial_time < seconds:
         return False
     return True
+
+
+class Deadline(object):
+    def __init__(self, seconds):
+        """
+        A point in time a given amount of seconds from now.
+        :param seconds: The seconds until the deadline.
+        """
+        self.end = time() + seconds
+
+    def remaining(self):
+        return max(0, self.end - time())
+
+    def expired(self):
+        return time() >= self.end
+
+    def wait(self, event=None):
+        """
+        Sleeps until the deadline. If an event is given, the wait is interrupted when it is set.
+        :param event: A threading.Event.
+        :return: True if the deadline was reached, False if the event interrupted the wait.
+        """
+        if event is None:
+            sleep(self.remaining())
+            return True
+        return not event.wait(self.remaining())
+
+
+def poll_until(condition, interval, args=(), kwargs=None, event=None, backoff=1, max_interval=None):
+    """
+    Calls a condition at a bounded rate until it returns True.
+    :param condition: Callable that returns a boolean.
+    :param interval: Minimum amount of seconds between two calls.
+    :param args: The condition arguments.
+    :param kwargs: The condition kwargs.
+    :param event: A threading.Event. If it is set, polling is aborted.
+    :param backoff: Factor by which the interval grows every time the condition returns False.
+    :param max_interval: Upper bound for the interval when backoff is used. Defaults to ten
+    times the initial interval.
+    :return: True if the condition was met, False if the event aborted the polling.
+    """
+    if kwargs is None:
+        kwargs = {}
+    if max_interval is None:
+        max_interval = interval * 10
+
+    next_poll = Deadline(0)
+    while not condition(*args, **kwargs):
+        next_poll.end += interval
+        # A slow condition must not cause a burst of calls to catch up
+        if next_poll.expired():
+            next_poll = Deadline(0)
+        if not next_poll.wait(event):
+            return False
+
+        if backoff > 1:
+            interval = min(interval * backoff, max_interval)
+    return True
+
+
+class BrickWrapper(object):
+    def __init__(self, brick):
+        """
+        Base class for objects that stand in for a brick. Everything that is not
+        overridden is taken from the wrapped brick.
+        :param brick: The brick to wrap.
+        """
+        self.brick = brick
+
+    def __getattr__(self, name):
+        if name == 'brick':
+            raise AttributeError(name)
+        return getattr(self.brick, name)
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight(object):
+    def __init__(self, func, ttl=0):
+        """
+        Makes concurrent calls of a function without arguments share one call: the callers
+        that arrive while it runs wait for it and get its result. Callers that arrive within
+        ttl seconds after it started get the same result as well.
+        :param func: The function, e.g. the method that reads a sensor.
+        :param ttl: How long a result stays fresh. 0 only shares the calls in progress.
+        """
+        self.func = func
+        self.ttl = ttl
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._flight = None
+        self._value = None
+        self._started = None
+
+    def __call__(self, *args, **kwargs):
+        if args or kwargs:
+            return self.func(*args, **kwargs)
+
+        with self._lock:
+            if self.ttl and self._started is not None and time() - self._started < self.ttl:
+                self.shared += 1
+                return self._value
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        started = time()
+        try:
+            flight.value = self.func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+                if flight.error is None:
+                    self._value, self._started = flight.value, started
+            flight.done.set()
+        return flight.value
+
+    def invalidate(self):
+        with self._lock:
+            self._started = None
+
+
+def coalesce(obj, methods, ttl=0):
+    """
+    Replaces the given methods of an object by SingleFlight ones, so that the object can be
+    shared by several threads. Methods that are aliases of each other (e.g. get_sample and
+    get_lightness of a Light) share their calls too.
+    :param obj: The object, e.g. a sensor.
+    :param methods: The method names.
+    :param ttl: See SingleFlight.
+    :return: The object.
+    """
+    flights = {}
+    for method in methods:
+        func = getattr(type(obj), method, None)
+        if func is None:
+            continue
+        if func not in flights:
+            flights[func] = SingleFlight(getattr(obj, method), ttl)
+        setattr(obj, method, flights[func])
+    return obj
@@ -0,0 +1,100 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.async_robot import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+import asyncio
+import time
+
+
+class TestAsyncRobot(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = AsyncRobot(brick=self.brick, debug=False)
+        super().setUp()
+
+    def tearDown(self):
+        self.robot.close()
+        super().tearDown()
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    async def _init(self):
+        await self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        return await self.robot.init_light_sensor(PORT_2)
+
+    def test_stream_while_moving(self):
+        async def main():
+            light = await self._init()
+            readings = []
+
+            async def track():
+                async for reading in light.stream(hz=50):
+                    readings.append(reading)
+                    if not self.robot.running and len(readings) > 1:
+                        break
+
+            it = time.time()
+            await asyncio.gather(self.robot.move_forward(seconds=.5), track())
+            return time.time() - it, readings
+
+        elapsed, readings = self.run_async(main())
+        self.assertAlmostEqual(elapsed, .5, delta=.1)
+        self.assertTrue(20 <= len(readings) <= 30)
+        self.assertFalse(self.robot.running)
+
+    def test_until(self):
+        async def main():
+            light = await self._init()
+            self.brick.set_sensor(PORT_2, 100)
+            asyncio.get_running_loop().call_later(.2, self.brick.set_sensor, PORT_2, 900)
+
+            async def bright():
+                return await light.read() > 500
+
+            await self.robot.move_forward(until=bright)
+
+        self.run_async(main())
+        self.assertFalse(self.robot.running)
+        self.assertGreater(self.brick.motors[PORT_A].rotation_count, 0)
+
+    def test_spin_and_dist(self):
+        async def main():
+            await self._init()
+            await self.robot.spin(180)
+            await self.robot.move_backwards(dist=DISTANCE_PER_ROTATION)
+
+        self.run_async(main())
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, 180 - 360, delta=20)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, -180 - 360, delta=20)
+        # Integrated when the moves finished, without another read
+        odometry = self.robot.robot.odometry
+        tracked = odometry.pose
+        self.assertGreater(abs(tracked.heading), .2)
+        self.assertEqual(tracked, odometry.update())
+
+    def test_wait_for_blocking_moves(self):
+        async def main():
+            await self._init()
+            self.robot.robot.move_forward()
+            asyncio.get_running_loop().call_later(.1, self.robot.robot.stop)
+            return await self.robot.wait_until_stopped(1)
+
+        self.assertTrue(self.run_async(main()))
+        self.assertFalse(self.robot.running)
+
+    def test_stop(self):
+        async def main():
+            await self._init()
+            asyncio.get_running_loop().call_later(.2, asyncio.ensure_future, self.robot.stop())
+            it = time.time()
+            await self.robot.move_forward(seconds=5)
+            return time.time() - it
+
+        self.assertLess(self.run_async(main()), 1)
+
+    def test_morse(self):
+        self.run_async(self.robot.morse('E'))
+        self.assertEqual(len(self.brick.tones), 1)
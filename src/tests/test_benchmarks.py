@@ -0,0 +1,49 @@
+from benchmarks import run, compare, dump, load, custom_profile, USB, NO_LATENCY
+
+import os
+import json
+import tempfile
+import unittest
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_run(self):
+        results = run(['normalize', 'maneuvers'], NO_LATENCY, repeat=1, scale=.1, debug=lambda *x: None)
+        self.assertEqual(sorted(results['results']), ['maneuvers', 'normalize'])
+        self.assertEqual(results['meta']['repeat'], 1)
+        self.assertGreater(results['results']['normalize']['normalizer_per_second'], 0)
+        self.assertGreater(results['results']['maneuvers']['spin_commands'], 0)
+        # Machine readable
+        json.loads(json.dumps(results))
+
+        self.assertRaises(ValueError, run, ['nope'], debug=lambda *x: None)
+
+    def test_compare(self):
+        baseline = {'results': {'a': {'reads_per_second': 100, 'spin_seconds': 2, 'gone': 1}}}
+        current = {'results': {'a': {'reads_per_second': 150, 'spin_seconds': 1}, 'b': {'x_seconds': 1}}}
+        changes = compare(baseline, current)
+        self.assertEqual(list(changes), ['a'])
+        self.assertAlmostEqual(changes['a']['reads_per_second'][2], .5)
+        # Lower is better: twice as fast
+        self.assertAlmostEqual(changes['a']['spin_seconds'][2], 1)
+
+        # Changes from 0 are reported too
+        changes = compare({'results': {'a': {'stop_commands': 0, 'idle_commands': 2, 'reads_per_second': 0}}},
+                          {'results': {'a': {'stop_commands': 4, 'idle_commands': 0, 'reads_per_second': 0}}})
+        self.assertEqual(changes['a']['stop_commands'], (0, 4, -float('inf')))
+        self.assertEqual(changes['a']['idle_commands'], (2, 0, float('inf')))
+        self.assertEqual(changes['a']['reads_per_second'], (0, 0, 0))
+
+        path = os.path.join(tempfile.mkdtemp(), 'results.json')
+        dump(current, path)
+        self.assertEqual(load(path), current)
+
+    def test_custom_profile(self):
+        profile = custom_profile(USB, latency=.01)
+        self.assertEqual(profile.latency, .01)
+        self.assertEqual(profile.reply_latency, .01)
+        self.assertEqual(profile.jitter, USB.jitter)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+from nxt.sensor import *
+from scripts.helpers.robot import *
+from scripts.helpers.calibration import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+import os
+import json
+import time
+import shutil
+import tempfile
+
+
+class TestCalibrationCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache', 'calibration.json')
+        super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_persistence(self):
+        CalibrationCache(self.path).put('NXT@00:16', PORT_2, 'Light', (229, 900))
+        cache = CalibrationCache(self.path)
+        self.assertEqual(cache.get('NXT@00:16', PORT_2, 'Light'), (229, 900))
+        self.assertIsNone(cache.get('NXT@00:16', PORT_3, 'Light'))
+        self.assertIsNone(cache.get('NXT@00:17', PORT_2, 'Light'))
+        cache.invalidate('NXT@00:16', PORT_2, 'Light')
+        self.assertIsNone(CalibrationCache(self.path).get('NXT@00:16', PORT_2, 'Light'))
+
+    def test_expiry(self):
+        CalibrationCache(self.path).put('NXT', PORT_4, 'Sound', (15, 1024))
+        with open(self.path) as f:
+            entries = json.load(f)
+        for entry in entries.values():
+            entry['timestamp'] = time.time() - 100
+        with open(self.path, 'w') as f:
+            json.dump(entries, f)
+
+        self.assertIsNone(CalibrationCache(self.path, max_age=10).get('NXT', PORT_4, 'Sound'))
+        self.assertEqual(CalibrationCache(self.path, max_age=None).get('NXT', PORT_4, 'Sound'), (15, 1024))
+
+    def test_corrupt_file(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('{')
+        self.assertIsNone(CalibrationCache(self.path).get('NXT', PORT_4, 'Sound'))
+
+    def test_robot_uses_cache(self):
+        brick = SimulatedBrick()
+        cache = CalibrationCache(self.path)
+        robot = Robot(brick=brick, debug=False, calibration_cache=cache)
+        robot.init_light_sensor(PORT_2)
+        cache.put(robot.brick_id, PORT_2, 'Light', (229, 900))
+
+        brick.set_sensor(PORT_2, 500)
+        it = time.time()
+        self.assertEqual(robot.calibrate_light(), (229, 900))
+        self.assertLess(time.time() - it, .5)
+        self.assertEqual(brick.commands['get_input_values'], VERIFY_SAMPLES)
+        self.assertTrue(robot._verify_calibration(robot.light, 200, 930))
+        brick.set_sensor(PORT_2, 1000)
+        self.assertFalse(robot._verify_calibration(robot.light, 200, 930))
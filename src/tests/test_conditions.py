@@ -0,0 +1,57 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.conditions import *
+from scripts.helpers.utils import Normalizer
+from scripts.helpers.simulator import SimulatedBrick
+
+import time
+import unittest
+
+
+class TestConditions(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = Robot(self.brick, debug=False, calibration_cache=False)
+        self.robot.init_light_sensor(PORT_2)
+        self.robot.init_touch_sensor(PORT_3)
+        self.robot.light_normalizer = Normalizer(0, 1000)
+        super().setUp()
+
+    def test_each_sensor_is_read_once(self):
+        until = ((Light() > .9) | (Light() < .1) | Touch().pressed).compile(self.robot)
+        self.brick.set_sensor(PORT_2, 500)
+        self.assertFalse(until())
+        self.assertEqual(self.brick.commands['get_input_values'], 2)
+        self.brick.set_sensor(PORT_2, 950)
+        self.assertTrue(until())
+        self.assertEqual(until.ticks, 2)
+
+    def test_cheap_terms_first(self):
+        until = (Touch().pressed | Elapsed(0)).compile(self.robot)
+        self.assertTrue(until())
+        self.assertEqual(self.brick.commands['get_input_values'], 0)
+
+        until = (Touch().released & Elapsed(10)).compile(self.robot)
+        self.assertFalse(until())
+        self.assertEqual(self.brick.commands['get_input_values'], 0)
+
+    def test_predicates_and_not(self):
+        condition = ~Touch().pressed & (lambda: True)
+        self.assertTrue(condition.compile(self.robot)())
+        self.assertRaises(TypeError, lambda: Elapsed(1) | 3)
+
+    def test_missing_sensor(self):
+        self.assertRaises(RobotError, (Ultrasonic() < 20).compile, self.robot)
+        self.assertRaises(RobotError, (Light(PORT_1) > .5).compile, self.robot)
+
+    def test_move_until(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        it = time.time()
+        self.robot.move_forward(until=Touch().pressed | Elapsed(.3), wait=True, poll_rate=50)
+        self.assertAlmostEqual(time.time() - it, .3, delta=.1)
+        self.assertFalse(self.robot.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+from scripts.helpers.connection import *
+from scripts.helpers.simulator import SimulatedBrick, USB, BLUETOOTH, NO_LATENCY
+
+import unittest
+import os
+import json
+import shutil
+import tempfile
+
+
+class _FakeSock(object):
+    def __init__(self, brick, fail=False):
+        self.brick = brick
+        self.type = brick.sock.type
+        self.fail = fail
+        self.connects = 0
+
+    def connect(self):
+        if self.fail:
+            raise IOError('No route to host')
+        self.connects += 1
+        return self.brick
+
+
+class _Finder(object):
+    def __init__(self, *socks):
+        self.socks = list(socks)
+        self.scans = 0
+        self.known = 0
+
+    def __call__(self, host=None, name=None, record=None):
+        if record is None:
+            self.scans += 1
+            return iter(self.socks)
+        self.known += 1
+        return iter([sock for sock in self.socks if sock.type == record['type']])
+
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'connection.json')
+        super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_picks_fastest_transport(self):
+        bluetooth = _FakeSock(SimulatedBrick(BLUETOOTH))
+        usb = _FakeSock(SimulatedBrick(USB))
+        manager = ConnectionManager(path=self.path, finder=_Finder(bluetooth, usb))
+        self.assertIs(manager.open(), usb.brick)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)['type'], 'usb')
+        # Written through a temporary file that is renamed
+        self.assertEqual(os.listdir(self.dir), ['connection.json'])
+
+    def test_warm_start_skips_scan(self):
+        finder = _Finder(_FakeSock(SimulatedBrick(USB)))
+        ConnectionManager(path=self.path, finder=finder).open()
+        self.assertEqual(finder.scans, 1)
+        ConnectionManager(path=self.path, finder=finder).open()
+        self.assertEqual(finder.scans, 1)
+        self.assertEqual(finder.known, 1)
+
+    def test_scans_when_last_brick_is_gone(self):
+        ConnectionManager(path=self.path, finder=_Finder(_FakeSock(SimulatedBrick(USB)))).open()
+        other = _FakeSock(SimulatedBrick(BLUETOOTH, host='00:16:53:00:00:01'))
+        finder = _Finder(other)
+        self.assertIs(ConnectionManager(path=self.path, finder=finder).open(), other.brick)
+        self.assertEqual(finder.scans, 1)
+
+    def test_scans_when_cache_is_invalid(self):
+        for content in ('{}', '[]', '"usb"', '{"type": "usb"}', 'not json'):
+            with open(self.path, 'w') as f:
+                f.write(content)
+            sock = _FakeSock(SimulatedBrick(USB))
+            finder = _Finder(sock)
+            self.assertIs(ConnectionManager(path=self.path, finder=finder).open(), sock.brick)
+            self.assertEqual(finder.scans, 1)
+            self.assertEqual(finder.known, 0)
+
+    def test_no_brick(self):
+        manager = ConnectionManager(path=self.path, finder=_Finder())
+        self.assertRaises(BrickNotFoundError, manager.open)
+
+
+class TestManagedBrick(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'connection.json')
+        super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_reconnects_and_retries(self):
+        first = SimulatedBrick(NO_LATENCY)
+        second = SimulatedBrick(NO_LATENCY)
+        sock = _FakeSock(first)
+        managed = ConnectionManager(path=self.path, finder=_Finder(sock)).connect()
+
+        def broken():
+            raise IOError('Connection reset')
+        first.keep_alive = broken
+        sock.brick = second
+
+        self.assertEqual(managed.keep_alive(), 600000)
+        self.assertIs(managed.brick, second)
+        self.assertEqual(managed.reconnects, 1)
+        # Attributes that are not commands come from the current brick
+        self.assertIs(managed.sock, second.sock)
+
+    def test_gives_up(self):
+        sock = _FakeSock(SimulatedBrick(NO_LATENCY))
+        managed = ConnectionManager(path=self.path, finder=_Finder(sock)).connect()
+        managed.delay = 0
+
+        def broken():
+            raise IOError('Connection reset')
+        managed.brick.keep_alive = broken
+        sock.fail = True
+        self.assertRaises(BrickNotFoundError, managed.keep_alive)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.daemon import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import os
+import time
+import stat
+import shutil
+import tempfile
+import threading
+import unittest
+
+
+def _tacho(robot, port):
+    return robot.brick.motors[port].rotation_count
+
+
+# The daemon of the tests runs in this process, so every client appends to this list
+_requests = []
+
+
+def _exclusive(robot):
+    _requests.append('enter')
+    time.sleep(.05)
+    _requests.append('exit')
+
+
+class TestRobotDaemon(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'robot.sock')
+        self.robot = Robot(SimulatedBrick(), debug=False, calibration_cache=False)
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        self.daemon = RobotDaemon(self.robot, self.path, debug=False)
+        self.thread = self.daemon.start()
+        self.client = RobotClient(self.path)
+        super().setUp()
+
+    def tearDown(self):
+        self.client.close()
+        self.daemon.shutdown()
+        self.thread.join()
+        self.robot.close()
+        shutil.rmtree(self.directory)
+        super().tearDown()
+
+    def test_socket_permissions(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertRaises(RobotError, RobotDaemon(self.robot, self.path, debug=False).start)
+
+    def test_calls(self):
+        self.client.robot.move_forward(dist=10)
+        self.assertGreater(self.robot.brick.motors[PORT_A].rotation_count, 0)
+        self.assertEqual(self.client.robot.power.fetch(), 100)
+        self.assertFalse(self.client.call('running'))
+        self.assertLess(self.client.ping(), .1)
+
+    def test_remote_objects(self):
+        motor = self.client.robot.init_servo(PORT_B)
+        self.assertIsInstance(motor, RemoteObject)
+        self.assertIn('Motor', repr(motor))
+        motor.turn(100, 90)
+        self.assertEqual(motor.port.fetch(), PORT_B)
+        self.client.release(motor)
+        self.assertRaises(KeyError, motor.turn, 100, 90)
+
+    def test_errors(self):
+        self.assertRaises(RobotError, self.client.robot.reading, 'nothing')
+        self.assertRaises(AttributeError, self.client.call, 'brick._lock')
+        # The connection is still usable
+        self.assertEqual(self.client.robot.power.fetch(), 100)
+
+    def test_run(self):
+        self.assertEqual(self.client.run(_tacho, PORT_C), 0)
+        script = os.path.join(self.directory, 'script.py')
+        with open(script, 'w') as f:
+            f.write('def main(robot, dist):\n    robot.move_forward(dist=dist)\n    return robot.power\n')
+        self.assertEqual(self.client.run_script(script, 'main', 10), 100)
+        self.assertGreater(self.client.run(_tacho, PORT_C), 0)
+
+    def test_one_request_at_a_time(self):
+        def use_robot():
+            with RobotClient(self.path) as client:
+                client.run(_exclusive)
+        threads = [threading.Thread(target=use_robot) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(_requests, ['enter', 'exit'] * 3)
+
+    def test_stop_while_moving(self):
+        def move():
+            with RobotClient(self.path) as client:
+                client.call('move_forward', seconds=10, wait=True)
+        thread = threading.Thread(target=move)
+        start = time.time()
+        thread.start()
+        while not self.robot.running:
+            time.sleep(.01)
+        # The other client holds the robot until it stops
+        self.assertTrue(self.client.call('running'))
+        self.client.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertLess(time.time() - start, 5)
+        self.assertFalse(self.robot.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+from nxt.sensor import *
+from scripts.helpers.robot import *
+from scripts.helpers.filters import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+
+
+class TestFilters(unittest.TestCase):
+    def test_median(self):
+        median = Median(3)
+        self.assertEqual([median(v) for v in (10, 200, 12, 11, 13)], [10, 105, 12, 12, 12])
+
+    def test_ema(self):
+        ema = EMA(span=3)
+        self.assertEqual(list(ema.stream([0, 10, 10])), [0, 5, 7.5])
+        self.assertRaises(ValueError, EMA)
+
+    def test_debounce(self):
+        debounce = Debounce(2)
+        self.assertEqual([debounce(v) for v in (False, True, False, True, True, False)],
+                         [False, False, False, False, True, True])
+
+    def test_hysteresis(self):
+        hysteresis = Hysteresis(.4, .6)
+        self.assertEqual([hysteresis(v) for v in (.5, .7, .5, .3, .5)], [False, True, True, False, False])
+
+    def test_outlier_rejector(self):
+        rejector = OutlierRejector(warmup=5, max_rejections=2)
+        values = [100, 101, 99, 100, 101, 255, 100, 30, 30, 30]
+        self.assertEqual([rejector(v) for v in values], [100, 101, 99, 100, 101, 101, 100, 100, 100, 30])
+        self.assertEqual(rejector.rejected, 3)
+
+    def test_pipeline(self):
+        brick = SimulatedBrick()
+        robot = Robot(brick, debug=False, calibration_cache=False)
+        light = robot.init_light_sensor(PORT_2)
+        readings = iter([500, 900, 510, 520, 530])
+        brick.set_sensor(PORT_2, lambda: next(readings))
+
+        values = pipeline(sensor_stream(light), Median(3), lambda values: (v > 505 for v in values))
+        # Nothing is read until a value is taken
+        self.assertEqual(brick.commands['get_input_values'], 0)
+        self.assertEqual([next(values), next(values)], [False, True])
+        self.assertEqual(brick.commands['get_input_values'], 2)
+        self.assertEqual(settle(sensor_stream(light), 3, Median(3)), 520)
+
+
+if __name__ == '__main__':
+    unittest.main()
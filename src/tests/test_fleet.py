@@ -0,0 +1,56 @@
+from nxt.motor import *
+from scripts.helpers.fleet import *
+from scripts.helpers.simulator import SimulatedBrick, USB, BLUETOOTH
+
+import unittest
+import time
+import functools
+
+
+def _drive(robot, seconds):
+    start = time.time()
+    robot.init_synchronized_motors(PORT_A, PORT_C)
+    robot.move_forward(seconds=seconds, wait=True)
+    return start
+
+
+def _sleep(robot, seconds):
+    time.sleep(seconds)
+
+
+def _fail(robot):
+    raise ValueError('Oops')
+
+
+def _no_brick():
+    raise IOError('No brick')
+
+
+class TestFleet(unittest.TestCase):
+    def setUp(self):
+        self.targets = [functools.partial(SimulatedBrick, USB), functools.partial(SimulatedBrick, BLUETOOTH)]
+        super().setUp()
+
+    def test_run(self):
+        results = Fleet(self.targets, debug=False).run(_drive, .2, timeout=30)
+        self.assertEqual([result.index for result in results], [0, 1])
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.telemetry['run'], .2)
+            self.assertIn('connect', result.telemetry)
+        # The barrier makes them start together
+        self.assertLess(abs(results[0].value - results[1].value), .05)
+
+    def test_errors(self):
+        results = Fleet(self.targets + [_no_brick], debug=False).run(_fail, timeout=30)
+        self.assertIn('ValueError', results[0].error)
+        self.assertIn('ValueError', results[1].error)
+        self.assertIn('No brick', results[2].error)
+
+    def test_timeout(self):
+        results = Fleet(self.targets[:1], debug=False).run(_sleep, 10, timeout=.5)
+        self.assertEqual(results[0].error, 'Timeout')
+
+
+if __name__ == '__main__':
+    unittest.main()
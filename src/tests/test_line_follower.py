@@ -0,0 +1,78 @@
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.line_follower import *
+from scripts.helpers.odometry import PoseTracker
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+
+
+class TestPID(unittest.TestCase):
+    def test_proportional(self):
+        pid = PID(2, setpoint=.5)
+        self.assertAlmostEqual(pid.update(.25, .02), .5)
+        self.assertEqual(pid.update(-1, .02), 1)
+
+    def test_integral(self):
+        pid = PID(0, ki=1, setpoint=1, integral_limit=.3)
+        for _ in range(100):
+            output = pid.update(0, .1)
+        self.assertAlmostEqual(output, .3)
+
+    def test_derivative_on_measurement(self):
+        pid = PID(0, kd=1, setpoint=0)
+        pid.update(0, .1)
+        self.assertAlmostEqual(pid.update(.05, .1), -.5)
+        pid.setpoint = 1
+        self.assertAlmostEqual(pid.update(.05, .1), 0)
+
+
+class TestLineFollower(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = Robot(self.brick, debug=False, power=40, calibration_cache=False)
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        super().setUp()
+
+    def test_steers_without_stopping(self):
+        levels = iter([.5, 1, 1, 0, 0] + [.5] * 1000)
+        follower = LineFollower(self.robot, read=lambda: next(levels), rate=100)
+        follower.run(seconds=.3)
+
+        report = follower.report()
+        self.assertGreater(report['iterations'], 15)
+        self.assertAlmostEqual(report['rate'], 100, delta=15)
+        self.assertLess(report['jitter_p95'], .01)
+        self.assertFalse(self.robot.running)
+        # Once back on the edge the powers do not change and nothing is sent
+        self.assertLess(self.brick.commands['set_output_state'], report['iterations'])
+
+    def test_pose(self):
+        # Integrated before every iteration, so it never misses a change of the wheel ratio
+        reference = PoseTracker(self.robot.left_motor, self.robot.right_motor, WHEEL_DIAMETER, WHEELS_DISTANCE)
+        levels = iter([0] * 20 + [.5] * 1000)
+
+        def read():
+            reference.update()
+            return next(levels)
+        LineFollower(self.robot, read=read, rate=100).run(seconds=.6)
+        reference.update()
+        pose = self.robot.pose
+        self.assertGreater(abs(pose.heading), .05)
+        self.assertAlmostEqual(pose.x, reference.x, delta=.02)
+        self.assertAlmostEqual(pose.y, reference.y, delta=.02)
+
+    def test_stop(self):
+        follower = LineFollower(self.robot, read=lambda: .5, rate=50)
+        follower.start()
+        self.assertTrue(self.robot.wait_until_stopped(.1) is False)
+        follower.stop()
+        self.assertFalse(self.robot.running)
+
+    def test_needs_calibration(self):
+        follower = LineFollower(self.robot)
+        self.assertRaises(ValueError, follower.run, seconds=.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.metrics import *
+from scripts.helpers.simulator import SimulatedBrick, USB
+
+import unittest
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for us in range(1, 100001):
+            histogram.record(us / 1e6)
+        self.assertEqual(histogram.count, 100000)
+        for q in (.5, .9, .99):
+            self.assertAlmostEqual(histogram.percentile(q), q * .1, delta=q * .1 * .01)
+        self.assertAlmostEqual(histogram.mean, .05, delta=.0001)
+        self.assertEqual(histogram.max, 100000)
+
+    def test_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(.001)
+        b.record(.003)
+        a.merge(b)
+        self.assertEqual(a.count, 2)
+        self.assertAlmostEqual(a.percentile(1), .003, delta=.00003)
+        self.assertIsNone(LatencyHistogram().percentile(.5))
+
+    def test_highest(self):
+        histogram = LatencyHistogram(highest=1)
+        histogram.record(100)
+        self.assertEqual(histogram.percentile(.5), 1)
+
+
+class TestRobotStats(unittest.TestCase):
+    def test_disabled(self):
+        brick = SimulatedBrick()
+        robot = Robot(brick, debug=False, calibration_cache=False)
+        self.assertIs(robot.brick, brick)
+        self.assertEqual(robot.stats(), {})
+
+    def test_stats(self):
+        robot = Robot(SimulatedBrick(USB), debug=False, power=50, metrics=True, calibration_cache=False)
+        robot.init_synchronized_motors(PORT_A, PORT_C)
+        light = robot.init_light_sensor(PORT_2)
+        self.assertIs(type(light), Light)
+        robot.brick.set_sensor(PORT_2, 500)
+        robot.move_forward(until=lambda: light.get_sample() and robot.stats()['light.get_sample']['count'] > 5,
+                           wait=True, poll_rate=200)
+
+        stats = robot.stats()
+        self.assertEqual(stats['light.get_sample']['count'], 6)
+        self.assertGreater(stats['brick.get_input_values']['count'], 0)
+        self.assertGreater(stats['brick.get_input_values']['p50'], .002)
+        self.assertEqual(stats['move.run']['count'], 1)
+        self.assertGreater(stats['move_until.condition']['count'], 0)
+        robot.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.motion import *
+from scripts.helpers.motors import start_synchronized
+from scripts.helpers.simulator import SimulatedBrick
+
+import time
+import threading
+import unittest
+from unittest import mock
+
+
+class TestMotionPlan(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = Robot(self.brick, debug=False, calibration_cache=False)
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        super().setUp()
+
+    def assertWheels(self, left, right, delta=15):
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, left, delta=delta)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, right, delta=delta)
+
+    def test_segments(self):
+        plan = self.robot.plan(power=80).straight(DISTANCE_PER_ROTATION).spin(-180).straight(0)
+        self.assertEqual([segment.kind for segment in plan.segments], ['straight', 'spin'])
+        self.assertEqual(plan.segments[0].degrees, 360)
+        self.assertEqual(plan.segments[1].turn_ratio, 100)
+        self.assertLess(plan.segments[1].power, 0)
+
+        arc = self.robot.plan().arc(WHEELS_DISTANCE, 90).segments[0]
+        # The inner wheel turns a third of the outer one
+        self.assertAlmostEqual(arc.right / arc.left, 1 / 3)
+        self.assertEqual(arc.turn_ratio, 33)
+        self.assertEqual(self.robot.plan().arc(WHEELS_DISTANCE, -90).segments[0].turn_ratio, -33)
+
+    def test_run(self):
+        plan = self.robot.plan(power=80)
+        for _ in range(2):
+            plan.straight(DISTANCE_PER_ROTATION).spin(180)
+        self.assertTrue(plan.run())
+        self.assertWheels(1080, 360)
+        self.assertEqual(len(plan.gaps), 3)
+        self.assertLess(max(plan.gaps), .05)
+        self.assertFalse(self.robot.running)
+        self.assertEqual(self.brick.motors[PORT_A].mode & MODE_BRAKE, MODE_BRAKE)
+
+    def test_arcs(self):
+        self.robot.plan(power=80).arc(WHEELS_DISTANCE, 90).arc(WHEELS_DISTANCE, -90).run()
+        outer = 1.5 * WHEELS_DISTANCE * pi / 2 / DISTANCE_PER_ROTATION * 360
+        self.assertWheels(outer * 4 / 3, outer * 4 / 3, delta=30)
+
+    def test_stop(self):
+        plan = self.robot.plan(power=80).straight(100)
+        threading.Timer(.2, self.robot.stop).start()
+        self.assertFalse(plan.run())
+        self.assertFalse(self.brick.motors[PORT_A].moving)
+
+    def test_stop_between_segments(self):
+        plan = self.robot.plan(power=80).straight(DISTANCE_PER_ROTATION).straight(DISTANCE_PER_ROTATION)
+        calls = []
+
+        def start(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                # Lands right after the first segment finished
+                self.robot.stop()
+            return start_synchronized(*args)
+        with mock.patch('scripts.helpers.motion.start_synchronized', start):
+            self.assertFalse(plan.run())
+        time.sleep(.1)
+        self.assertFalse(self.brick.motors[PORT_A].moving)
+        self.assertFalse(self.brick.motors[PORT_C].moving)
+        self.assertWheels(360, 360)
+
+    def test_without_motors(self):
+        robot = Robot(SimulatedBrick(), debug=False, calibration_cache=False)
+        self.assertRaises(RobotError, robot.plan().straight(10).run)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+from nxt.motor import *
+from scripts.helpers.motors import *
+from scripts.helpers.simulator import SimulatedBrick, BLUETOOTH
+
+import unittest
+import time
+import threading
+from unittest import mock
+
+
+class TestMotorPool(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.left = Motor(self.brick, PORT_A)
+        self.right = Motor(self.brick, PORT_C)
+        self.pool = MotorPool()
+        self.pool.start(self.left, self.right)
+        super().setUp()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        super().tearDown()
+
+    def test_motors_run_in_parallel(self):
+        it = time.time()
+        wait_all([
+            self.pool.submit(self.left, time.sleep, .2),
+            self.pool.submit(self.right, time.sleep, .2),
+        ])
+        self.assertLess(time.time() - it, .3)
+
+    def test_workers_are_reused(self):
+        threads = set()
+        for _ in range(5):
+            wait_all([
+                self.pool.submit(self.left, lambda: threads.add(threading.current_thread())),
+                self.pool.submit(self.right, lambda: threads.add(threading.current_thread())),
+            ])
+        self.assertEqual(len(threads), 2)
+
+    def test_turn(self):
+        wait_all([self.pool.turn(self.left, 100, 180), self.pool.turn(self.right, -100, 180)])
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, 180, delta=20)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, -180, delta=20)
+
+    def test_exceptions(self):
+        def blocked():
+            raise BlockedException('Blocked!')
+
+        future = self.pool.submit(self.left, blocked)
+        self.assertRaises(BlockedException, wait_all, [future])
+
+
+class TestSynchronizedTurn(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.move = SynchronizedMotors(Motor(self.brick, PORT_A), Motor(self.brick, PORT_C), 0)
+        super().setUp()
+
+    def test_straight(self):
+        synchronized_turn(self.move, -80, 360)
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, -360, delta=10)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, -360, delta=10)
+
+    def test_spin(self):
+        synchronized_turn(self.move, 80, 180, turn_ratio=100)
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, 180, delta=10)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, -180, delta=10)
+
+        synchronized_turn(self.move, 80, 180, turn_ratio=-100)
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, 0, delta=10)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, 0, delta=10)
+
+    def test_slow_link_completes(self):
+        # The brick enforces the limit, the move must not be braked before it is idle
+        brick = SimulatedBrick(BLUETOOTH, seed=0)
+        move = SynchronizedMotors(Motor(brick, PORT_A), Motor(brick, PORT_C), 0)
+        synchronized_turn(move, 100, 60, turn_ratio=100)
+        self.assertAlmostEqual(brick.motors[PORT_A].rotation_count, 60, delta=1)
+        self.assertAlmostEqual(brick.motors[PORT_C].rotation_count, -60, delta=1)
+
+    def test_fewer_commands(self):
+        self.brick.reset_counters()
+        pool = MotorPool()
+        wait_all([pool.turn(self.move.leader, 80, 360), pool.turn(self.move.follower, -80, 360)])
+        pool.shutdown()
+        per_wheel = self.brick.total_commands
+        self.brick.reset_counters()
+
+        positions = synchronized_turn(self.move, 80, 360, turn_ratio=100)
+        synchronized = self.brick.total_commands
+        self.assertLess(synchronized, per_wheel * .75)
+        # The brick braked them at the limit, nothing else was sent
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+        self.assertEqual(self.brick.motors[PORT_A].mode & MODE_BRAKE, MODE_BRAKE)
+
+        # Known positions save the read before the command
+        with mock.patch.object(Motor, 'get_tacho', side_effect=AssertionError('Read before the command')):
+            synchronized_turn(self.move, -80, 360, turn_ratio=100, positions=positions)
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, positions[PORT_A] - 360, delta=1)
+
+
+class TestMotorStateCache(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.cache = MotorStateCache(self.brick)
+        self.motor = Motor(self.cache, PORT_A)
+        super().setUp()
+
+    def test_repeated_commands_are_dropped(self):
+        self.motor.run(50)
+        self.motor.run(50)
+        self.motor.idle()
+        self.motor.idle()
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+        self.assertEqual(self.cache.dropped, 2)
+        self.assertFalse(self.brick.motors[PORT_A].moving)
+
+    def test_invalidate(self):
+        self.motor.idle()
+        generation = self.cache.generation(PORT_A)
+        self.cache.invalidate(PORT_A)
+        self.assertNotEqual(self.cache.generation(PORT_A), generation)
+        self.motor.idle()
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+
+    def test_tacho_limited_commands_are_sent(self):
+        self.motor.weak_turn(80, 90)
+        self.assertIsNone(self.cache.state(PORT_A))
+        self.motor.weak_turn(80, 90)
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+
@@ -0,0 +1,69 @@
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.odometry import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+from math import pi
+
+
+class TestMoveLog(unittest.TestCase):
+    def test_compaction(self):
+        log = MoveLog()
+        log.step(10)
+        log.step(5)
+        log.spin(250)
+        log.spin(-250)
+        log.step(4)
+        log.spin(90)
+        self.assertEqual(list(log), [(STEP, 19), (SPIN, 90)])
+        log.spin(-90)
+        log.step(-19)
+        self.assertEqual(len(log), 0)
+
+
+class TestPoseTracker(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = Robot(self.brick, debug=False, power=100, calibration_cache=False)
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        super().setUp()
+
+    def test_straight(self):
+        self.robot.move_forward(dist=20)
+        pose = self.robot.pose
+        self.assertAlmostEqual(pose.x, 20, delta=.5)
+        self.assertAlmostEqual(pose.y, 0, delta=.1)
+        self.assertAlmostEqual(pose.heading, 0, delta=.01)
+
+    def test_spin(self):
+        # A quarter turn to the right
+        self.robot.spin(spin_degrees(-pi / 2, WHEEL_DIAMETER, WHEELS_DISTANCE))
+        pose = self.robot.pose
+        self.assertAlmostEqual(pose.heading, -pi / 2, delta=.05)
+        self.assertAlmostEqual(pose.x, 0, delta=.5)
+
+    def test_idle_stop_reads_nothing(self):
+        self.robot.stop()
+        self.brick.reset_counters()
+        self.robot.stop()
+        self.assertEqual(self.brick.total_commands, 0)
+
+        # A stop that ends a move still updates the pose
+        self.robot.move_forward(seconds=.2, wait=True)
+        self.assertGreater(self.robot.odometry.x, 5)
+
+    def test_return_to_start(self):
+        self.robot.move_forward(dist=30)
+        self.robot.spin(-400)
+        self.robot.move_forward(dist=20)
+        self.assertGreater(abs(self.robot.pose.y), 5)
+
+        self.robot.return_to_start()
+        pose = self.robot.pose
+        self.assertAlmostEqual(pose.x, 0, delta=1)
+        self.assertAlmostEqual(pose.y, 0, delta=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.replay import *
+from scripts.helpers.telemetry import TelemetryRecorder
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+import itertools
+
+
+def _follow(robot, threshold):
+    robot.init_synchronized_motors(PORT_A, PORT_C)
+    light = robot.init_light_sensor(PORT_2)
+    robot.move_forward(until=lambda: light.get_sample() > threshold, wait=True)
+    robot.spin(90)
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.recorder = TelemetryRecorder()
+        brick = SimulatedBrick()
+        ramp = itertools.count(200, 20)
+        brick.set_sensor(PORT_2, lambda: next(ramp))
+        robot = Robot(brick, debug=False, power=50, telemetry=self.recorder, calibration_cache=False)
+        _follow(robot, 400)
+        robot.close()
+
+    def test_same_logic(self):
+        robot = replay_robot(self.recorder.records(), debug=False, power=50)
+        _follow(robot, 400)
+        self.assertEqual(robot.brick.diff(), [])
+        self.assertGreater(len(robot.brick.commands), 0)
+
+    def test_changed_logic(self):
+        robot = replay_robot(self.recorder.records(), debug=False, power=50)
+        _follow(robot, 300)
+        # Same commands, but the robot stops earlier
+        self.assertEqual(robot.brick.diff(), [])
+        self.assertNotEqual(robot.brick.diff(tolerance=.02), [])
+
+    def test_trace_over(self):
+        robot = replay_robot(self.recorder.records(), debug=False, power=50)
+        robot.init_synchronized_motors(PORT_A, PORT_C)
+        light = robot.init_light_sensor(PORT_2)
+        robot.running = True
+        self.assertRaises(ReplayFinished, robot._move_until, lambda: light.get_sample() > 10000)
+        self.assertFalse(robot.running)
+
+    def test_real_time(self):
+        brick = ReplayBrick(self.recorder.records(), speed=100)
+        robot = Robot(brick, debug=False, power=50, calibration_cache=False)
+        light = robot.init_light_sensor(PORT_2)
+        self.assertGreaterEqual(light.get_sample(), 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
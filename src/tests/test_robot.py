@@ -1,16 +1,18 @@
 from nxt.sensor import *
 from nxt.motor import *
 from scripts.helpers.robot import *
+from scripts.helpers.simulator import SimulatedBrick
 from time import sleep
 
 import unittest
+import time
+import threading
 
 
 class TestRobot(unittest.TestCase):
     def setUp(self):
-        if self.robot is not None:
-            print('Robot was other than None', type(self.robot))
-        self.robot = Robot(debug=True, verbose=True)
+        self.brick = SimulatedBrick()
+        self.robot = Robot(brick=self.brick, debug=True, verbose=True)
         super().setUp()
 
     def test_init_light_sensor(self):
@@ -63,3 +65,145 @@ class TestRobot(unittest.TestCase):
     def test_spin_with_motors(self):
         self.robot.init_synchronized_motors(PORT_A, PORT_C)
         self.robot.spin(360)
+        self.assertAlmostEqual(self.brick.motors[PORT_A].rotation_count, 360, delta=30)
+        self.assertAlmostEqual(self.brick.motors[PORT_C].rotation_count, -360, delta=30)
+
+    def test_move_seconds(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        it = time.time()
+        self.robot.move_forward(seconds=.5, wait=True)
+        self.assertAlmostEqual(time.time() - it, .5, delta=.05)
+        self.assertFalse(self.robot.running)
+        self.assertEqual(self.brick.motors[PORT_A].mode, 0)
+
+    def test_move_until(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        touch = self.robot.init_touch_sensor(PORT_3)
+        threading.Timer(.3, self.brick.set_sensor, args=(PORT_3, True)).start()
+        self.robot.move_forward(until=touch.is_pressed, wait=True, poll_rate=50)
+        self.assertFalse(self.robot.running)
+        # At 50Hz the condition is checked about 15 times
+        self.assertLess(self.brick.commands['get_input_values'], 25)
+
+    def test_stop_wakes_up_move(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        self.robot.move_forward(seconds=10)
+        threading.Timer(.2, self.robot.stop).start()
+        it = time.time()
+        self.assertTrue(self.robot.wait_until_stopped(5))
+        self.assertAlmostEqual(time.time() - it, .2, delta=.1)
+
+    def test_wait_until_stopped_timeout(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        self.assertTrue(self.robot.wait_until_stopped(0))
+        self.robot.move_forward()
+        self.assertFalse(self.robot.wait_until_stopped(.1))
+        self.robot.stop()
+        self.assertTrue(self.robot.wait_until_stopped(0))
+
+    def test_on_stop(self):
+        stops = []
+        self.robot.on_stop(stops.append)
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        self.robot.move_forward(seconds=.1, wait=True)
+        self.assertEqual(stops, [self.robot])
+        # Stopping a robot that is not running is not a transition
+        self.robot.stop()
+        self.assertEqual(len(stops), 1)
+        self.robot.remove_on_stop(stops.append)
+        self.robot.move_forward(seconds=.1, wait=True)
+        self.assertEqual(len(stops), 1)
+
+    def test_redundant_motor_commands(self):
+        self.robot.init_synchronized_motors(PORT_A, PORT_C)
+        self.robot.move_forward()
+        self.brick.reset_counters()
+        self.robot.move_forward()
+        self.assertEqual(self.brick.total_commands, 0)
+        self.robot.move_forward(power=50)
+        self.assertGreater(self.brick.commands['set_output_state'], 0)
+
+        self.robot.stop()
+        self.brick.reset_counters()
+        self.robot.stop()
+        self.assertEqual(self.brick.commands['set_output_state'], 0)
+        self.robot.stop(force=True)
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+
+    def test_uncached_motors_run_again(self):
+        robot = Robot(brick=self.brick, debug=False, calibration_cache=False,
+                      left_motor=Motor(self.brick, PORT_A), right_motor=Motor(self.brick, PORT_C))
+        for _ in range(2):
+            robot.move_forward()
+            self.assertTrue(self.brick.motors[PORT_A].moving)
+            robot.stop()
+            self.assertFalse(self.brick.motors[PORT_A].moving)
+
+    def test_motor_cache_disabled(self):
+        robot = Robot(brick=self.brick, debug=False, motor_cache=False)
+        robot.init_synchronized_motors(PORT_A, PORT_C)
+        robot.stop()
+        self.brick.reset_counters()
+        robot.stop()
+        self.assertEqual(self.brick.commands['set_output_state'], 2)
+
+
+class _CountingSensor(object):
+    def __init__(self, port, value=0):
+        self.port = port
+        self.value = value
+        self.reads = 0
+        self.times = []
+        self.limit = None
+        self.done = threading.Event()
+
+    def get_sample(self):
+        self.reads += 1
+        self.times.append(time.time())
+        if self.limit is not None and self.reads >= self.limit:
+            self.done.set()
+        return self.value
+
+    def interval(self):
+        return (self.times[-1] - self.times[0]) / (len(self.times) - 1)
+
+
+class TestSensorSampler(unittest.TestCase):
+    def setUp(self):
+        self.sampler = SensorSampler(rate=20, rates={PORT_2: 100})
+        super().setUp()
+
+    def tearDown(self):
+        self.sampler.stop()
+        super().tearDown()
+
+    def test_latest_value(self):
+        light = _CountingSensor(PORT_2, 512)
+        self.sampler.add('light', light)
+        self.assertIsNone(self.sampler.latest('light'))
+        self.sampler.start()
+        sleep(.1)
+        sample = self.sampler.latest('light')
+        self.assertEqual(sample.value, 512)
+        self.assertLessEqual(sample.timestamp, time.time())
+        light.value = 100
+        sleep(.1)
+        self.assertEqual(self.sampler.value('light'), 100)
+
+    def test_rate_per_port(self):
+        light = _CountingSensor(PORT_2)
+        sound = _CountingSensor(PORT_4)
+        self.sampler.add('light', light)
+        self.sampler.add('sound', sound)
+        sound.limit = 6
+        self.sampler.start()
+        # A fixed number of reads instead of a fixed time, so a slow machine only makes it longer
+        self.assertTrue(sound.done.wait(10))
+        self.sampler.stop()
+
+        # The schedule is never ahead, so on average reads are at least a period apart
+        self.assertGreaterEqual(light.interval(), .009)
+        self.assertGreaterEqual(sound.interval(), .045)
+        # The faster port is read several times as often
+        self.assertGreater(sound.interval(), 2.5 * light.interval())
+        self.assertGreater(light.reads, 2 * sound.reads)
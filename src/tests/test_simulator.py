@@ -0,0 +1,67 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.simulator import *
+
+import unittest
+import time
+
+
+class TestSimulatedBrick(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        super().setUp()
+
+    def test_sensors(self):
+        light = Light(self.brick, PORT_2)
+        touch = Touch(self.brick, PORT_3)
+        sound = Sound(self.brick, PORT_4)
+        us = Ultrasonic(self.brick, PORT_1)
+
+        self.brick.set_sensor(PORT_2, 800)
+        self.brick.set_sensor(PORT_3, True)
+        self.brick.set_sensor(PORT_4, lambda: 42)
+        self.brick.set_sensor(PORT_1, 37)
+
+        self.assertEqual(light.get_lightness(), 800)
+        self.assertTrue(touch.is_pressed())
+        self.assertEqual(sound.get_loudness(), 42)
+        self.assertEqual(us.get_distance(), 37)
+
+    def test_motor_turn(self):
+        motor = Motor(self.brick, PORT_A)
+        motor.turn(100, 360)
+        tacho = motor.get_tacho()
+        self.assertAlmostEqual(tacho.tacho_count, 360, delta=20)
+        self.assertEqual(self.brick.motors[PORT_A].power, 0)
+
+    def test_tacho_limit(self):
+        self.brick.set_output_state(PORT_B, 100, MODE_MOTOR_ON, REGULATION_IDLE, 0, RUN_STATE_RUNNING, 90)
+        time.sleep(.2)
+        state = self.brick.get_output_state(PORT_B)
+        self.assertEqual(state[5], RUN_STATE_IDLE)
+        self.assertEqual(state[7], 90)
+
+    def test_synchronized_spin(self):
+        for port in (PORT_A, PORT_C):
+            self.brick.set_output_state(port, 50, MODE_MOTOR_ON | MODE_REGULATED, REGULATION_MOTOR_SYNC, 100,
+                                        RUN_STATE_RUNNING, 180)
+        time.sleep(.5)
+        self.assertEqual(self.brick.get_output_state(PORT_A)[7], -180)
+        self.assertEqual(self.brick.get_output_state(PORT_C)[7], 180)
+
+    def test_latency_profile(self):
+        brick = SimulatedBrick(LatencyProfile('bluetooth', latency=.01, reply_latency=.02), seed=1)
+        it = time.time()
+        for _ in range(5):
+            brick.get_input_values(PORT_1)
+            brick.set_output_state(PORT_A, 0, 0, 0, 0, 0, 0)
+        self.assertAlmostEqual(time.time() - it, .15, delta=.05)
+        self.assertEqual(brick.total_commands, 10)
+        self.assertAlmostEqual(brick.bus_time, .15)
+        self.assertEqual(brick.sock.type, 'bluetooth')
+
+    def test_jitter(self):
+        profile = LatencyProfile('usb', latency=.001, jitter=.001)
+        delays = [profile.delay('set_output_state', False) for _ in range(100)]
+        self.assertTrue(all(d >= .001 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
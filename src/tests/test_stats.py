@@ -0,0 +1,53 @@
+from scripts.helpers.stats import *
+
+import unittest
+import statistics
+import random
+import time
+
+
+class TestRunningStats(unittest.TestCase):
+    def test_moments(self):
+        values = [random.gauss(500, 40) for _ in range(1000)]
+        stats = RunningStats().update(values)
+        self.assertEqual(stats.count, 1000)
+        self.assertAlmostEqual(stats.mean, statistics.mean(values))
+        self.assertAlmostEqual(stats.variance, statistics.variance(values))
+        self.assertEqual(stats.min, min(values))
+        self.assertEqual(stats.max, max(values))
+
+    def test_percentiles(self):
+        values = list(range(10001))
+        random.shuffle(values)
+        stats = RunningStats(percentiles=(.5, .95, .99)).update(values)
+        self.assertAlmostEqual(stats.percentile(.5), 5000, delta=100)
+        self.assertAlmostEqual(stats.percentile(.95), 9500, delta=100)
+        self.assertAlmostEqual(stats.percentile(.99), 9900, delta=100)
+        self.assertRaises(ValueError, stats.percentile, .75)
+
+    def test_few_values(self):
+        stats = RunningStats()
+        self.assertIsNone(stats.percentile(.5))
+        stats.update([3, 1, 2])
+        self.assertEqual(stats.percentile(.5), 2)
+        self.assertEqual(stats.variance, 1)
+
+    def test_robust_to_spikes(self):
+        stats = RunningStats().update([15] * 200 + [1023])
+        self.assertEqual(stats.percentile(.5), 15)
+        self.assertGreater(stats.mean, 19)
+
+
+class TestSampleFor(unittest.TestCase):
+    def test_rate(self):
+        readings = []
+        stats = sample_for(lambda: 42, .5, rate=20, callback=readings.append)
+        self.assertTrue(9 <= len(readings) <= 11)
+        self.assertEqual(stats.count, len(readings))
+        self.assertEqual(stats.mean, 42)
+
+    def test_accept(self):
+        values = iter(range(1000))
+        stats = sample_for(lambda: next(values), .2, rate=100, accept=lambda r: r % 2 == 0)
+        self.assertEqual(stats.min % 2, 0)
+        self.assertLess(stats.count, 15)
@@ -0,0 +1,68 @@
+from nxt.sensor import *
+from nxt.motor import *
+from scripts.helpers.robot import *
+from scripts.helpers.telemetry import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+import os
+import shutil
+import tempfile
+
+
+class TestTelemetryRecorder(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'run.telemetry')
+        super().setUp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_ring(self):
+        recorder = TelemetryRecorder(capacity=4)
+        for i in range(6):
+            recorder.record(INPUT, PORT_2, value=i)
+        self.assertEqual(len(recorder), 4)
+        self.assertEqual([int(record[5]) for record in recorder.records()], [2, 3, 4, 5])
+
+    def test_file(self):
+        with TelemetryRecorder(self.path, capacity=16) as recorder:
+            recorder.record(COMMAND, PORT_A, MODE_MOTOR_ON, 0, -75, 360, REGULATION_IDLE | RUN_STATE_RUNNING << 8)
+            recorder.record(RUNNING, value=1)
+        self.assertEqual(os.path.getsize(self.path), HEADER.size + 16 * RECORD.size)
+
+        records = read_telemetry(self.path)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(unpack_command(records[0]),
+                         (PORT_A, -75, MODE_MOTOR_ON, REGULATION_IDLE, 0, RUN_STATE_RUNNING, 360))
+        self.assertEqual(int(records[1][1]), RUNNING)
+
+    def test_not_telemetry(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+        self.assertRaises(ValueError, read_telemetry, self.path)
+
+
+class TestTelemetryBrick(unittest.TestCase):
+    def test_robot(self):
+        recorder = TelemetryRecorder()
+        robot = Robot(SimulatedBrick(), debug=False, power=50, telemetry=recorder, calibration_cache=False)
+        robot.init_synchronized_motors(PORT_A, PORT_C)
+        robot.init_light_sensor(PORT_2)
+        robot.turn_light_sensor(ON)
+        robot.brick.set_sensor(PORT_2, 512)
+        robot.light.get_sample()
+        robot.move_forward(seconds=.1, wait=True)
+
+        kinds = [int(record[1]) for record in recorder.records()]
+        self.assertIn(INPUT_MODE, kinds)
+        self.assertIn(INPUT, kinds)
+        self.assertIn(COMMAND, kinds)
+        self.assertEqual([int(record[5]) for record in recorder.records() if record[1] == RUNNING], [1, 0])
+        robot.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+from scripts.helpers.robot import *
+from scripts.helpers.tones import *
+from scripts.helpers.simulator import SimulatedBrick
+
+import unittest
+import time
+
+
+class TestMorse(unittest.TestCase):
+    def test_encode(self):
+        self.assertEqual(encode('sos'), (('...', '---', '...'),))
+        self.assertEqual(encode('E T'), (('.',), ('-',)))
+        self.assertIs(encode('SOS'), encode('SOS'))
+        self.assertRaises(ValueError, encode, '~')
+
+    def test_schedule(self):
+        unit = 1.2 / 20
+        schedule = compile_morse('SOS', 20)
+        self.assertEqual(len(schedule.tones), 9)
+        self.assertEqual([tone.duration for tone in schedule.tones[:4]], [60, 60, 60, 180])
+        # Letters are 3 units apart
+        self.assertAlmostEqual(schedule.tones[3].start - schedule.tones[2].start, 4 * unit)
+        # SOS is 9 symbols, 6 symbol gaps and 2 letter gaps: 27 units
+        self.assertAlmostEqual(schedule.duration, 27 * unit)
+        words = compile_morse('E E', 20)
+        self.assertAlmostEqual(words.tones[1].start, 8 * unit)
+
+
+class TestRobotMorse(unittest.TestCase):
+    def setUp(self):
+        self.brick = SimulatedBrick()
+        self.robot = Robot(self.brick, debug=False, calibration_cache=False)
+        super().setUp()
+
+    def test_wait(self):
+        it = time.time()
+        self.robot.morse('E', wpm=60)
+        self.assertGreaterEqual(time.time() - it, .02)
+        self.assertEqual(len(self.brick.tones), 1)
+
+    def test_background(self):
+        it = time.time()
+        playback = self.robot.morse('SOS', wait=False)
+        self.assertLess(time.time() - it, .05)
+        self.assertTrue(playback.wait(5))
+        self.assertEqual(len(self.brick.tones), 9)
+
+    def test_cancel(self):
+        playback = self.robot.morse('SOS', wait=False)
+        time.sleep(.1)
+        self.robot.stop_morse()
+        self.assertTrue(playback.done)
+        self.assertLess(len(self.brick.tones), 9)
+        self.assertEqual(self.brick.commands['stop_sound_playback'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
-from scripts.helpers.utils import countdown, normalize
+from scripts.helpers.utils import countdown, normalize, poll_until, Deadline, Normalizer, SingleFlight, coalesce, numpy
+from scripts.helpers.simulator import SimulatedBrick
+from nxt.sensor import Light, PORT_2
 
 import unittest
 import time
 import random
+import threading
+from unittest import mock
 
 
 class TestUtils(unittest.TestCase):
@@ -20,3 +24,117 @@ class TestUtils(unittest.TestCase):
 
         for i in range(l, t):
             self.assertEqual(normalize(i, l, t), (i / t))
+
+    def test_normalizer(self):
+        normalizer = Normalizer(229, 900)
+        for i in range(-10, 1100):
+            self.assertEqual(normalizer(i), normalize(i, 229, 900))
+        self.assertEqual(normalizer(512.5), normalize(512.5, 229, 900))
+        self.assertEqual(normalizer.lookup(300), normalize(300, 229, 900))
+        self.assertRaises(ValueError, Normalizer, 15, 15)
+
+    def test_normalizer_batch(self):
+        normalizer = Normalizer(15, 1024)
+        values = [random.randint(0, 1023) for _ in range(1000)]
+        expected = [normalize(i, 15, 1024) for i in values]
+        self.assertEqual(list(normalizer.batch(values)), expected)
+        self.assertEqual(list(normalizer.batch([-5, 2000])), [normalize(-5, 15, 1024), normalize(2000, 15, 1024)])
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_normalizer_batch_array(self):
+        normalizer = Normalizer(0, 1023)
+        values = numpy.arange(1024)
+        self.assertTrue(numpy.allclose(normalizer.batch(values), values / 1023))
+        self.assertTrue(numpy.allclose(normalizer.batch(values + .5), (values + .5) / 1023))
+
+    def test_deadline(self):
+        it = time.time()
+        deadline = Deadline(.2)
+        self.assertFalse(deadline.expired())
+        self.assertTrue(deadline.wait())
+        self.assertTrue(deadline.expired())
+        self.assertAlmostEqual(time.time() - it, .2, delta=.05)
+
+    def test_deadline_interrupted(self):
+        event = threading.Event()
+        threading.Timer(.1, event.set).start()
+        self.assertFalse(Deadline(5).wait(event))
+
+    def test_poll_until_rate(self):
+        calls = []
+
+        def until(n):
+            calls.append(time.time())
+            return len(calls) == n
+
+        self.assertTrue(poll_until(until, .05, args=(5,)))
+        self.assertEqual(len(calls), 5)
+        self.assertGreaterEqual(calls[-1] - calls[0], .19)
+
+    def test_poll_until_backoff(self):
+        calls = []
+        event = threading.Event()
+        threading.Timer(.5, event.set).start()
+        self.assertFalse(poll_until(lambda: calls.append(1), .01, event=event, backoff=2, max_interval=.16))
+        # 0.01 + 0.02 + 0.04 + 0.08 + 0.16 + 0.16 ...
+        self.assertTrue(5 <= len(calls) <= 8)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_are_shared(self):
+        calls = []
+
+        def read():
+            calls.append(1)
+            time.sleep(.1)
+            return len(calls)
+        flight = SingleFlight(read)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(flight(), 2)
+
+    def test_ttl(self):
+        flight = SingleFlight(iter(range(10)).__next__, ttl=.05)
+        self.assertEqual([flight(), flight()], [0, 0])
+        time.sleep(.06)
+        self.assertEqual(flight(), 1)
+        flight.invalidate()
+        self.assertEqual(flight(), 2)
+
+    def test_no_ttl(self):
+        flight = SingleFlight(iter(range(10)).__next__)
+        # Even within the same tick of the clock
+        with mock.patch('scripts.helpers.utils.time', return_value=1000.):
+            self.assertEqual([flight(), flight()], [0, 1])
+
+    def test_errors_are_shared(self):
+        def fail():
+            time.sleep(.05)
+            raise IOError('Link lost')
+        flight = SingleFlight(fail)
+        errors = []
+
+        def call():
+            try:
+                flight()
+            except IOError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+
+    def test_coalesce_aliases(self):
+        brick = SimulatedBrick()
+        light = coalesce(Light(brick, PORT_2), ('get_sample', 'get_lightness'), ttl=1)
+        self.assertIs(type(light), Light)
+        light.get_sample()
+        light.get_lightness()
+        self.assertEqual(brick.commands['get_input_values'], 1)